@@ -0,0 +1,275 @@
+"""Single-pass hash + metadata extraction shared by scripts_doc_processing.py and metadata_compare.py.
+
+Each file is opened once and memory-mapped; the SHA256 is fed from that mapping in
+chunks and the DOCX (zip) / PDF parser reads the same pages, so the bytes come off
+disk once. Results are returned as a compact ArtifactRecord.
+DOCX parts are walked with a streaming XML parser (bounded per-part size, no DTDs).
+PDFs are read trailer-first (pdf_trailer.py); pypdf is only imported when that fails.
+"""
+import hashlib
+import io
+import mmap
+import pathlib
+import xml.etree.ElementTree as ET
+import zipfile
+from typing import Dict, NamedTuple, Optional
+
+import pdf_trailer
+
+CHUNK = 1 << 20
+DEFAULT_LIMITS = {'docx': 200, 'pdf': 300}
+PDF_KEYS = ['/Title', '/Author', '/Creator', '/Producer', '/CreationDate', '/ModDate']
+
+# DOCX parts walked with iterparse; element local names -> meta keys
+CORE_FIELDS = {'creator': 'creator', 'lastModifiedBy': 'last_modified_by', 'revision': 'revision',
+               'created': 'created', 'modified': 'modified', 'title': 'title', 'subject': 'subject',
+               'keywords': 'keywords', 'description': 'description', 'category': 'category',
+               'lastPrinted': 'last_printed', 'contentStatus': 'content_status'}
+APP_FIELDS = {'Application': 'application', 'AppVersion': 'app_version', 'Template': 'template',
+              'Company': 'company', 'Manager': 'manager', 'TotalTime': 'total_time', 'Pages': 'pages',
+              'Words': 'words', 'DocSecurity': 'doc_security'}
+MAX_PART_BYTES = 8 << 20  # per XML part, decompressed; guards against zip bombs
+MAX_RSIDS = 256
+MAX_TARGETS = 64
+
+
+class MappedReader(io.RawIOBase):
+    """Seekable, read-only file object over a buffer (mmap) without copying it;
+    zipfile / pypdf need seekable() etc., which mmap itself does not provide."""
+    def __init__(self, buf):
+        self._view = memoryview(buf)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, b):
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+class ArtifactRecord(NamedTuple):
+    name: str
+    size: int
+    sha256: str
+    type: str
+    meta: Dict[str, str]
+
+
+def file_type(p: pathlib.Path) -> str:
+    suffix = p.suffix.lower()
+    return {'.docx': 'docx', '.pdf': 'pdf'}.get(suffix, 'other')
+
+
+def sha256_buffer(buf) -> str:
+    h = hashlib.sha256()
+    view = memoryview(buf)
+    for i in range(0, len(view), CHUNK):
+        h.update(view[i:i + CHUNK])
+    view.release()
+    return h.hexdigest()
+
+
+def sha256_file(p: pathlib.Path) -> str:
+    h = hashlib.sha256()
+    with p.open('rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class _EventBuilder(pdf_trailer.NoDtdTreeBuilder):
+    """iterparse-style ('start'/'end', element) queue on a builder that refuses DTDs
+    (ET.iterparse only accepts the stock TreeBuilder, which has no doctype hook)."""
+    def __init__(self):
+        super().__init__()
+        self.events = []
+
+    def start(self, tag, attrs):
+        el = super().start(tag, attrs)
+        self.events.append(('start', el))
+        return el
+
+    def end(self, tag):
+        el = super().end(tag)
+        self.events.append(('end', el))
+        return el
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _iterparse(z: zipfile.ZipFile, name: str):
+    """Yield (event, local_name, element) for a zip member, clearing elements as they close.
+    Stops at MAX_PART_BYTES decompressed (zip bombs) and at any DTD (entity expansion)."""
+    builder = _EventBuilder()
+    parser = ET.XMLParser(target=builder)
+    left = MAX_PART_BYTES
+    with z.open(name) as raw:
+        while True:
+            data = raw.read(min(CHUNK, left + 1))
+            if len(data) > left:
+                raise ValueError(f'{name} exceeds {MAX_PART_BYTES} bytes')
+            left -= len(data)
+            if data:
+                parser.feed(data)
+            else:
+                parser.close()
+            for event, el in builder.events:
+                yield event, _local(el.tag), el
+                if event == 'end':
+                    el.clear()
+            builder.events.clear()
+            if not data:
+                return
+
+
+def _docx_props(z: zipfile.ZipFile, names, out: Dict[str, str], limit: int):
+    if 'docProps/core.xml' in names:
+        for event, tag, el in _iterparse(z, 'docProps/core.xml'):
+            if event == 'end' and tag in CORE_FIELDS and el.text:
+                out.setdefault(CORE_FIELDS[tag], el.text.strip()[:limit])
+    if 'docProps/app.xml' in names:
+        depth = 0
+        for event, tag, el in _iterparse(z, 'docProps/app.xml'):
+            depth += 1 if event == 'start' else -1
+            # only direct children of <Properties>; nested vectors (TitlesOfParts, ...) are skipped
+            if event == 'end' and depth == 1 and tag in APP_FIELDS and el.text:
+                out.setdefault(APP_FIELDS[tag], el.text.strip()[:limit])
+    if 'docProps/custom.xml' in names:
+        prop = None
+        for event, tag, el in _iterparse(z, 'docProps/custom.xml'):
+            if tag == 'property':
+                prop = el.get('name') if event == 'start' else None
+            elif event == 'end' and prop and el.text is not None:
+                out.setdefault(f'custom:{prop[:64]}', el.text.strip()[:limit])
+
+
+def _docx_settings(z: zipfile.ZipFile, names, out: Dict[str, str]):
+    if 'word/settings.xml' not in names:
+        return
+    rsids = []
+    count = 0
+    for event, tag, el in _iterparse(z, 'word/settings.xml'):
+        if event != 'end':
+            continue
+        val = next((v for k, v in el.attrib.items() if _local(k) == 'val'), None)
+        if tag == 'rsidRoot' and val:
+            out['rsid_root'] = val
+        elif tag == 'rsid' and val:
+            count += 1
+            if len(rsids) < MAX_RSIDS:
+                rsids.append(val)
+    if count:
+        out['rsid_count'] = str(count)
+        out['rsids'] = ','.join(rsids)
+
+
+def _docx_relationships(z: zipfile.ZipFile, names, out: Dict[str, str], limit: int):
+    """External relationship targets (remote images, hyperlinks, attached templates)."""
+    targets = []
+    for name in names:
+        if not name.endswith('.rels'):
+            continue
+        for event, tag, el in _iterparse(z, name):
+            if event != 'end' or tag != 'Relationship' or el.get('TargetMode') != 'External':
+                continue
+            target = (el.get('Target') or '')[:limit]
+            if el.get('Type', '').endswith('/attachedTemplate'):
+                out.setdefault('attached_template', target)
+            if target not in targets and len(targets) < MAX_TARGETS:
+                targets.append(target)
+    if targets:
+        out['external_targets'] = ' | '.join(targets)
+
+
+def docx_meta(buf, limit: int) -> Dict[str, str]:
+    """Forensic properties from a DOCX held in a seekable buffer (mmap reader or file object).
+
+    One streaming (iterparse) pass per relevant part, namespace-agnostic:
+      core.xml / app.xml   authoring fields, template, company, editing time
+      custom.xml           custom:<name> properties
+      settings.xml         rsid_root, rsids (first MAX_RSIDS), rsid_count
+      *.rels               external_targets, attached_template
+    """
+    out = {}
+    try:
+        with zipfile.ZipFile(buf) as z:
+            names = z.namelist()
+            _docx_props(z, names, out, limit)
+            _docx_settings(z, names, out)
+            _docx_relationships(z, names, out, limit)
+    except Exception as e:
+        out['error'] = str(e)[:limit]
+    return out
+
+
+def pdf_meta(buf, limit: int) -> Dict[str, str]:
+    """Info/XMP fields from a PDF buffer: trailer-only fast path, pypdf when that fails."""
+    try:
+        return pdf_trailer.read_metadata(buf, limit)
+    except Exception:
+        pass  # xref streams, encryption, damaged files: let pypdf handle them
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return {'error': 'pypdf not installed'}
+    out = {}
+    try:
+        with MappedReader(buf) as reader:
+            r = PdfReader(reader)
+            info = r.metadata or {}
+            for k in PDF_KEYS:
+                if k in info:
+                    out[k.strip('/').lower()] = str(info[k])[:limit]
+            xmp = r.xmp_metadata
+            if xmp is not None:
+                out.update(pdf_trailer.xmp_fields(xmp.stream.get_data(), limit))
+    except Exception as e:
+        out['error'] = str(e)
+    return out
+
+
+def meta_for(p: pathlib.Path, limit: Optional[int] = None) -> Dict[str, str]:
+    """Metadata only (no hash); used by the per-type extract_* wrappers."""
+    return extract(p, limit, want_hash=False).meta
+
+
+def extract(p: pathlib.Path, limit: Optional[int] = None, want_hash: bool = True) -> ArtifactRecord:
+    """Hash and parse `p` from one memory-mapped read. `limit` caps field length
+    (default per type: DEFAULT_LIMITS)."""
+    p = pathlib.Path(p)
+    ftype = file_type(p)
+    limit = limit or DEFAULT_LIMITS.get(ftype, 200)
+    with p.open('rb') as f:
+        size = p.stat().st_size
+        if size == 0:
+            empty = hashlib.sha256().hexdigest() if want_hash else ''
+            return ArtifactRecord(p.name, 0, empty, ftype, {'error': 'empty file'} if ftype != 'other' else {})
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            sha = sha256_buffer(mm) if want_hash else ''
+            meta = {}
+            if ftype == 'docx':
+                with MappedReader(mm) as reader:
+                    meta = docx_meta(reader, limit)
+            elif ftype == 'pdf':
+                meta = pdf_meta(mm, limit)
+    return ArtifactRecord(p.name, size, sha, ftype, meta)
@@ -0,0 +1,102 @@
+"""Persistent artifact index shared by scripts_doc_processing.py and metadata_compare.py.
+
+SQLite tables:
+  artifacts  sha256 -> type, size, first_seen, extracted metadata (JSON)
+  files      resolved path -> size, mtime_ns, sha256   (pre-filter: unchanged files skip hashing)
+  sightings  every time an artifact is seen (sha256, path, channel, utc_timestamp)
+"""
+import json
+import os
+import pathlib
+import sqlite3
+from typing import Dict, Optional
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS artifacts (sha256 TEXT PRIMARY KEY, type TEXT, size INTEGER, first_seen TEXT, meta TEXT)',
+    'CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)',
+    'CREATE TABLE IF NOT EXISTS sightings (sha256 TEXT, path TEXT, channel TEXT, utc_timestamp TEXT)',
+    'CREATE INDEX IF NOT EXISTS sightings_sha ON sightings(sha256)',
+    'CREATE INDEX IF NOT EXISTS files_sha ON files(sha256)',
+]
+
+
+def file_key(p: pathlib.Path, st: os.stat_result = None):
+    """(resolved path, size, mtime_ns) used by the pre-filter."""
+    st = st or p.stat()
+    return str(p.resolve()), st.st_size, st.st_mtime_ns
+
+
+class ArtifactIndex:
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        for stmt in SCHEMA:
+            self.conn.execute(stmt)
+        self.conn.commit()
+
+    def known_sha(self, p: pathlib.Path, st: os.stat_result = None) -> Optional[str]:
+        """sha256 for a path whose size and mtime are unchanged since it was indexed."""
+        key = file_key(p, st)
+        row = self.conn.execute('SELECT sha256 FROM files WHERE path=? AND size=? AND mtime_ns=?', key).fetchone()
+        return row[0] if row else None
+
+    def get(self, sha256: str) -> Optional[Dict]:
+        row = self.conn.execute('SELECT type, size, first_seen, meta FROM artifacts WHERE sha256=?', (sha256,)).fetchone()
+        if row is None:
+            return None
+        return {'sha256': sha256, 'type': row[0], 'size': row[1], 'first_seen': row[2], 'meta': json.loads(row[3] or '{}')}
+
+    def meta_for_path(self, p: pathlib.Path) -> Optional[Dict]:
+        """Cached artifact record for an unchanged file, without opening it."""
+        sha = self.known_sha(p)
+        return self.get(sha) if sha else None
+
+    def record(self, sha256: str, p: pathlib.Path, ftype: str, meta: Dict, channel: str, ts: str,
+               st: os.stat_result = None, duplicate_sighting: bool = True) -> bool:
+        """Index a processed file and log a sighting (for known content only if
+        `duplicate_sighting`). Returns True if the artifact is new."""
+        path, size, mtime_ns = file_key(p, st)
+        cur = self.conn.execute('INSERT OR IGNORE INTO artifacts VALUES (?,?,?,?,?)',
+                                (sha256, ftype, size, ts, json.dumps(meta)))
+        new = cur.rowcount == 1
+        self.conn.execute('INSERT OR REPLACE INTO files VALUES (?,?,?,?)', (path, size, mtime_ns, sha256))
+        if new or duplicate_sighting:
+            self.conn.execute('INSERT INTO sightings VALUES (?,?,?,?)', (sha256, path, channel, ts))
+        return new
+
+    def add_sighting(self, sha256: str, p: pathlib.Path, channel: str, ts: str):
+        self.conn.execute('INSERT INTO sightings VALUES (?,?,?,?)', (sha256, str(p.resolve()), channel, ts))
+
+    def sightings(self, sha256: str):
+        return self.conn.execute('SELECT path, channel, utc_timestamp FROM sightings WHERE sha256=? '
+                                 'ORDER BY utc_timestamp', (sha256,)).fetchall()
+
+    def iter_artifacts(self):
+        """Yield every indexed artifact as {'sha256', 'type', 'file', 'meta'} (one path per artifact)."""
+        cur = self.conn.execute('SELECT a.sha256, a.type, a.meta, '
+                                '(SELECT path FROM files f WHERE f.sha256=a.sha256 LIMIT 1) FROM artifacts a')
+        for sha, ftype, meta, path in cur:
+            yield {'sha256': sha, 'type': ftype, 'file': pathlib.Path(path).name if path else sha[:12],
+                   'meta': json.loads(meta or '{}')}
+
+    def flush(self):
+        """Commit pending writes (record/add_sighting batch until flushed or closed)."""
+        self.conn.commit()
+
+    def rollback(self):
+        """Drop writes since the last flush (their rows never reached the log)."""
+        self.conn.rollback()
+
+    def close(self, commit: bool = True):
+        if commit:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(commit=exc_type is None)
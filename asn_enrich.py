@@ -2,106 +2,342 @@
 """Enrich session_log.csv with ASN & country for IPs lacking data.
 Usage:
   ./asn_enrich.py --in session_log.csv --out session_log_enriched.csv
+  ./asn_enrich.py --in session_log.csv --out enriched.csv --workers 8 --rate 5 --base-url http://127.0.0.1:8080
+  ./asn_enrich.py --in session_log.csv --out enriched.csv --resolver offline --db asn.idx
 
 Behavior:
   - Reads the input CSV (header: utc_timestamp,ip,asn,country,ua,path,token,notes)
   - For any row where asn or country is blank, resolves via ipapi.co (HTTPS JSON)
-  - Caches lookups in ip_cache.json to avoid repeat network calls
-  - Writes a new CSV (does not overwrite source unless --out == --in)
+  - Unique IPs are resolved once; cache misses are fetched in parallel (--workers)
+  - Only real network calls are throttled (token bucket, --rate requests/sec)
+  - --resolver offline answers from a local index built by asn_index.py; IPs the
+    index does not cover fall back to HTTP unless --no-fallback is given
+  - Caches lookups in ip_cache.sqlite3 (per-entry TTL, short TTL for failed lookups,
+    bounded size, shareable by concurrent jobs); a legacy ip_cache.json is imported once
+  - Streams rows in bounded chunks (--chunk-size) so memory stays flat on large logs
+  - Writes a new CSV atomically via temp file + rename (does not overwrite source unless --out == --in)
+  - --incremental skips rows already enriched by a previous run (byte watermark in <out>.state.json)
 
 Notes:
   - Network calls are rate-limited by the public service; heavy use may require an API key / self-hosted DB.
   - If the service fails or times out, leaves fields blank and continues.
-  - Safe to re-run incrementally as new rows are appended.
+  - Safe to re-run incrementally as new rows are appended; a partially written last line is left for the next run.
 """
 import argparse
-import csv
 import json
 import pathlib
+import sqlite3
+import threading
 import time
 import urllib.request
 import urllib.error
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-CACHE_PATH = pathlib.Path('ip_cache.json')
+import csv_stream
+import instrument
+from asn_index import AsnIndex
 
-def load_cache():
-    if CACHE_PATH.exists():
+CACHE_PATH = pathlib.Path('ip_cache.sqlite3')
+LEGACY_CACHE_PATH = pathlib.Path('ip_cache.json')  # imported once when the SQLite cache is first created
+CACHE_TTL = 30 * 86400
+NEGATIVE_TTL = 3600  # failed lookups are retried after an hour
+CACHE_MAX_ENTRIES = 500_000
+DEFAULT_CHUNK = 5000
+SESSION_FIELDS = ['utc_timestamp','ip','asn','country','ua','path','token','notes']
+DEFAULT_BASE_URL = 'https://ipapi.co'
+DEFAULT_WORKERS = 4
+DEFAULT_RATE = 5.0  # requests/sec; matches the old fixed 0.2s per-row sleep
+LRU_SIZE = 65536  # in-process entries for live (per-hit) enrichment
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a request slot is free."""
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            with instrument.span('asn_enrich.rate_limit_wait'):
+                time.sleep(wait)
+
+class LookupCache:
+    """Persistent lookup cache in SQLite (WAL mode, safe to share between concurrent jobs).
+
+    Each entry carries fetched_at / expires_at; failed (blank) lookups get the short
+    negative TTL so they are retried later. Writes are per-entry upserts, and close()
+    evicts expired rows plus the oldest entries beyond max_entries.
+    Supports the dict subset the enrichment code uses: get(), [], `in`, item assignment.
+    """
+    def __init__(self, path: pathlib.Path, ttl: float = CACHE_TTL, negative_ttl: float = NEGATIVE_TTL,
+                 max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = pathlib.Path(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS ip_cache ('
+                          'ip TEXT PRIMARY KEY, asn TEXT, country TEXT, fetched_at REAL, expires_at REAL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS ip_cache_fetched ON ip_cache(fetched_at)')
+
+    def get(self, ip: str, default=None):
+        row = self.conn.execute('SELECT asn, country FROM ip_cache WHERE ip=? AND expires_at>?',
+                                (ip, time.time())).fetchone()
+        if row is None:
+            return default
+        return {'asn': row[0], 'country': row[1]}
+
+    def __getitem__(self, ip: str):
+        info = self.get(ip)
+        if info is None:
+            raise KeyError(ip)
+        return info
+
+    def __contains__(self, ip: str):
+        return self.get(ip) is not None
+
+    def __setitem__(self, ip: str, info: dict):
+        now = time.time()
+        negative = not info.get('asn') and not info.get('country')
+        self.conn.execute('INSERT OR REPLACE INTO ip_cache VALUES (?,?,?,?,?)',
+                          (ip, info.get('asn',''), info.get('country',''), now,
+                           now + (self.negative_ttl if negative else self.ttl)))
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM ip_cache').fetchone()[0]
+
+    def import_json(self, legacy: pathlib.Path) -> int:
+        """One-off migration of a legacy ip_cache.json; blank (failed) entries are dropped."""
         try:
-            return json.loads(CACHE_PATH.read_text())
+            data = json.loads(legacy.read_text())
         except Exception:
-            return {}
-    return {}
+            return 0
+        n = 0
+        for ip, info in data.items():
+            if isinstance(info, dict) and (info.get('asn') or info.get('country')) and ip not in self:
+                self[ip] = info
+                n += 1
+        return n
 
-def save_cache(cache):
-    try:
-        CACHE_PATH.write_text(json.dumps(cache, indent=2))
-    except Exception:
-        pass
+    def evict(self):
+        self.conn.execute('DELETE FROM ip_cache WHERE expires_at<=?', (time.time(),))
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self.conn.execute('DELETE FROM ip_cache WHERE ip IN '
+                              '(SELECT ip FROM ip_cache ORDER BY fetched_at LIMIT ?)', (excess,))
+
+    def close(self):
+        try:
+            self.evict()
+        except sqlite3.OperationalError:
+            pass  # another job holds the write lock; eviction can wait for the next run
+        self.conn.close()
+
+def load_cache(path: pathlib.Path = None, **kwargs) -> LookupCache:
+    path = pathlib.Path(path) if path else CACHE_PATH
+    fresh = not path.exists()
+    cache = LookupCache(path, **kwargs)
+    if fresh and LEGACY_CACHE_PATH.exists():
+        cache.import_json(LEGACY_CACHE_PATH)
+    return cache
 
-def lookup_ip(ip: str, cache: dict, timeout: float = 4.0):
-    if ip in cache:
-        return cache[ip]
-    url = f'https://ipapi.co/{ip}/json/'
+def save_cache(cache: LookupCache):
+    cache.close()
+
+def fetch_ip(ip: str, base_url: str = DEFAULT_BASE_URL, timeout: float = 4.0, limiter=None):
+    """Single network lookup (no cache). Failures yield blank fields."""
+    if limiter:
+        limiter.acquire()
+    url = f'{base_url.rstrip("/")}/{ip}/json/'
     try:
-        with urllib.request.urlopen(url, timeout=timeout) as resp:  # nosec B310 (simple metadata fetch)
+        with instrument.span('asn_enrich.network'), \
+                urllib.request.urlopen(url, timeout=timeout) as resp:  # nosec B310 (simple metadata fetch)
             data = json.loads(resp.read().decode('utf-8', 'ignore'))
             asn = data.get('asn', '')
             country = data.get('country_name') or data.get('country', '')
-            cache[ip] = {'asn': asn, 'country': country}
-            return cache[ip]
+            return {'asn': asn, 'country': country}
     except urllib.error.URLError:
-        cache[ip] = {'asn': '', 'country': ''}
+        pass
     except Exception:
-        cache[ip] = {'asn': '', 'country': ''}
-    return cache[ip]
-
-def enrich(rows):
-    cache = load_cache()
-    updated = []
-    for r in rows:
-        ip = r.get('ip','').strip()
-        # Only enrich if we have an IP and missing data
-        if ip and (not r.get('asn') or not r.get('country')):
-            info = lookup_ip(ip, cache)
-            if not r.get('asn'):
-                r['asn'] = info.get('asn','')
-            if not r.get('country'):
-                r['country'] = info.get('country','')
-            time.sleep(0.2)  # light throttle
-        updated.append(r)
-    save_cache(cache)
-    return updated
+        pass
+    instrument.count('asn_enrich.network_errors')
+    return {'asn': '', 'country': ''}
+
+def lookup_ip(ip: str, cache, timeout: float = 4.0, base_url: str = DEFAULT_BASE_URL, limiter=None):
+    with instrument.span('asn_enrich.cache'):
+        info = cache.get(ip)
+    instrument.count('asn_enrich.cache_lookups', result='miss' if info is None else 'hit')
+    if info is None:
+        info = cache[ip] = fetch_ip(ip, base_url, timeout, limiter)
+    return info
+
+def resolve_many(ips, cache, workers: int = DEFAULT_WORKERS, rate: float = DEFAULT_RATE,
+                 base_url: str = DEFAULT_BASE_URL, timeout: float = 4.0):
+    """Resolve `ips` (dict or LookupCache as `cache`); only cache misses hit the network,
+    concurrently. Returns {ip: info} for every requested IP."""
+    resolved = {}
+    misses = []
+    with instrument.span('asn_enrich.cache'):
+        for ip in dict.fromkeys(ips):
+            info = cache.get(ip)
+            if info is None:
+                misses.append(ip)
+            else:
+                resolved[ip] = info
+    instrument.count('asn_enrich.cache_lookups', len(resolved), result='hit')
+    instrument.count('asn_enrich.cache_lookups', len(misses), result='miss')
+    if not misses:
+        return resolved
+    limiter = TokenBucket(rate) if rate and rate > 0 else None
+    fetch = lambda ip: fetch_ip(ip, base_url, timeout, limiter)
+    if workers <= 1:
+        for ip in misses:
+            resolved[ip] = cache[ip] = fetch(ip)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            for ip, info in zip(misses, ex.map(fetch, misses)):
+                resolved[ip] = cache[ip] = info  # cache is only written from this thread
+    return resolved
+
+class LRUResolver:
+    """Bounded in-process LRU in front of a resolver callable (key -> dict, e.g. ip -> {'asn','country'}).
+    Used for live enrichment where the same few IPs repeat; thread-safe. Blank answers
+    are not kept, so failed lookups are retried (subject to the resolver's own cache)."""
+    def __init__(self, resolve, maxsize: int = LRU_SIZE):
+        self.resolve = resolve
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, ip: str) -> dict:
+        with self.lock:
+            info = self.entries.get(ip)
+            if info is not None:
+                self.entries.move_to_end(ip)
+                self.hits += 1
+                return info
+            self.misses += 1
+        info = self.resolve(ip)
+        if not any(info.values()):
+            return info
+        with self.lock:
+            self.entries[ip] = info
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return info
+
+def make_resolver(index: AsnIndex = None, cache=None, fallback: bool = False, base_url: str = DEFAULT_BASE_URL,
+                  timeout: float = 4.0, rate: float = DEFAULT_RATE, lru_size: int = LRU_SIZE) -> LRUResolver:
+    """Single-IP resolver for live use: offline index first, then (only with `fallback`)
+    the persistent cache / rate-limited HTTP lookup. Unresolved IPs get blank fields."""
+    limiter = TokenBucket(rate) if rate and rate > 0 else None
+    blank = {'asn': '', 'country': ''}
+
+    def resolve(ip: str) -> dict:
+        info = index.lookup(ip) if index is not None and ip else None
+        if info:
+            return info
+        if fallback and ip:
+            return lookup_ip(ip, cache if cache is not None else {}, timeout, base_url, limiter)
+        return blank
+    return LRUResolver(resolve, lru_size)
+
+def enrich(rows, workers: int = DEFAULT_WORKERS, rate: float = DEFAULT_RATE,
+           base_url: str = DEFAULT_BASE_URL, timeout: float = 4.0,
+           index: AsnIndex = None, fallback: bool = True, cache=None):
+    """Fill blank asn/country fields in place. With `index`, the offline index is
+    consulted first and HTTP is only used for uncovered IPs (when `fallback`).
+    Without an explicit `cache`, the default on-disk cache is opened and closed here."""
+    own_cache = cache is None
+    if own_cache:
+        cache = load_cache()
+    # Only enrich rows that have an IP and missing data
+    pending = [r for r in rows if r.get('ip','').strip() and (not r.get('asn') or not r.get('country'))]
+    ips = dict.fromkeys(r['ip'].strip() for r in pending)
+    resolved = {}
+    if index is not None:
+        for ip in ips:
+            info = index.lookup(ip)
+            if info:
+                resolved[ip] = info
+    misses = [ip for ip in ips if ip not in resolved]
+    if index is None or fallback:
+        resolved.update(resolve_many(misses, cache, workers, rate, base_url, timeout))
+    for r in pending:
+        info = resolved.get(r['ip'].strip(), {})
+        if not r.get('asn'):
+            r['asn'] = info.get('asn','')
+        if not r.get('country'):
+            r['country'] = info.get('country','')
+    if own_cache:
+        save_cache(cache)
+    return rows
+
+def enrich_file(inp: pathlib.Path, outp: pathlib.Path, chunk_size: int = DEFAULT_CHUNK,
+                incremental: bool = False, **enrich_kwargs) -> int:
+    """Stream `inp` through enrich() in chunks of `chunk_size` rows and write `outp`
+    (csv_stream.transform_file: atomic full runs; with `incremental`, only rows appended
+    since the watermark in <out>.state.json are enriched and appended). Returns the number
+    of rows processed in this run."""
+    return csv_stream.transform_file(inp, outp, SESSION_FIELDS, lambda rows: enrich(rows, **enrich_kwargs),
+                                     chunk_size, incremental)
 
 def main():
     ap = argparse.ArgumentParser(description='Enrich session log with ASN & country information.')
     ap.add_argument('--in', dest='inp', required=True, help='Input session_log.csv path')
     ap.add_argument('--out', dest='out', required=True, help='Output CSV path')
+    ap.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Concurrent lookups for cache misses (default 4)')
+    ap.add_argument('--rate', type=float, default=DEFAULT_RATE, help='Max network lookups per second, 0 = unthrottled (default 5)')
+    ap.add_argument('--base-url', default=DEFAULT_BASE_URL, help='Resolver base URL, queried as <base>/<ip>/json/ (default https://ipapi.co)')
+    ap.add_argument('--timeout', type=float, default=4.0, help='Per-lookup timeout in seconds')
+    ap.add_argument('--resolver', choices=['http','offline'], default='http', help='Lookup backend (default http)')
+    ap.add_argument('--db', help='Offline index built by asn_index.py (required with --resolver offline)')
+    ap.add_argument('--no-fallback', action='store_true', help='With --resolver offline, never fall back to HTTP')
+    ap.add_argument('--cache', default=str(CACHE_PATH), help='SQLite lookup cache path (default ip_cache.sqlite3)')
+    ap.add_argument('--cache-ttl', type=float, default=CACHE_TTL, help='Seconds a successful lookup stays valid (default 30 days)')
+    ap.add_argument('--negative-ttl', type=float, default=NEGATIVE_TTL, help='Seconds a failed lookup is cached (default 1h)')
+    ap.add_argument('--cache-max', type=int, default=CACHE_MAX_ENTRIES, help='Max cached IPs; oldest are evicted (default 500000)')
+    ap.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK, help='Rows read, enriched and written per batch (default 5000)')
+    ap.add_argument('--incremental', action='store_true', help='Only process rows appended since the last run (watermark in <out>.state.json)')
+    instrument.add_profile_arguments(ap)
     args = ap.parse_args()
+    instrument.start_profile(args.profile, args.profile_out)
     inp = pathlib.Path(args.inp)
     if not inp.exists():
         ap.error('Input file does not exist')
-    rows = []
-    with inp.open() as f:
-        r = csv.DictReader(f)
-        fieldnames = r.fieldnames or []
-        needed = ['utc_timestamp','ip','asn','country','ua','path','token','notes']
-        # basic header validation / expansion
-        for n in needed:
-            if n not in fieldnames:
-                fieldnames.append(n)
-        for row in r:
-            # ensure all keys present
-            for n in needed:
-                row.setdefault(n,'')
-            rows.append(row)
-    enriched = enrich(rows)
+    index = None
+    if args.resolver == 'offline':
+        if not args.db or not pathlib.Path(args.db).exists():
+            ap.error('--resolver offline requires an existing --db index')
+        index = AsnIndex(pathlib.Path(args.db))
     outp = pathlib.Path(args.out)
-    with outp.open('w', newline='') as f:
-        w = csv.DictWriter(f, fieldnames=['utc_timestamp','ip','asn','country','ua','path','token','notes'])
-        w.writeheader()
-        for row in enriched:
-            w.writerow(row)
-    print(f'Wrote enriched log: {outp} (rows: {len(enriched)})')
+    if args.incremental and outp.resolve() == inp.resolve():
+        ap.error('--incremental needs --out different from --in')
+    cache = load_cache(pathlib.Path(args.cache), ttl=args.cache_ttl, negative_ttl=args.negative_ttl,
+                       max_entries=args.cache_max)
+    try:
+        n = enrich_file(inp, outp, args.chunk_size, args.incremental,
+                        workers=args.workers, rate=args.rate, base_url=args.base_url, timeout=args.timeout,
+                        index=index, fallback=not args.no_fallback, cache=cache)
+    finally:
+        save_cache(cache)
+        if index is not None:
+            index.close()
+    print(f'Wrote enriched log: {outp} (rows: {n})')
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Offline IP -> ASN / country index (sorted ranges, memory-mapped, binary search).
+Usage:
+  Build:   ./asn_index.py build ip2asn.tsv asn.idx
+  Lookup:  ./asn_index.py lookup asn.idx 8.8.8.8 2001:4860::8888
+
+Source dump: CSV or TSV rows of start,end,asn,country (e.g. iptoasn.com ip2asn-combined.tsv).
+  - start/end may be dotted IPv4, IPv6 or plain integers; a header line is skipped
+  - asn may be '13335' or 'AS13335'; asn 0 ("not routed") is treated as no data
+  - extra columns (AS description, ...) are ignored
+
+Index layout (all IPs stored as 16-byte big-endian IPv6; IPv4 is mapped to ::ffff:a.b.c.d):
+  header  : magic(8) | record_count(u32) | country_count(u32)
+  records : start(16) | end(16) | asn(u32) | country_idx(u16) | pad(2)   sorted by start
+  trailer : newline-separated country strings
+Lookups never load the file: the OS pages in only the records touched by the search.
+"""
+import argparse
+import bisect
+import csv
+import ipaddress
+import json
+import mmap
+import pathlib
+import struct
+from typing import Optional
+
+import instrument
+
+MAGIC = b'ASNIDX1\n'
+HEADER = struct.Struct('<8sII')
+RECORD = struct.Struct('>16s16sIH2x')
+V4_MAPPED = 0xFFFF << 32
+
+
+def ip_key(value: str) -> bytes:
+    """16-byte sort key for an IPv4/IPv6 address (or integer string)."""
+    value = value.strip()
+    if value.isdigit():
+        n = int(value)
+        addr = ipaddress.ip_address(n) if n <= 0xFFFFFFFF else ipaddress.IPv6Address(n)
+    else:
+        addr = ipaddress.ip_address(value)
+    n = int(addr)
+    if addr.version == 4:
+        n |= V4_MAPPED
+    return n.to_bytes(16, 'big')
+
+
+def _parse_asn(value: str) -> int:
+    value = value.strip().upper()
+    if value.startswith('AS'):
+        value = value[2:]
+    return int(value or 0)
+
+
+def build_index(src: pathlib.Path, dst: pathlib.Path) -> int:
+    """Convert a range dump into a binary index. Returns the number of ranges stored."""
+    ranges = []
+    countries = {}
+    with src.open(newline='', encoding='utf-8', errors='ignore') as f:
+        first = f.readline()
+        f.seek(0)
+        reader = csv.reader(f, delimiter='\t' if '\t' in first else ',')
+        for row in reader:
+            if len(row) < 4 or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            try:
+                start, end, asn = ip_key(row[0]), ip_key(row[1]), _parse_asn(row[2])
+            except ValueError:
+                continue  # header / malformed line
+            if asn == 0:
+                continue
+            country = row[3].strip()
+            idx = countries.setdefault(country, len(countries))
+            ranges.append((start, end, asn, idx))
+    if len(countries) > 0xFFFF:
+        raise ValueError('Too many distinct country values for index format')
+    ranges.sort()
+    tmp = dst.with_name(dst.name + '.tmp')
+    with tmp.open('wb') as out:
+        out.write(HEADER.pack(MAGIC, len(ranges), len(countries)))
+        for start, end, asn, idx in ranges:
+            out.write(RECORD.pack(start, end, asn, idx))
+        out.write('\n'.join(countries).encode('utf-8'))
+    tmp.replace(dst)
+    return len(ranges)
+
+
+class _Starts:
+    """Sequence view over the record start keys, so bisect can search the mmap in place."""
+    def __init__(self, mm, count: int):
+        self.mm = mm
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i: int) -> bytes:
+        off = HEADER.size + i * RECORD.size
+        return self.mm[off:off + 16]
+
+
+class AsnIndex:
+    """Read-only, memory-mapped view of an index produced by build_index()."""
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self._f = self.path.open('rb')
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, n_countries = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f'Not an ASN index: {path}')
+        trailer = self._mm[HEADER.size + self.count * RECORD.size:].decode('utf-8')
+        self.countries = trailer.split('\n') if n_countries else []
+        self._starts = _Starts(self._mm, self.count)
+
+    def lookup(self, ip: str) -> Optional[dict]:
+        """Return {'asn': 'AS…', 'country': …} or None when the IP is not covered."""
+        try:
+            key = ip_key(ip)
+        except ValueError:
+            return None
+        i = bisect.bisect_right(self._starts, key) - 1
+        if i < 0:
+            return None
+        _, end, asn, cidx = RECORD.unpack_from(self._mm, HEADER.size + i * RECORD.size)
+        if key > end:
+            return None
+        return {'asn': f'AS{asn}', 'country': self.countries[cidx]}
+
+    def close(self):
+        self._mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Build or query an offline IP -> ASN/country index.')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    b = sub.add_parser('build', help='Build a binary index from a CSV/TSV range dump')
+    b.add_argument('src', help='start,end,asn,country dump (CSV or TSV)')
+    b.add_argument('db', help='Output index path')
+    q = sub.add_parser('lookup', help='Look up one or more IPs')
+    q.add_argument('db', help='Index path')
+    q.add_argument('ips', nargs='+')
+    instrument.add_profile_arguments(ap)
+    args = ap.parse_args()
+    instrument.start_profile(args.profile, args.profile_out)
+    if args.cmd == 'build':
+        src = pathlib.Path(args.src)
+        if not src.exists():
+            ap.error('Source dump does not exist')
+        n = build_index(src, pathlib.Path(args.db))
+        print(f'Wrote index: {args.db} (ranges: {n})')
+    else:
+        with AsnIndex(pathlib.Path(args.db)) as idx:
+            print(json.dumps({ip: idx.lookup(ip) for ip in args.ips}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
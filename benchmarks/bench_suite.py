@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Throughput benchmarks for the toolkit's hot paths on deterministic synthetic data.
+
+Usage: python benchmarks/bench_suite.py                       (all cases, compare with baseline.json)
+       python benchmarks/bench_suite.py --only build_chain,watermark_insert --scale 0.2
+       python benchmarks/bench_suite.py --save-baseline      (record this machine's numbers)
+       python benchmarks/bench_suite.py --json results.json --repeat 3
+Cases:
+  asn_enrich        asn_enrich.enrich over a session log, misses served by a local stub resolver
+  build_chain       log_integrity_chain.build_chain over an evidence log
+  ingest            scripts_doc_processing.ingest over a DOCX/PDF corpus (serial)
+  metadata_collect  metadata_compare.collect over the same corpus
+  watermark_insert  zero_width_watermark.insert (recipient frames) over plain text
+  portal_beacon     portal/asgi_app.py route() + buffered session log writer, drained at the end
+Inputs come from generators.py and are cached in --data-dir (regenerated when --scale or
+--seed change). Each case runs in a fresh process so peak RSS is its own; rows/s, MB/s and
+peak RSS are compared with --baseline, and the exit status is 1 if any case is more than
+--tolerance slower or larger in RSS. Only a baseline recorded at the same --scale is compared:
+fixed startup costs skew throughput at other sizes, so a mismatch just prints a warning.
+"""
+import argparse
+import concurrent.futures
+import csv
+import json
+import multiprocessing
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+import generators  # noqa: E402
+
+BASELINE_PATH = pathlib.Path(__file__).resolve().parent / 'baseline.json'
+DATA_VERSION = 1
+SIZES = {'session_rows': 100_000, 'unique_ips': 2000, 'evidence_rows': 100_000, 'docx': 200, 'pdf': 200,
+         'text_chars': 8_000_000, 'portal_hits': 50_000}
+DEFAULT_TOLERANCE = 0.25
+
+
+def sizes_for(scale: float) -> Dict[str, int]:
+    return {k: max(1, int(v * scale)) for k, v in SIZES.items()}
+
+
+def generate(data_dir: pathlib.Path, scale: float = 1.0, seed: int = 1) -> pathlib.Path:
+    """Write every input under data_dir unless a stamp shows the same scale/seed is already there."""
+    data_dir = pathlib.Path(data_dir)
+    stamp = data_dir / 'generated.json'
+    want = {'version': DATA_VERSION, 'scale': scale, 'seed': seed}
+    if stamp.exists() and json.loads(stamp.read_text())['params'] == want:
+        return data_dir
+    shutil.rmtree(data_dir, ignore_errors=True)
+    data_dir.mkdir(parents=True)
+    n = sizes_for(scale)
+    generators.session_log(data_dir / 'session_log.csv', n['session_rows'], seed, n['unique_ips'])
+    generators.evidence_log(data_dir / 'evidence_log.csv', n['evidence_rows'], seed + 1)
+    generators.text_file(data_dir / 'text.txt', n['text_chars'], seed + 2)
+    generators.corpus(data_dir / 'corpus', n['docx'], n['pdf'], seed + 3)
+    stamp.write_text(json.dumps({'params': want, 'sizes': n}))
+    return data_dir
+
+
+def _read_rows(path: pathlib.Path) -> List[Dict[str, str]]:
+    with path.open(newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def _corpus(data: pathlib.Path) -> List[pathlib.Path]:
+    return sorted((data / 'corpus').iterdir())
+
+
+class _StubServer(ThreadingHTTPServer):
+    # the default backlog of 5 overflows under the case's 8 workers, and every overflowed
+    # connect then waits out a ~1s SYN retry, which would be timed instead of enrichment
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def _stub_resolver():
+    """Local HTTP server answering <base>/<ip>/json/ like ipapi.co."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            ip = self.path.strip('/').split('/')[0]
+            body = json.dumps({'asn': f'AS{64500 + sum(map(int, ip.split(".")))}', 'country_name': 'Benchland'}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    srv = _StubServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+# Each case returns (seconds, rows, bytes) for the timed section only.
+
+def case_asn_enrich(data: pathlib.Path, work: pathlib.Path) -> Tuple[float, int, int]:
+    import asn_enrich
+    rows = _read_rows(data / 'session_log.csv')
+    srv = _stub_resolver()
+    try:
+        t0 = time.perf_counter()
+        asn_enrich.enrich(rows, workers=8, rate=0, base_url=f'http://127.0.0.1:{srv.server_address[1]}', cache={})
+        elapsed = time.perf_counter() - t0
+    finally:
+        srv.shutdown()
+    return elapsed, len(rows), (data / 'session_log.csv').stat().st_size
+
+
+def case_build_chain(data: pathlib.Path, work: pathlib.Path) -> Tuple[float, int, int]:
+    import log_integrity_chain
+    path = data / 'evidence_log.csv'
+    t0 = time.perf_counter()
+    chain = log_integrity_chain.build_chain(path)
+    return time.perf_counter() - t0, len(chain), path.stat().st_size
+
+
+def case_ingest(data: pathlib.Path, work: pathlib.Path) -> Tuple[float, int, int]:
+    import scripts_doc_processing
+    files = _corpus(data)
+    t0 = time.perf_counter()
+    stats = scripts_doc_processing.ingest(files, work / 'evidence_log.csv', 'bench', quiet=True)
+    return time.perf_counter() - t0, stats['logged'], sum(p.stat().st_size for p in files)
+
+
+def case_metadata_collect(data: pathlib.Path, work: pathlib.Path) -> Tuple[float, int, int]:
+    import metadata_compare
+    files = _corpus(data)
+    t0 = time.perf_counter()
+    metas = [metadata_compare.collect(p) for p in files]
+    return time.perf_counter() - t0, len(metas), sum(p.stat().st_size for p in files)
+
+
+def case_watermark_insert(data: pathlib.Path, work: pathlib.Path) -> Tuple[float, int, int]:
+    import zero_width_watermark
+    text = (data / 'text.txt').read_text(encoding='utf-8')
+    t0 = time.perf_counter()
+    zero_width_watermark.insert(text, 3, rid=1042)
+    return time.perf_counter() - t0, text.count('\n'), len(text.encode('utf-8'))
+
+
+def case_portal_beacon(data: pathlib.Path, work: pathlib.Path) -> Tuple[float, int, int]:
+    import importlib
+    portal_dir = work / 'portal'
+    portal_dir.mkdir()
+    os.chdir(portal_dir)  # the app reads logo.png / branding/ and logs to ../session_log.csv
+    for var in ('PORTAL_ASN_INDEX', 'PORTAL_ENRICH_FALLBACK', 'PORTAL_STORE'):
+        os.environ.pop(var, None)
+    app = importlib.reload(importlib.import_module('portal.asgi_app'))  # fresh writer per run
+    hits = json.loads((data / 'generated.json').read_text())['sizes']['portal_hits']
+    rows = _read_rows(data / 'session_log.csv')[:hits]
+    requests = [({'type': 'http', 'method': 'GET', 'path': r['path'], 'client': (r['ip'], 40000)},
+                 {'user-agent': r['ua']}) for r in rows]
+    t0 = time.perf_counter()
+    for scope, headers in requests:
+        app.route(scope, headers)
+    app.LOG_WRITER.close()
+    elapsed = time.perf_counter() - t0
+    return elapsed, len(requests), (work / 'session_log.csv').stat().st_size
+
+
+CASES: Dict[str, Callable] = {
+    'asn_enrich': case_asn_enrich,
+    'build_chain': case_build_chain,
+    'ingest': case_ingest,
+    'metadata_collect': case_metadata_collect,
+    'watermark_insert': case_watermark_insert,
+    'portal_beacon': case_portal_beacon,
+}
+
+
+def peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - Windows
+        return 0.0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if sys.platform == 'darwin' else rss / 1024  # bytes on macOS, KiB elsewhere
+
+
+def run_case(name: str, data_dir: str) -> Dict:
+    """Run one case in a scratch directory and return its metrics."""
+    cwd = os.getcwd()
+    work = pathlib.Path(tempfile.mkdtemp(prefix=f'bench_{name}_'))
+    try:
+        seconds, rows, nbytes = CASES[name](pathlib.Path(data_dir), work)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work, ignore_errors=True)
+    seconds = max(seconds, 1e-9)
+    return {'case': name, 'seconds': round(seconds, 4), 'rows': rows, 'mb': round(nbytes / 1e6, 3),
+            'rows_per_s': round(rows / seconds, 1), 'mb_per_s': round(nbytes / 1e6 / seconds, 3),
+            'peak_rss_mb': round(peak_rss_mb(), 1)}
+
+
+def run_isolated(name: str, data_dir: pathlib.Path) -> Dict:
+    """run_case in a fresh interpreter, so peak RSS covers this case only."""
+    ctx = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+        return ex.submit(run_case, name, str(data_dir)).result()
+
+
+def best_of(results: List[Dict]) -> Dict:
+    best = max(results, key=lambda r: r['rows_per_s'])
+    return dict(best, peak_rss_mb=max(r['peak_rss_mb'] for r in results))
+
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float = DEFAULT_TOLERANCE, scale: float = 1.0) -> List[str]:
+    """Regression messages for cases slower than baseline*(1-tolerance) or with peak RSS above
+    baseline*(1+tolerance). Empty unless the baseline was recorded at the same scale."""
+    if baseline.get('scale') != scale:
+        return []
+    cases = baseline.get('cases', {})
+    out = []
+    for r in results:
+        base = cases.get(r['case'])
+        if not base:
+            continue
+        for key in ('rows_per_s', 'mb_per_s'):
+            if base.get(key) and r[key] < base[key] * (1 - tolerance):
+                out.append(f"{r['case']}: {key} {r[key]:g} vs baseline {base[key]:g} ({r[key] / base[key] - 1:+.0%})")
+        if base.get('peak_rss_mb') and r['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            out.append(f"{r['case']}: peak_rss_mb {r['peak_rss_mb']:g} vs baseline {base['peak_rss_mb']:g} "
+                       f"({r['peak_rss_mb'] / base['peak_rss_mb'] - 1:+.0%})")
+    return out
+
+
+def format_table(results: List[Dict], baseline: Dict) -> str:
+    cases = baseline.get('cases', {})
+    lines = [f"{'case':<18}{'rows':>9}{'sec':>9}{'rows/s':>12}{'MB/s':>9}{'RSS MB':>9}{'vs base':>9}"]
+    for r in results:
+        base = cases.get(r['case'], {}).get('rows_per_s')
+        delta = f"{r['rows_per_s'] / base - 1:+.0%}" if base else '-'
+        lines.append(f"{r['case']:<18}{r['rows']:>9}{r['seconds']:>9.3f}{r['rows_per_s']:>12.0f}"
+                     f"{r['mb_per_s']:>9.2f}{r['peak_rss_mb']:>9.1f}{delta:>9}")
+    return '\n'.join(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark the toolkit hot paths on synthetic data.')
+    ap.add_argument('--only', help='Comma-separated cases (default all): ' + ','.join(CASES))
+    ap.add_argument('--scale', type=float, default=1.0, help='Multiply every input size (default 1.0)')
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--data-dir', default=str(pathlib.Path(tempfile.gettempdir()) / 'counter_scam_bench'),
+                    help='Where generated inputs are cached')
+    ap.add_argument('--repeat', type=int, default=1, help='Runs per case; the fastest is reported')
+    ap.add_argument('--baseline', default=str(BASELINE_PATH), help='Baseline JSON to compare against')
+    ap.add_argument('--save-baseline', action='store_true', help='Write these results to --baseline')
+    ap.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='Allowed slowdown fraction (default 0.25)')
+    ap.add_argument('--in-process', action='store_true', help='Run cases in this process (peak RSS is cumulative)')
+    ap.add_argument('--json', help='Also write results as JSON here')
+    args = ap.parse_args()
+    names = args.only.split(',') if args.only else list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        ap.error(f"unknown case(s): {', '.join(unknown)}")
+    data_dir = generate(pathlib.Path(args.data_dir), args.scale, args.seed)
+    runner = run_case if args.in_process else run_isolated
+    results = [best_of([runner(name, data_dir) for _ in range(max(1, args.repeat))]) for name in names]
+    baseline_path = pathlib.Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    print(format_table(results, baseline))
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps({'scale': args.scale, 'results': results}, indent=2))
+    if args.save_baseline:
+        cases = dict(baseline.get('cases', {})) if baseline.get('scale') == args.scale else {}
+        cases.update({r['case']: {k: r[k] for k in ('rows_per_s', 'mb_per_s', 'peak_rss_mb')} for r in results})
+        baseline_path.write_text(json.dumps({'scale': args.scale, 'python': sys.version.split()[0], 'cases': cases},
+                                            indent=2) + '\n')
+        print(f'Wrote baseline: {baseline_path}')
+        return
+    regressions = compare(results, baseline, args.tolerance, args.scale)
+    if not baseline:
+        print('No baseline to compare against (run with --save-baseline).')
+    elif baseline.get('scale') != args.scale:
+        print(f"Baseline was recorded at --scale {baseline.get('scale')}, not {args.scale}: not compared.")
+    for msg in regressions:
+        print(f'REGRESSION {msg}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
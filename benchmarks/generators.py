@@ -0,0 +1,156 @@
+"""Deterministic synthetic data for the benchmark suite (same seed + size -> same bytes).
+
+Session logs, evidence logs, DOCX / PDF corpora and plain text are generated with
+random.Random(seed) only, so two machines benchmark identical inputs. DOCX files are
+written as bare OOXML zips and PDFs as classic-xref files with an Info dictionary, so
+no python-docx / pypdf is needed to build the corpora.
+"""
+import csv
+import datetime
+import io
+import pathlib
+import random
+import zipfile
+from typing import List
+
+from asn_enrich import SESSION_FIELDS
+from scripts_doc_processing import LOG_FIELDS as EVIDENCE_FIELDS
+
+EPOCH = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+UAS = ['Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/124.0 Safari/537.36',
+       'Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148',
+       'Microsoft Office/16.0 (Windows NT 10.0; Microsoft Outlook 16.0.17328; Pro)',
+       'WhatsApp/2.24.8.78 A']
+AUTHORS = ['Alice', 'Bob', 'jdoe', 'Admin', 'User', 'HP', 'Dell', 'Finance Team']
+APPS = [('Microsoft Office Word', '16.0000'), ('LibreOffice/7.6', '7.6'), ('WPS Office', '11.2'), ('Google Docs', '1.0')]
+PRODUCERS = ['Microsoft\\256 Word 2016', 'Skia/PDF m124', 'LibreOffice 7.6', 'iLovePDF', 'macOS Quartz PDFContext']
+WORDS = ('payment wallet transfer agreement invoice account verify urgent client office signature scope '
+         'compensation schedule deposit release fee escrow confirm document').split()
+CHANNELS = ['whatsapp', 'email', 'telegram', 'sms']
+
+
+def _ts(rng: random.Random, i: int) -> str:
+    return (EPOCH + datetime.timedelta(seconds=i * 7 + rng.randrange(7))).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def ip_pool(rng: random.Random, n: int) -> List[str]:
+    return [f'{rng.choice((23, 41, 102, 185, 196))}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}'
+            for _ in range(n)]
+
+
+def token_pool(rng: random.Random, n: int) -> List[str]:
+    return [''.join(rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ23456789') for _ in range(10)) for _ in range(n)]
+
+
+def session_log(path: pathlib.Path, rows: int, seed: int = 1, unique_ips: int = 2000, tokens: int = 200):
+    """Portal hits with blank asn/country, IPs drawn from a fixed pool (repeat visitors)."""
+    rng = random.Random(seed)
+    ips, toks = ip_pool(rng, unique_ips), token_pool(rng, tokens)
+    with pathlib.Path(path).open('w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(SESSION_FIELDS)
+        for i in range(rows):
+            tok = rng.choice(toks) if rng.random() < 0.8 else ''
+            w.writerow([_ts(rng, i), rng.choice(ips), '', '', rng.choice(UAS),
+                        f'/branding/{tok}.png' if tok else '/logo.png', tok, ''])
+
+
+def evidence_log(path: pathlib.Path, rows: int, seed: int = 2):
+    rng = random.Random(seed)
+    with pathlib.Path(path).open('w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(EVIDENCE_FIELDS)
+        for i in range(rows):
+            sha = '%064x' % rng.getrandbits(256)
+            app, ver = rng.choice(APPS)
+            kind = rng.choice(('docx', 'pdf'))
+            w.writerow([sha[:12], _ts(rng, i), sha, rng.choice(CHANNELS), kind, f'Agreement_v{i}.{kind}',
+                        rng.choice(AUTHORS), rng.choice(AUTHORS), app, ver, ''])
+
+
+def sentences(rng: random.Random, n: int) -> str:
+    out = []
+    for _ in range(n):
+        words = [rng.choice(WORDS) for _ in range(rng.randrange(6, 18))]
+        out.append(' '.join(words).capitalize() + rng.choice('..!?'))
+    return ' '.join(out)
+
+
+def text_file(path: pathlib.Path, chars: int, seed: int = 3):
+    rng = random.Random(seed)
+    with pathlib.Path(path).open('w', encoding='utf-8', newline='') as f:
+        written = 0
+        while written < chars:
+            para = sentences(rng, 20) + '\n\n'
+            f.write(para)
+            written += len(para)
+
+
+def docx_bytes(rng: random.Random, body_sentences: int = 200) -> bytes:
+    creator, editor = rng.choice(AUTHORS), rng.choice(AUTHORS)
+    app, ver = rng.choice(APPS)
+    rsids = ['%08X' % rng.getrandbits(32) for _ in range(rng.randrange(1, 12))]
+    w = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+    parts = {
+        '[Content_Types].xml': '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>',
+        'docProps/core.xml': (
+            '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/">'
+            f'<dc:creator>{creator}</dc:creator><cp:lastModifiedBy>{editor}</cp:lastModifiedBy>'
+            f'<cp:revision>{rng.randrange(1, 40)}</cp:revision>'
+            f'<dcterms:created>{_ts(rng, rng.randrange(100000))}</dcterms:created></cp:coreProperties>'),
+        'docProps/app.xml': (
+            '<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+            f'<Template>Normal.dotm</Template><Application>{app}</Application><AppVersion>{ver}</AppVersion>'
+            '</Properties>'),
+        'word/settings.xml': (
+            f'<w:settings xmlns:w="{w}"><w:rsids><w:rsidRoot w:val="{rsids[0]}"/>'
+            + ''.join(f'<w:rsid w:val="{r}"/>' for r in rsids) + '</w:rsids></w:settings>'),
+        'word/document.xml': (
+            f'<w:document xmlns:w="{w}"><w:body>'
+            + ''.join(f'<w:p><w:r><w:t>{sentences(rng, 5)}</w:t></w:r></w:p>' for _ in range(body_sentences // 5))
+            + '</w:body></w:document>'),
+    }
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as z:
+        for name, data in parts.items():
+            z.writestr(zipfile.ZipInfo(name, date_time=(2025, 1, 1, 0, 0, 0)), data, zipfile.ZIP_DEFLATED)
+    return buf.getvalue()
+
+
+def pdf_bytes(rng: random.Random, pages_kb: int = 64) -> bytes:
+    """Classic-xref PDF: catalog, pages, an Info dictionary and an opaque content stream."""
+    content = rng.randbytes(pages_kb * 1024)
+    info = (b'<< /Title (Agreement %d) /Author (%s) /Creator (%s) /Producer (%s) /CreationDate (D:2025%02d%02d101500Z) >>'
+            % (rng.randrange(1000), rng.choice(AUTHORS).encode(), rng.choice(APPS)[0].encode(),
+               rng.choice(PRODUCERS).encode(), rng.randrange(1, 13), rng.randrange(1, 29)))
+    objects = {1: b'<< /Type /Catalog /Pages 2 0 R >>',
+               2: b'<< /Type /Pages /Kids [] /Count 0 >>',
+               3: info,
+               4: b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream'}
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = {}
+    for num, body in objects.items():
+        offsets[num] = len(out)
+        out += b'%d 0 obj\n' % num + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 5\n0000000000 65535 f \n' + b''.join(b'%010d 00000 n \n' % offsets[n] for n in range(1, 5))
+    out += b'trailer\n<< /Size 5 /Root 1 0 R /Info 3 0 R >>\nstartxref\n%d\n%%%%EOF\n' % xref
+    return bytes(out)
+
+
+def corpus(out_dir: pathlib.Path, docx: int, pdf: int, seed: int = 4) -> List[pathlib.Path]:
+    """Write `docx` DOCX and `pdf` PDF files into out_dir."""
+    rng = random.Random(seed)
+    out_dir = pathlib.Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(docx):
+        p = out_dir / f'Agreement_{i:05d}.docx'
+        p.write_bytes(docx_bytes(rng))
+        paths.append(p)
+    for i in range(pdf):
+        p = out_dir / f'Statement_{i:05d}.pdf'
+        p.write_bytes(pdf_bytes(rng))
+        paths.append(p)
+    return paths
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Correlate portal sessions, campaign tokens, artifacts and wallets into one entity graph.
+
+Usage:
+  ./correlate.py --op counter_scam_op --out graph.json
+  ./correlate.py --session session_log.csv --evidence evidence_log.csv --wallet wallet_log.csv \
+                 --manifest lures/manifest.csv --window 30 --out graph.json
+
+Entities are deduplicated by id in a dict and timestamped rows kept as per-log event lists. Links:
+  ip -> token        portal hit on /branding/<token>.png (count, first/last seen)
+  ip -> asn          from the enriched session log
+  artifact -> token  a known token appears in the evidence row (file name, notes)
+  artifact -> ip     portal hit within --window minutes of the artifact being logged
+  wallet -> ip       portal hit within --window minutes of the wallet being captured
+  wallet -> artifact wallet captured within --window minutes of an artifact
+Temporal links use a sort-merge window join (both sides sorted by time, two pointers),
+never a nested loop. Connected entities are grouped with union-find into `components`.
+Tokens from a create_sample_agreement.py batch manifest are added even if never hit.
+"""
+import argparse
+import csv
+import json
+import pathlib
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import instrument
+from csv_stream import LOG_FILES, parse_utc
+from union_find import UnionFind
+
+DEFAULT_WINDOW_MIN = 30
+WORD_RE = re.compile(r'[A-Za-z0-9_-]+')
+SEP_RE = re.compile(r'[_-]')
+
+
+class Event(NamedTuple):
+    t: float
+    node: str  # entity id, e.g. 'ip:203.0.113.5'
+    ts: str    # original timestamp text
+
+
+def token_candidates(text: str) -> set:
+    """Every run of consecutive _/- separated pieces of each word, so a token is found inside
+    names like Agreement_<token>_signed.docx with set lookups instead of a substring scan."""
+    out = set()
+    for word in WORD_RE.findall(text):
+        pieces = SEP_RE.split(word)
+        seps = SEP_RE.findall(word)
+        for i in range(len(pieces)):
+            cand = pieces[i]
+            out.add(cand)
+            for j in range(i + 1, min(len(pieces), i + 8)):
+                cand += seps[j - 1] + pieces[j]
+                out.add(cand)
+    return out
+
+
+def window_join(left: List[Event], right: List[Event], before: float, after: float) -> Iterator[Tuple[Event, Event]]:
+    """Pairs (l, r) with l.t - before <= r.t <= l.t + after. Both lists must be sorted by t;
+    the right-hand pointer only moves forward, so the cost is O(len(left) + len(right) + pairs)."""
+    lo = 0
+    n = len(right)
+    for l in left:
+        while lo < n and right[lo].t < l.t - before:
+            lo += 1
+        j = lo
+        while j < n and right[j].t <= l.t + after:
+            yield l, right[j]
+            j += 1
+
+
+class Correlator:
+    def __init__(self, window_s: float = DEFAULT_WINDOW_MIN * 60):
+        self.window = window_s
+        self.nodes: Dict[str, Dict] = {}
+        self.edges: Dict[Tuple[str, str, str], Dict] = {}
+        self.hits: List[Event] = []       # portal hits (ip nodes)
+        self.artifacts: List[Event] = []  # evidence rows (artifact nodes)
+        self.wallets: List[Event] = []    # wallet captures (wallet nodes)
+
+    def node(self, kind: str, key: str, **attrs) -> str:
+        nid = f'{kind}:{key}'
+        entry = self.nodes.setdefault(nid, {'id': nid, 'type': kind})
+        for k, v in attrs.items():
+            if v:
+                entry.setdefault(k, v)
+        return nid
+
+    def link(self, src: str, dst: str, kind: str, ts: str = '', delta: Optional[float] = None):
+        e = self.edges.setdefault((src, dst, kind), {'source': src, 'target': dst, 'type': kind, 'count': 0,
+                                                     'first': '', 'last': ''})
+        e['count'] += 1
+        if ts:
+            e['first'] = min(e['first'], ts) if e['first'] else ts
+            e['last'] = max(e['last'], ts)
+        if delta is not None:
+            d = round(abs(delta), 1)
+            e['min_delta_s'] = min(e.get('min_delta_s', d), d)
+
+    def add_sessions(self, rows: Iterable[Dict[str, str]]):
+        for r in rows:
+            ip = (r.get('ip') or r.get('remote_ip') or '').strip()
+            if not ip:
+                continue
+            ts = r.get('utc_timestamp', '').strip()
+            ip_node = self.node('ip', ip, country=r.get('country', '').strip())
+            asn = r.get('asn', '').strip()
+            if asn:
+                self.link(ip_node, self.node('asn', asn), 'announced_by')
+            token = r.get('token', '').strip()
+            if token:
+                self.link(ip_node, self.node('token', token), 'hit', ts)
+            t = parse_utc(ts)
+            if t is not None:
+                self.hits.append(Event(t, ip_node, ts))
+
+    def add_manifest(self, rows: Iterable[Dict[str, str]]):
+        for r in rows:
+            token = r.get('token', '').strip()
+            if token:
+                self.node('token', token, lure_file=r.get('file', ''), watermark_id=r.get('watermark_id', ''))
+
+    def add_evidence(self, rows: Iterable[Dict[str, str]]):
+        tokens = {nid.split(':', 1)[1] for nid, n in self.nodes.items() if n['type'] == 'token'}
+        for r in rows:
+            sha = r.get('sha256', '').strip()
+            if not sha:
+                continue
+            ts = r.get('utc_timestamp', '').strip()
+            art = self.node('artifact', sha, file=r.get('original_filename', ''), file_type=r.get('type', ''),
+                            creator=r.get('creator', ''))
+            text = ' '.join(r.get(k, '') for k in ('original_filename', 'notes'))
+            for word in token_candidates(text) & tokens:
+                self.link(art, self.node('token', word), 'carries', ts)
+            t = parse_utc(ts)
+            if t is not None:
+                self.artifacts.append(Event(t, art, ts))
+
+    def add_wallets(self, rows: Iterable[Dict[str, str]]):
+        for r in rows:
+            addr = r.get('address', '').strip()
+            if not addr:
+                continue
+            ts = r.get('utc_timestamp', '').strip()
+            node = self.node('wallet', addr, chain=r.get('chain', ''))
+            t = parse_utc(ts)
+            if t is not None:
+                self.wallets.append(Event(t, node, ts))
+
+    def join(self):
+        """Windowed temporal links (sort-merge)."""
+        hits = sorted(self.hits)
+        arts = sorted(self.artifacts)
+        wallets = sorted(self.wallets)
+        for left, right, kind in ((arts, hits, 'near_hit'), (wallets, hits, 'near_hit'), (wallets, arts, 'near_artifact')):
+            for l, r in window_join(left, right, self.window, self.window):
+                self.link(l.node, r.node, kind, r.ts, r.t - l.t)
+
+    def graph(self) -> Dict:
+        self.join()
+        ids = {nid: i for i, nid in enumerate(self.nodes)}
+        uf = UnionFind(len(ids))
+        for src, dst, _ in self.edges:
+            uf.union(ids[src], ids[dst])
+        names = list(self.nodes)
+        components = sorted(([names[i] for i in members] for members in uf.groups().values() if len(members) > 1),
+                            key=lambda c: (-len(c), c[0]))
+        return {'window_minutes': self.window / 60, 'nodes': list(self.nodes.values()),
+                'edges': list(self.edges.values()), 'components': components}
+
+
+def read_csv(path: Optional[pathlib.Path]) -> Iterator[Dict[str, str]]:
+    if path is None or not path.exists():
+        return iter(())
+    with path.open(newline='', encoding='utf-8', errors='replace') as f:
+        yield from csv.DictReader(f)
+
+
+def correlate(session: Optional[pathlib.Path] = None, evidence: Optional[pathlib.Path] = None,
+              wallet: Optional[pathlib.Path] = None, manifest: Optional[pathlib.Path] = None,
+              window_min: float = DEFAULT_WINDOW_MIN) -> Dict:
+    c = Correlator(window_min * 60)
+    c.add_manifest(read_csv(manifest))
+    c.add_sessions(read_csv(session))
+    c.add_evidence(read_csv(evidence))  # after sessions/manifest: needs the known token set
+    c.add_wallets(read_csv(wallet))
+    return c.graph()
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Build a linked entity graph from the operation logs')
+    ap.add_argument('--op', help='Operation directory holding session_log.csv, evidence_log.csv, wallet_log.csv')
+    ap.add_argument('--session')
+    ap.add_argument('--evidence')
+    ap.add_argument('--wallet')
+    ap.add_argument('--manifest', help='create_sample_agreement.py batch manifest.csv (token list)')
+    ap.add_argument('--window', type=float, default=DEFAULT_WINDOW_MIN, help='Temporal join window in minutes (default 30)')
+    ap.add_argument('--out', help='Write graph JSON here (default stdout)')
+    instrument.add_profile_arguments(ap)
+    args = ap.parse_args()
+    instrument.start_profile(args.profile, args.profile_out)
+    op = pathlib.Path(args.op) if args.op else None
+    def pick(explicit, kind):
+        if explicit:
+            return pathlib.Path(explicit)
+        return op / LOG_FILES[kind] if op else None
+    graph = correlate(pick(args.session, 'session'), pick(args.evidence, 'evidence'), pick(args.wallet, 'wallet'),
+                      pathlib.Path(args.manifest) if args.manifest else None, args.window)
+    text = json.dumps(graph, indent=2)
+    if args.out:
+        pathlib.Path(args.out).write_text(text)
+        print(f"Wrote {len(graph['nodes'])} nodes, {len(graph['edges'])} edges, "
+              f"{len(graph['components'])} linked groups to {args.out}")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
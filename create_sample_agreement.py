@@ -4,12 +4,19 @@ Requires: python-docx (install from requirements.txt)
 
 Usage:
   ./create_sample_agreement.py --out Agreement_v1.docx --campaign TOKEN123
+  ./create_sample_agreement.py --tokens tokens.txt --out-dir lures/ --workers 8 [--watermark --interval 3]
 
 What it does:
   - Creates headings & placeholder body text
   - Inserts a footer with remote logo URL containing campaign token
   - Adds signature block placeholders
 
+Batch mode (--tokens, one token or "token,id" per line): python-docx builds the skeleton
+once with a placeholder token; every variant is then produced by copying the pre-compressed
+unchanged zip members and writing only the patched footer part (plus word/document.xml
+when --watermark embeds the per-recipient zero-width ID from zero_width_watermark.py).
+Variants are written in parallel (--workers) and listed in <out-dir>/manifest.csv.
+
 Manual follow-up (cannot be automated reliably here):
   - Insert Table of Contents (after opening in Word / LibreOffice)
   - Add cross-references between headings
@@ -17,12 +24,25 @@ Manual follow-up (cannot be automated reliably here):
   - Optionally embed zero-width watermark using zero_width_watermark.py
 """
 import argparse
+import csv
 import datetime
+import io
 import pathlib
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import instrument
+import zero_width_watermark as zw
 try:
     from docx import Document  # type: ignore
-except ImportError as e:  # pragma: no cover
-    raise SystemExit('python-docx not installed. Run: pip install python-docx')
+except ImportError:  # pragma: no cover
+    Document = None
+
+PLACEHOLDER = 'CAMPAIGNTOKENPLACEHOLDER'
+TOKEN_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')  # same rule as the portal's /branding/<token>.png
+W_TEXT = re.compile(r'(<w:t(?:\s[^>]*)?>)([^<]*)(</w:t>)')
 
 def build(doc: 'Document', campaign_token: str):
     doc.add_heading('Agreement', 0)
@@ -43,11 +63,118 @@ def build(doc: 'Document', campaign_token: str):
     footer_para = footer.paragraphs[0]
     footer_para.text = f'Remote logo: https://cdn.company-docs.com/branding/{campaign_token}.png'
 
+class Template(NamedTuple):
+    base: bytes  # zip of every member that is the same in all variants
+    parts: Dict[str, Tuple[zipfile.ZipInfo, List[str]]]  # patched member -> pieces joined by the ID frame
+
+def skeleton() -> bytes:
+    """The agreement built once by python-docx with PLACEHOLDER as campaign token."""
+    doc = Document()
+    build(doc, PLACEHOLDER)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+def _mark_slots(xml: str, interval: int) -> List[str]:
+    """Split document.xml so that frame.join(pieces) watermarks the visible text (<w:t> runs)
+    after every `interval`-th sentence end, counted across runs."""
+    nodes = list(W_TEXT.finditer(xml))
+    out, cur, prev = [], '', 0
+    for m, pieces in zip(nodes, zw.split_marks([m.group(2) for m in nodes], interval)):
+        cur += xml[prev:m.start(2)] + pieces[0]
+        for p in pieces[1:]:
+            out.append(cur)
+            cur = p
+        prev = m.end(2)
+    out.append(cur + xml[prev:])
+    return out
+
+def make_template(docx: bytes, watermark_interval: Optional[int] = None) -> Template:
+    """Compress the invariant members once; keep the parts holding PLACEHOLDER (the footer)
+    and, with a watermark, word/document.xml as text to patch per variant."""
+    base = io.BytesIO()
+    parts = {}
+    with zipfile.ZipFile(io.BytesIO(docx)) as src, zipfile.ZipFile(base, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            data = src.read(info)
+            text = data.decode('utf-8') if info.filename.endswith('.xml') else None
+            marked = bool(watermark_interval) and info.filename == 'word/document.xml'
+            if text is not None and (marked or PLACEHOLDER in text):
+                parts[info.filename] = (info, _mark_slots(text, watermark_interval) if marked else [text])
+            else:
+                dst.writestr(info, data, zipfile.ZIP_DEFLATED)
+    if not any(PLACEHOLDER in ''.join(p) for _, p in parts.values()):
+        raise ValueError('campaign placeholder not found in the skeleton')
+    return Template(base.getvalue(), parts)
+
+def render(template: Template, token: str, rid: Optional[int] = None) -> bytes:
+    """One variant: the shared members plus the patched parts, appended to a copy of the base zip."""
+    buf = io.BytesIO(template.base)
+    frame = zw.encode_id(rid) if rid is not None else ''
+    with zipfile.ZipFile(buf, 'a', zipfile.ZIP_DEFLATED) as z:
+        for name, (info, pieces) in template.parts.items():
+            z.writestr(info, frame.join(pieces).replace(PLACEHOLDER, token).encode('utf-8'), zipfile.ZIP_DEFLATED)
+    return buf.getvalue()
+
+_TEMPLATE = None
+
+def _init_worker(template: Template):
+    global _TEMPLATE
+    _TEMPLATE = template
+
+def _write_variant(job: Tuple[str, Optional[int], str]) -> str:
+    token, rid, path = job
+    pathlib.Path(path).write_bytes(render(_TEMPLATE, token, rid))
+    return path
+
+def generate_batch(template: Template, tokens: List[Tuple[str, int]], out_dir: pathlib.Path, prefix: str = 'Agreement',
+                   watermark: bool = False, workers: int = 1) -> List[Dict[str, str]]:
+    """Write one DOCX per token (in a process pool when workers > 1) and <out_dir>/manifest.csv."""
+    out_dir = pathlib.Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for token, _ in tokens:
+        if not TOKEN_RE.match(token):
+            raise ValueError(f'invalid token {token!r} (allowed: A-Z a-z 0-9 _ -, up to 64 chars)')
+    jobs = [(token, rid if watermark else None, str(out_dir / f'{prefix}_{token}.docx')) for token, rid in tokens]
+    if workers <= 1:
+        _init_worker(template)
+        list(map(_write_variant, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(template,)) as ex:
+            list(ex.map(_write_variant, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    manifest = [{'token': t, 'watermark_id': '' if r is None else str(r), 'file': pathlib.Path(p).name}
+                for t, r, p in jobs]
+    with (out_dir / 'manifest.csv').open('w', newline='', encoding='utf-8') as f:
+        w = csv.DictWriter(f, fieldnames=['token', 'watermark_id', 'file'])
+        w.writeheader()
+        w.writerows(manifest)
+    return manifest
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument('--out', required=True, help='Output DOCX path')
-    ap.add_argument('--campaign', required=True, help='Campaign token for footer logo URL')
+    ap.add_argument('--out', help='Output DOCX path')
+    ap.add_argument('--campaign', help='Campaign token for footer logo URL')
+    ap.add_argument('--tokens', help='Batch: file with one token (or token,id) per line')
+    ap.add_argument('--out-dir', help='Batch: output directory (files <prefix>_<token>.docx + manifest.csv)')
+    ap.add_argument('--prefix', default='Agreement', help='Batch: output file name prefix')
+    ap.add_argument('--workers', type=int, default=1, help='Batch: worker processes')
+    ap.add_argument('--watermark', action='store_true', help='Batch: embed the per-token zero-width ID in the body text')
+    ap.add_argument('--interval', type=int, default=3, help='Watermark every N sentences (default 3)')
+    instrument.add_profile_arguments(ap)
     args = ap.parse_args()
+    instrument.start_profile(args.profile, args.profile_out)
+    if Document is None:
+        raise SystemExit('python-docx not installed. Run: pip install python-docx')
+    if args.tokens:
+        if not args.out_dir:
+            ap.error('--tokens requires --out-dir')
+        template = make_template(skeleton(), args.interval if args.watermark else None)
+        manifest = generate_batch(template, zw.read_recipients(pathlib.Path(args.tokens)), pathlib.Path(args.out_dir),
+                                  args.prefix, args.watermark, args.workers)
+        print(f'Wrote {len(manifest)} agreements to {args.out_dir} (manifest.csv)')
+        return
+    if not args.out or not args.campaign:
+        ap.error('--out and --campaign are required (or use --tokens/--out-dir)')
     outp = pathlib.Path(args.out)
     doc = Document()
     build(doc, args.campaign)
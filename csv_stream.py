@@ -0,0 +1,211 @@
+"""Streaming CSV helpers shared by the log-processing scripts.
+
+- iter_records(): read CSV records from a byte offset, reporting the offset after each
+  record so callers can persist a watermark and resume on newly appended rows only
+- chunked(): bounded batches from any iterator
+- atomic_writer(): write through a temp file in the same directory, then rename
+- load_state() / save_state(): small JSON sidecar files for watermarks and counters
+- prefix_fingerprint(): cheap check that the bytes before a watermark were not rewritten
+- parse_utc(): the logs' utc_timestamp (ISO 8601, naive = UTC) or an epoch number as epoch seconds
+- transform_file(): the chunked, resumable CSV -> CSV driver behind asn_enrich.py and
+  wallet_enrich.py (the caller supplies the per-chunk row function)
+- LOG_FILES: file names of the operation logs inside an operation directory
+"""
+import contextlib
+import csv
+import datetime
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+LOG_FILES = {'evidence': 'evidence_log.csv', 'session': 'session_log.csv', 'wallet': 'wallet_log.csv',
+             'branch': 'branch_events.csv'}
+
+
+class _LineFeed:
+    """Iterates decoded lines of a binary file while tracking the byte position consumed."""
+    def __init__(self, f, pos: int, complete_only: bool):
+        self.f = f
+        self.pos = pos
+        self.complete_only = complete_only
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        raw = self.f.readline()
+        if not raw or (self.complete_only and not raw.endswith(b'\n')):
+            raise StopIteration  # EOF, or a partially written trailing line
+        self.pos += len(raw)
+        return raw.decode('utf-8', 'replace')
+
+
+def parse_utc(value) -> Optional[float]:
+    """Epoch seconds for an ISO 8601 timestamp ('Z' or an offset; naive means UTC) or an epoch
+    number (int, float or digit string); None for blank or unparseable values."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    v = str(value or '').strip()
+    if not v:
+        return None
+    if v.replace('.', '', 1).isdigit():
+        return float(v)
+    try:
+        dt = datetime.datetime.fromisoformat(v.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.timestamp()
+
+
+def read_header(path: pathlib.Path) -> Tuple[List[str], int]:
+    """Return (fieldnames, byte offset of the first data record)."""
+    for rec, end in iter_records(path, 0):
+        return rec, end
+    return [], 0
+
+
+def iter_records(path: pathlib.Path, offset: int = 0, complete_only: bool = False) -> Iterator[Tuple[List[str], int]]:
+    """Yield (fields, end_offset) for each CSV record starting at byte `offset`.
+
+    Quoted fields spanning several lines are handled (csv pulls only the lines a
+    record needs, so end_offset is exact). With complete_only, a trailing line
+    without a newline is left for the next run instead of being consumed.
+    """
+    with pathlib.Path(path).open('rb') as f:
+        f.seek(offset)
+        feed = _LineFeed(f, offset, complete_only)
+        for rec in csv.reader(feed):
+            yield rec, feed.pos
+
+
+def chunked(iterable, size: int) -> Iterator[list]:
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+@contextlib.contextmanager
+def atomic_writer(path: pathlib.Path):
+    """Open a temp file next to `path` for text writing; rename over `path` on success.
+    The result keeps the permissions of the file it replaces (umask default for new files),
+    not mkstemp's 0600."""
+    path = pathlib.Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=str(path.parent or '.'))
+    try:
+        try:
+            mode = path.stat().st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o666 & ~_umask()
+        os.fchmod(fd, mode)
+        with open(fd, 'w', newline='', encoding='utf-8') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+
+
+def load_state(path: pathlib.Path) -> dict:
+    try:
+        return json.loads(pathlib.Path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(path: pathlib.Path, state: dict):
+    path = pathlib.Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, path)
+
+
+def prefix_fingerprint(path: pathlib.Path, offset: int, window: int = 4096) -> str:
+    """sha256 of the first and the last `window` bytes before `offset`: a log rewritten to
+    the same or a larger size almost surely changes one of them. Reads at most 2*window bytes."""
+    with pathlib.Path(path).open('rb') as f:
+        head = f.read(min(window, offset))
+        f.seek(max(0, offset - window))
+        tail = f.read(offset - f.tell())
+    return hashlib.sha256(head + b'\x00' + tail).hexdigest()
+
+
+def state_path_for(outp: pathlib.Path) -> pathlib.Path:
+    return outp.with_name(outp.name + '.state.json')
+
+
+def transform_file(inp: pathlib.Path, outp: pathlib.Path, fields: List[str],
+                   process: Callable[[List[Dict[str, str]]], List[Dict[str, str]]],
+                   chunk_size: int = 5000, incremental: bool = False) -> int:
+    """Stream `inp` through `process` (a list of row dicts in, rows to write out) in chunks of
+    `chunk_size` rows and write `outp` with columns `fields`. Returns rows processed this run.
+
+    Full runs write atomically (temp file + rename). With `incremental`, the state file
+    <out>.state.json holds the input byte watermark and the output size it corresponds to;
+    a resumed run truncates `outp` back to that size (dropping rows from a run that died
+    before saving its state), appends only the rows added to `inp` since, and then saves
+    the new state, so each run costs O(new rows) and a crash never duplicates rows.
+    """
+    inp, outp = pathlib.Path(inp), pathlib.Path(outp)
+    fieldnames, data_start = read_header(inp)
+    state_path = state_path_for(outp)
+    state = load_state(state_path) if incremental else {}
+    out_size = outp.stat().st_size if outp.exists() else -1
+    resume = (incremental
+              and state.get('input') == str(inp.resolve())
+              and state.get('header') == fieldnames
+              and data_start <= state.get('offset', -1) <= inp.stat().st_size
+              and 0 < state.get('out_size', -1) <= out_size)
+    offset = state['offset'] if resume else data_start
+    processed = 0
+
+    def write_rows(f):
+        nonlocal offset, processed
+        w = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        if not resume:
+            w.writeheader()
+        for batch in chunked(iter_records(inp, offset, complete_only=incremental), chunk_size):
+            rows = []
+            for rec, end in batch:
+                offset = end
+                if not rec:
+                    continue  # blank line
+                row = dict(zip(fieldnames, rec))
+                for n in fields:
+                    row.setdefault(n, '')
+                rows.append(row)
+            w.writerows(process(rows))
+            processed += len(rows)
+
+    if resume:
+        with outp.open('r+', newline='', encoding='utf-8') as f:
+            f.truncate(state['out_size'])
+            f.seek(state['out_size'])
+            write_rows(f)
+            f.flush()
+            os.fsync(f.fileno())
+    else:
+        with atomic_writer(outp) as f:
+            write_rows(f)
+    if incremental:
+        save_state(state_path, {'input': str(inp.resolve()), 'header': fieldnames, 'offset': offset,
+                                'out_size': outp.stat().st_size,
+                                'rows': (state.get('rows', 0) if resume else 0) + processed})
+    return processed
@@ -2,10 +2,30 @@
 """Suggest next operational branch based on current pivot inventory.
 Inputs (CLI args or prompt): counts of docx_versions, pdf_versions, portals_hit, wallet_addresses, sessions, branch_events.
 Heuristics output JSON with priority ordered actions.
+
+Counts can instead be derived from an operation directory's logs (--op DIR, repeatable for
+a batch of operations): evidence_log.csv, session_log.csv, wallet_log.csv, branch_events.csv.
+  docx / pdf   distinct sha256 per type in the evidence log
+  portals      distinct beacon tokens hit (path when no token)
+  sessions     hits per IP, a new session after --session-gap seconds (default 1800) of silence
+  wallets      distinct addresses;  branches  branch event rows
+Tallies and per-log byte watermarks persist in DIR/.pivot_counts.json, so a re-run only
+reads rows appended since the last one. A log whose header changed, that shrank, or whose
+bytes before the watermark differ (fingerprint of the first and last 4 KiB) is recounted.
+Usage: ./decision_helper.py --docx 2 --pdf 1 --wallets 1 --sessions 0 --portals 0 --branches 2
+       ./decision_helper.py --op counter_scam_op
+       ./decision_helper.py --op ops/alpha --op ops/bravo --op ops/charlie
 """
 import argparse
 import json
-from typing import List
+import pathlib
+from typing import Dict, List
+
+import csv_stream
+import instrument
+
+STATE_NAME='.pivot_counts.json'
+SESSION_GAP=1800
 
 
 def suggest(docx:int,pdf:int,portals:int,wallets:int,sessions:int,branches:int)->List[str]:
@@ -35,6 +55,99 @@ def suggest(docx:int,pdf:int,portals:int,wallets:int,sessions:int,branches:int)-
     return actions
 
 
+def _empty(kind:str)->Dict:
+    return {'evidence':{'docx':[],'pdf':[]},'session':{'portals':[],'last_seen':{},'sessions':0},
+            'wallet':{'addresses':[]},'branch':{'rows':0}}[kind]
+
+
+def _fold(kind:str, agg:Dict, rows, session_gap:float):
+    """Add new log rows (dicts) into the running tallies for one log type."""
+    if kind=='evidence':
+        seen={t:set(agg[t]) for t in ('docx','pdf')}
+        for r in rows:
+            t=r.get('type','').strip().lower()
+            sha=r.get('sha256','').strip()
+            if t in seen and sha and sha not in seen[t]:
+                seen[t].add(sha)
+                agg[t].append(sha)
+    elif kind=='session':
+        portals=set(agg['portals'])
+        last=agg['last_seen']
+        for r in rows:
+            ip=r.get('ip','').strip()
+            if not ip:
+                continue
+            key=r.get('token','').strip() or r.get('path','').strip()
+            if key and key not in portals:
+                portals.add(key)
+                agg['portals'].append(key)
+            t=csv_stream.parse_utc(r.get('utc_timestamp',''))
+            prev=last.get(ip)
+            if ip not in last or (t is not None and prev is not None and t-prev>session_gap):
+                agg['sessions']+=1
+            if t is not None:
+                last[ip]=max(t, prev or t)
+            else:
+                last.setdefault(ip, None)
+    elif kind=='wallet':
+        seen=set(agg['addresses'])
+        for r in rows:
+            a=r.get('address','').strip()
+            if a and a not in seen:
+                seen.add(a)
+                agg['addresses'].append(a)
+    else:
+        agg['rows']+=sum(1 for r in rows if any(v.strip() for v in r.values()))
+
+
+def inventory(op_dir:pathlib.Path, session_gap:float=SESSION_GAP, persist:bool=True)->Dict[str,int]:
+    """Pivot counts for one operation directory, reading only rows appended since the last call."""
+    op_dir=pathlib.Path(op_dir)
+    if not op_dir.is_dir():
+        raise FileNotFoundError(f'operation directory not found: {op_dir}')
+    state_path=op_dir/STATE_NAME
+    state=csv_stream.load_state(state_path) if persist else {}
+    if state.get('session_gap')!=session_gap:
+        state={'session_gap':session_gap}
+    for kind,name in csv_stream.LOG_FILES.items():
+        path=op_dir/name
+        entry=state.get(kind)
+        if not path.exists():
+            state[kind]={'offset':0,'header':[],'agg':_empty(kind)}
+            continue
+        header,data_start=csv_stream.read_header(path)
+        if not (entry and entry['header']==header and data_start<=entry['offset']<=path.stat().st_size
+                and entry.get('fingerprint')==csv_stream.prefix_fingerprint(path, entry['offset'])):
+            entry={'offset':data_start,'header':header,'agg':_empty(kind)}
+        offset=entry['offset']
+        for batch in csv_stream.chunked(csv_stream.iter_records(path, offset, complete_only=True), 5000):
+            _fold(kind, entry['agg'], (dict(zip(header, rec)) for rec, _ in batch if rec), session_gap)
+            offset=batch[-1][1]
+        entry['offset']=offset
+        entry['fingerprint']=csv_stream.prefix_fingerprint(path, offset)
+        state[kind]=entry
+    if persist:
+        csv_stream.save_state(state_path, state)
+    ev,se=state['evidence']['agg'],state['session']['agg']
+    return {'docx':len(ev['docx']),'pdf':len(ev['pdf']),'portals':len(se['portals']),
+            'wallets':len(state['wallet']['agg']['addresses']),'sessions':se['sessions'],
+            'branches':state['branch']['agg']['rows']}
+
+
+def suggest_many(op_dirs:List[pathlib.Path], session_gap:float=SESSION_GAP)->Dict[str,Dict]:
+    """Batch mode: {op_dir: {'counts':..., 'recommendations':[...]}} for several operations
+    (an operation whose logs cannot be read gets {'error': ...} instead)."""
+    out={}
+    for op in op_dirs:
+        try:
+            counts=inventory(pathlib.Path(op), session_gap)
+        except OSError as e:
+            out[str(op)]={'error':str(e)}
+            continue
+        out[str(op)]={'counts':counts,'recommendations':suggest(**counts)}
+    return out
+
+
 def main():
     ap=argparse.ArgumentParser()
     ap.add_argument('--docx',type=int,default=0)
@@ -43,7 +156,17 @@ def main():
     ap.add_argument('--wallets',type=int,default=0)
     ap.add_argument('--sessions',type=int,default=0)
     ap.add_argument('--branches',type=int,default=0)
+    ap.add_argument('--op',action='append',help='Operation directory to count from its logs (repeatable = batch)')
+    ap.add_argument('--session-gap',type=float,default=SESSION_GAP,help='Seconds of silence that start a new session (default 1800)')
+    instrument.add_profile_arguments(ap)
     args=ap.parse_args()
+    instrument.start_profile(args.profile, args.profile_out)
+    if args.op:
+        results=suggest_many(args.op, args.session_gap)
+        if len(args.op)==1:
+            results=next(iter(results.values()))
+        print(json.dumps(results,indent=2))
+        return
     recs=suggest(args.docx,args.pdf,args.portals,args.wallets,args.sessions,args.branches)
     print(json.dumps({'recommendations':recs},indent=2))
 
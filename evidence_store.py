@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""Optional indexed store for all operation logs (SQLite), with a CSV import/export bridge.
+
+The CSV templates stay the interchange format; this store keeps the same columns in one
+table per log type, indexed for the lookups the other tools need:
+  evidence  evidence_log.csv     sha256, artifact_id, utc_timestamp
+  session   session_log.csv      ip, token, utc_timestamp
+  wallet    wallet_log.csv       address, utc_timestamp
+  branch    branch_events.csv    trigger, utc_timestamp
+Usage:
+  ./evidence_store.py import --db ops.sqlite3 evidence_log.csv session_log.csv wallet_log.csv
+  ./evidence_store.py query  --db ops.sqlite3 --ip 203.0.113.5 --since 2025-01-01
+  ./evidence_store.py query  --db ops.sqlite3 --token b7f3c2e1 --format json
+  ./evidence_store.py query  --db ops.sqlite3 --kind wallet --where chain=BTC --until 2025-02-01
+  ./evidence_store.py export --db ops.sqlite3 --kind session --out session_log.csv
+Import is incremental: the byte offset reached in each source CSV is remembered, so
+re-importing a growing log only adds the appended rows (log type is detected from
+the header, or forced with --kind). Imported rows carry their source path; when a
+source's header changes or it shrinks, its earlier rows are replaced, not duplicated.
+scripts_doc_processing.py (--store) and the portal (PORTAL_STORE) can also write to
+the store directly. Feed each log type one way only: rows a tool wrote directly are
+also in its CSV, so importing that CSV into the same store would store them twice.
+"""
+import argparse
+import csv
+import json
+import pathlib
+import sqlite3
+import sys
+from typing import Dict, Iterable, List, Optional
+
+import csv_stream
+import instrument
+
+SCHEMAS = {
+    'evidence': ['artifact_id', 'utc_timestamp', 'sha256', 'source_channel', 'type', 'original_filename',
+                 'creator', 'last_modified_by', 'application', 'version', 'notes'],
+    'session': ['utc_timestamp', 'ip', 'asn', 'country', 'ua', 'path', 'token', 'notes'],
+    'wallet': ['utc_timestamp', 'address', 'chain', 'context', 'first_seen_tx', 'last_seen_tx', 'notes'],
+    'branch': ['utc_timestamp', 'trigger', 'action', 'outcome', 'pivot_gained', 'notes'],
+}
+INDEXED = {
+    'evidence': ['sha256', 'artifact_id', 'utc_timestamp'],
+    'session': ['ip', 'token', 'utc_timestamp'],
+    'wallet': ['address', 'utc_timestamp'],
+    'branch': ['trigger', 'utc_timestamp'],
+}
+KEY_FIELDS = {'evidence': 'sha256', 'session': 'ip', 'wallet': 'address', 'branch': 'trigger'}
+IMPORT_BATCH = 5000
+
+
+def detect_kind(header: List[str]) -> Optional[str]:
+    """Log type whose template columns best match `header` (its key column must be present)."""
+    best, score = None, 0
+    for kind, fields in SCHEMAS.items():
+        overlap = len(set(fields) & set(header))
+        if KEY_FIELDS[kind] in header and overlap > score:
+            best, score = kind, overlap
+    return best
+
+
+class EvidenceStore:
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        for kind, fields in SCHEMAS.items():
+            cols = ', '.join(f'"{c}" TEXT' for c in fields)
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS {kind} (id INTEGER PRIMARY KEY, {cols}, source TEXT)')
+            if 'source' not in {r[1] for r in self.conn.execute(f'PRAGMA table_info({kind})')}:
+                self.conn.execute(f'ALTER TABLE {kind} ADD COLUMN source TEXT')  # stores from before imports were tagged
+            for col in INDEXED[kind] + ['source']:
+                self.conn.execute(f'CREATE INDEX IF NOT EXISTS {kind}_{col} ON {kind}("{col}")')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS imports (source TEXT PRIMARY KEY, kind TEXT, '
+                          'header TEXT, offset INTEGER, rows INTEGER)')
+        self.conn.commit()
+
+    def insert(self, kind: str, rows: Iterable, commit: bool = True, source: Optional[str] = None) -> int:
+        """Append rows (dicts keyed by column, or lists in template column order).
+        `source` tags imported rows with their CSV; direct writers leave it NULL."""
+        fields = SCHEMAS[kind]
+        values = [([r.get(c, '') for c in fields] if isinstance(r, dict)
+                   else (list(r) + [''] * len(fields))[:len(fields)]) + [source] for r in rows]
+        if not values:
+            return 0
+        cols = ', '.join(f'"{c}"' for c in fields)
+        self.conn.executemany(f'INSERT INTO {kind} ({cols}, source) VALUES ({",".join("?" * (len(fields) + 1))})',
+                              values)
+        if commit:
+            self.conn.commit()
+        return len(values)
+
+    def import_csv(self, src: pathlib.Path, kind: Optional[str] = None) -> int:
+        """Import rows appended to `src` since its last import. Returns rows added."""
+        src = pathlib.Path(src)
+        header, data_start = csv_stream.read_header(src)
+        kind = kind or detect_kind(header)
+        if kind not in SCHEMAS:
+            raise ValueError(f'{src}: cannot tell which log this is from header {header}')
+        source = str(src.resolve())
+        row = self.conn.execute('SELECT kind, header, offset, rows FROM imports WHERE source=?', (source,)).fetchone()
+        resume = (row is not None and row[0] == kind and json.loads(row[1]) == header
+                  and data_start <= row[2] <= src.stat().st_size)
+        offset, total = (row[2], row[3]) if resume else (data_start, 0)
+        if row is not None and not resume:
+            print(f'{src}: header or size changed since the last import; replacing its rows', file=sys.stderr)
+            self.conn.execute(f'DELETE FROM {row[0]} WHERE source=?', (source,))
+        elif row is None and self.conn.execute(f'SELECT 1 FROM {kind} WHERE source IS NULL LIMIT 1').fetchone():
+            print(f'{src}: the store already holds {kind} rows written directly (--store / PORTAL_STORE); '
+                  'if they came from this log they will now be stored twice', file=sys.stderr)
+        fields = SCHEMAS[kind]
+        pos = [header.index(c) if c in header else None for c in fields]
+        added = 0
+        for batch in csv_stream.chunked(csv_stream.iter_records(src, offset, complete_only=True), IMPORT_BATCH):
+            rows = [[rec[i] if i is not None and i < len(rec) else '' for i in pos] for rec, _ in batch if rec]
+            added += self.insert(kind, rows, commit=False, source=source)
+            offset = batch[-1][1]
+        self.conn.execute('INSERT OR REPLACE INTO imports VALUES (?,?,?,?,?)',
+                          (source, kind, json.dumps(header), offset, total + added))
+        self.conn.commit()
+        return added
+
+    def _where(self, kind: str, since: Optional[str], until: Optional[str], filters: Dict[str, str]):
+        clauses, params = [], []
+        for col, value in filters.items():
+            if col not in SCHEMAS[kind]:
+                raise ValueError(f'{kind} has no column {col!r}')
+            clauses.append(f'"{col}"=?')
+            params.append(value)
+        if since:
+            clauses.append('utc_timestamp>=?')
+            params.append(since)
+        if until:
+            clauses.append('utc_timestamp<?')
+            params.append(until)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def query(self, kind: str, since: Optional[str] = None, until: Optional[str] = None,
+              limit: Optional[int] = None, **filters) -> List[Dict[str, str]]:
+        """Rows of `kind` matching column equality `filters` and [since, until) on utc_timestamp
+        (ISO strings compare chronologically), in insertion order."""
+        return list(self.iter_rows(kind, since, until, limit, **filters))
+
+    def iter_rows(self, kind: str, since: Optional[str] = None, until: Optional[str] = None,
+                  limit: Optional[int] = None, **filters):
+        where, params = self._where(kind, since, until, filters)
+        cols = ', '.join(f'"{c}"' for c in SCHEMAS[kind])
+        sql = f'SELECT {cols} FROM {kind}{where} ORDER BY id'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        for values in self.conn.execute(sql, params):
+            yield dict(zip(SCHEMAS[kind], values))
+
+    def count(self, kind: str, since: Optional[str] = None, until: Optional[str] = None, **filters) -> int:
+        where, params = self._where(kind, since, until, filters)
+        return self.conn.execute(f'SELECT COUNT(*) FROM {kind}{where}', params).fetchone()[0]
+
+    def export_csv(self, kind: str, out: pathlib.Path, since: Optional[str] = None, until: Optional[str] = None,
+                   **filters) -> int:
+        """Write matching rows as a template-shaped CSV (atomic temp file + rename)."""
+        n = 0
+        with csv_stream.atomic_writer(pathlib.Path(out)) as f:
+            w = csv.writer(f)
+            w.writerow(SCHEMAS[kind])
+            for row in self.iter_rows(kind, since, until, **filters):
+                w.writerow(row.values())
+                n += 1
+        return n
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _filters(args) -> Dict[str, Dict[str, str]]:
+    """CLI shortcuts -> {kind: {column: value}}."""
+    by_kind = {}
+    for flag, kind, col in [('ip', 'session', 'ip'), ('token', 'session', 'token'),
+                            ('sha256', 'evidence', 'sha256'), ('address', 'wallet', 'address')]:
+        value = getattr(args, flag)
+        if value:
+            by_kind.setdefault(kind, {})[col] = value
+    for item in args.where or []:
+        col, _, value = item.partition('=')
+        by_kind.setdefault(args.kind, {})[col] = value
+    if args.kind and args.kind not in by_kind:
+        by_kind[args.kind] = {}
+    return by_kind
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Indexed SQLite store for the operation logs')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    imp = sub.add_parser('import', help='Import (new rows of) CSV logs')
+    imp.add_argument('csvs', nargs='+')
+    imp.add_argument('--kind', choices=sorted(SCHEMAS), help='Log type (default: detect from header)')
+    q = sub.add_parser('query', help='Query rows by IP, token, sha256, wallet address and/or time range')
+    ex = sub.add_parser('export', help='Export a log type back to a template-shaped CSV')
+    ex.add_argument('--out', required=True)
+    for p in (imp, q, ex):
+        p.add_argument('--db', default='ops_store.sqlite3', help='Store path (default ops_store.sqlite3)')
+    q.add_argument('--kind', choices=sorted(SCHEMAS), help='Log type to search (implied by the shortcuts)')
+    ex.add_argument('--kind', choices=sorted(SCHEMAS), required=True)
+    for p in (q, ex):
+        p.add_argument('--ip')
+        p.add_argument('--token')
+        p.add_argument('--sha256')
+        p.add_argument('--address')
+        p.add_argument('--where', action='append', help='column=value (repeatable; with --kind)')
+        p.add_argument('--since', help='utc_timestamp >= this ISO prefix')
+        p.add_argument('--until', help='utc_timestamp < this ISO prefix')
+    q.add_argument('--limit', type=int)
+    q.add_argument('--format', choices=['csv', 'json'], default='csv')
+    instrument.add_profile_arguments(ap)
+    args = ap.parse_args()
+    instrument.start_profile(args.profile, args.profile_out)
+    if getattr(args, 'where', None) and not args.kind:
+        ap.error('--where needs --kind')
+    with EvidenceStore(pathlib.Path(args.db)) as store:
+        if args.cmd == 'import':
+            for src in args.csvs:
+                n = store.import_csv(pathlib.Path(src), args.kind)
+                print(f'{src}: imported {n} new rows')
+            return
+        by_kind = _filters(args)
+        if args.cmd == 'export':
+            n = store.export_csv(args.kind, pathlib.Path(args.out), args.since, args.until, **by_kind.get(args.kind, {}))
+            print(f'Wrote {n} {args.kind} rows to {args.out}')
+            return
+        if not by_kind:
+            ap.error('give --kind or at least one of --ip/--token/--sha256/--address')
+        results = {kind: store.query(kind, args.since, args.until, args.limit, **filters)
+                   for kind, filters in by_kind.items()}
+    if args.format == 'json':
+        print(json.dumps(results, indent=2))
+        return
+    for kind, rows in results.items():
+        w = csv.writer(sys.stdout)
+        print(f'# {kind}: {len(rows)} rows')
+        w.writerow(SCHEMAS[kind])
+        w.writerows(r.values() for r in rows)
+
+
+if __name__ == '__main__':
+    main()
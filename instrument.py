@@ -0,0 +1,207 @@
+"""Lightweight counters, gauges, duration histograms and timing spans for the CLIs and the portal.
+
+Off by default: every call returns immediately (span() hands back a shared no-op context)
+until enable() is called, COUNTER_SCAM_METRICS=1 is set, or a CLI gets --profile.
+Usage in code:
+  with instrument.span('asn_enrich.network'):     # duration histogram, seconds
+      ...
+  instrument.count('asn_enrich.cache_lookups', result='hit')
+CLIs: --profile prints a summary table to stderr on exit; --profile-out run.pstats also
+records a cProfile of the whole run (inspect with: python -m pstats run.pstats).
+The portal serves the same registry as Prometheus text on /metrics (PORTAL_METRICS=1).
+Metrics live in the current process only: work done in --workers pool processes is not counted.
+"""
+import atexit
+import bisect
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = 'counter_scam_'
+ENABLED = os.environ.get('COUNTER_SCAM_METRICS') == '1'
+NAME_RE = re.compile(r'[^a-zA-Z0-9_]')
+
+_lock = threading.Lock()
+_counters: Dict[Tuple, float] = {}
+_gauges: Dict[Tuple, float] = {}
+_hists: Dict[Tuple, list] = {}  # key -> per-bucket counts (+Inf last), then count, sum, max
+
+
+def enable(on: bool = True):
+    global ENABLED
+    ENABLED = on
+
+
+def enabled() -> bool:
+    return ENABLED
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _hists.clear()
+
+
+def _key(name: str, labels: Dict[str, str]) -> Tuple:
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+
+def count(name: str, n: float = 1, **labels):
+    if not ENABLED:
+        return
+    k = _key(name, labels)
+    with _lock:
+        _counters[k] = _counters.get(k, 0) + n
+
+
+def gauge(name: str, value: float, **labels):
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, seconds: float, **labels):
+    if not ENABLED:
+        return
+    k = _key(name, labels)
+    with _lock:
+        h = _hists.get(k)
+        if h is None:
+            h = _hists[k] = [0] * (len(BUCKETS) + 1) + [0, 0.0, 0.0]
+        h[bisect.bisect_left(BUCKETS, seconds)] += 1
+        h[-3] += 1
+        h[-2] += seconds
+        h[-1] = max(h[-1], seconds)
+
+
+class _Span:
+    __slots__ = ('name', 'labels', 't0')
+
+    def __init__(self, name: str, labels: Dict[str, str]):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.t0, **self.labels)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoSpan()
+
+
+def span(name: str, **labels):
+    """Context manager timing its block into the `name` histogram (no-op while disabled)."""
+    return _Span(name, labels) if ENABLED else _NOOP
+
+
+def snapshot() -> Dict:
+    with _lock:
+        return {'counters': dict(_counters), 'gauges': dict(_gauges),
+                'histograms': {k: list(v) for k, v in _hists.items()}}
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels: Tuple, extra: Tuple = ()) -> str:
+    parts = [f'{NAME_RE.sub("_", k)}="{_escape(v)}"' for k, v in labels + extra]
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _display(key: Tuple) -> str:
+    name, labels = key
+    return name + (' ' + ' '.join(f'{k}={v}' for k, v in labels) if labels else '')
+
+
+def summary() -> str:
+    """Human-readable table of everything recorded (spans first, slowest total first)."""
+    snap = snapshot()
+    lines = []
+    if snap['histograms']:
+        lines.append(f"{'span':<44}{'calls':>9}{'total s':>11}{'mean ms':>10}{'max ms':>10}")
+        for key, h in sorted(snap['histograms'].items(), key=lambda kv: -kv[1][-2]):
+            n, total, peak = h[-3], h[-2], h[-1]
+            lines.append(f'{_display(key):<44}{n:>9}{total:>11.3f}{total / n * 1000:>10.2f}{peak * 1000:>10.2f}')
+    values = sorted(snap['counters'].items()) + sorted(snap['gauges'].items())
+    if values:
+        lines.append(f"{'counter / gauge':<44}{'value':>9}")
+        lines.extend(f'{_display(key):<44}{value:>9g}' for key, value in values)
+    return '\n'.join(lines) or 'no metrics recorded'
+
+
+def prometheus_text(prefix: str = PREFIX) -> str:
+    """Prometheus text exposition format (version 0.0.4) of the registry."""
+    snap = snapshot()
+    out = []
+    typed = set()
+
+    def header(metric: str, kind: str):
+        if metric not in typed:
+            typed.add(metric)
+            out.append(f'# TYPE {metric} {kind}')
+
+    for (name, labels), value in sorted(snap['counters'].items()):
+        metric = prefix + NAME_RE.sub('_', name) + '_total'
+        header(metric, 'counter')
+        out.append(f'{metric}{_label_text(labels)} {value:g}')
+    for (name, labels), value in sorted(snap['gauges'].items()):
+        metric = prefix + NAME_RE.sub('_', name)
+        header(metric, 'gauge')
+        out.append(f'{metric}{_label_text(labels)} {value:g}')
+    for (name, labels), h in sorted(snap['histograms'].items()):
+        metric = prefix + NAME_RE.sub('_', name) + '_seconds'
+        header(metric, 'histogram')
+        cumulative = 0
+        for bound, n in zip(BUCKETS + ('+Inf',), h[:len(BUCKETS) + 1]):
+            cumulative += n
+            out.append(f"{metric}_bucket{_label_text(labels, (('le', bound),))} {cumulative}")
+        out.append(f'{metric}_sum{_label_text(labels)} {h[-2]:.6f}')
+        out.append(f'{metric}_count{_label_text(labels)} {h[-3]}')
+    return '\n'.join(out) + '\n'
+
+
+def add_profile_arguments(ap):
+    ap.add_argument('--profile', action='store_true', help='Print timing spans and counters to stderr on exit')
+    ap.add_argument('--profile-out', metavar='PSTATS', help='Also write a cProfile of the run here (implies --profile)')
+
+
+def start_profile(summary_on_exit: bool = False, pstats_path: Optional[str] = None):
+    """Called right after parse_args(): enables metrics and dumps them (and the cProfile) at exit."""
+    if not summary_on_exit and not pstats_path:
+        return
+    enable()
+    prof = None
+    if pstats_path:
+        prof = cProfile.Profile()
+        prof.enable()
+
+    def dump():
+        if prof is not None:
+            prof.disable()
+            prof.dump_stats(pstats_path)
+        print(summary(), file=sys.stderr)
+        if prof is not None:
+            print(f'cProfile stats: {pstats_path} (python -m pstats {pstats_path})', file=sys.stderr)
+    atexit.register(dump)
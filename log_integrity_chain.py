@@ -1,39 +1,211 @@
 #!/usr/bin/env python3
 """Append or rebuild a rolling hash chain for a CSV evidence log.
 Each line's chain_hash = SHA256(prev_chain_hash + raw_csv_line_bytes). Stored in companion JSON.
-Usage: ./log_integrity_chain.py evidence_log.csv
-Outputs: evidence_log.chain.json (array of objects with line_no, sha256_line, chain_hash)
+Usage:
+  Rebuild: ./log_integrity_chain.py evidence_log.csv
+  Append:  ./log_integrity_chain.py --append evidence_log.csv
+  Verify:  ./log_integrity_chain.py --verify [--from N] evidence_log.csv
+Outputs:
+  rebuild -> evidence_log.csv.chain.json  (array of objects with line_no, sha256_line, chain_hash)
+  append  -> evidence_log.csv.chain.jsonl (one compact object per line, adding byte offset/end)
+Append mode resumes from the last chain_hash and byte offset in the .jsonl file, hashes only
+lines appended since (complete lines only), and checks the last chained line is unchanged.
+Verify re-walks the .jsonl chain from line N (default 0), seeding from entry N-1, which is
+found by bisecting the .jsonl on byte offsets (entries are in line order) rather than a rescan.
+Lines end at \n, \r\n or a bare \r, as with bytes.splitlines() (the original rebuild).
 """
-import sys
-import pathlib
+import argparse
 import hashlib
 import json
+import pathlib
+import sys
+
+import instrument
+
+CHUNK = 1 << 16
+
+
+def iter_lines(f, offset: int = 0, complete_only: bool = False):
+    """Yield (line_without_eol, start_offset, end_offset) from a binary file.
+    With complete_only, an unterminated last line (or one ending in a bare \r that may
+    still become \r\n) is left for the next run."""
+    f.seek(offset)
+    buf = b''
+    while True:
+        chunk = f.read(CHUNK)
+        lines = (buf + chunk).splitlines(keepends=True)
+        buf = lines.pop() if lines else b''
+        if buf.endswith(b'\n') or (buf.endswith(b'\r') and not chunk and not complete_only):
+            lines.append(buf)
+            buf = b''
+        # else: unterminated, or a bare \r whose \n may be in the next chunk (or not written yet)
+        for raw in lines:
+            end = offset + len(raw)
+            yield raw.rstrip(b'\r\n'), offset, end
+            offset = end
+        if not chunk:
+            break
+    if buf and not complete_only:
+        yield buf, offset, offset + len(buf)
+
+
+def iter_chain(f, offset: int = 0, prev: bytes = b'', line_no: int = 0, complete_only: bool = False):
+    for raw_line, start, end in iter_lines(f, offset, complete_only):
+        sha_line = hashlib.sha256(raw_line).hexdigest()
+        chain_hash = hashlib.sha256(prev + raw_line).hexdigest()
+        yield {'line_no': line_no, 'offset': start, 'end': end, 'sha256_line': sha_line, 'chain_hash': chain_hash}
+        prev = bytes.fromhex(chain_hash)
+        line_no += 1
+
 
 def build_chain(csv_path: pathlib.Path):
-    lines=csv_path.read_bytes().splitlines()
-    chain=[]
-    prev=b''
-    for i, raw_line in enumerate(lines):
-        if i==0 and raw_line.decode(errors='ignore').startswith('artifact_id'):  # header remains but included
-            pass
-        sha_line=hashlib.sha256(raw_line).hexdigest()
-        chain_hash=hashlib.sha256(prev + raw_line).hexdigest()
-        chain.append({'line_no':i,'sha256_line':sha_line,'chain_hash':chain_hash})
-        prev=bytes.fromhex(chain_hash)
+    with instrument.span('log_integrity_chain.build_chain'), csv_path.open('rb') as f:
+        # header (artifact_id,...) remains but included
+        chain = [{k: e[k] for k in ('line_no', 'sha256_line', 'chain_hash')} for e in iter_chain(f)]
+    instrument.count('log_integrity_chain.lines', len(chain))
     return chain
 
+
+def jsonl_path(csv_path: pathlib.Path) -> pathlib.Path:
+    return csv_path.with_suffix(csv_path.suffix + '.chain.jsonl')
+
+
+def last_entry(path: pathlib.Path):
+    """Read the final JSONL entry by scanning backwards from EOF (no full read)."""
+    if not path.exists():
+        return None
+    with path.open('rb') as f:
+        f.seek(0, 2)
+        pos = f.tell()
+        buf = b''
+        while pos > 0:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+            lines = buf.rstrip(b'\n').split(b'\n')
+            if len(lines) > 1 or pos == 0:
+                return json.loads(lines[-1]) if lines[-1] else None
+    return None
+
+
+def _line_at_or_after(f, pos: int) -> int:
+    """Byte offset of the first line starting at or after `pos`."""
+    if pos == 0:
+        return 0
+    f.seek(pos - 1)
+    f.readline()
+    return f.tell()
+
+
+def seek_entry(f, line_no: int) -> bool:
+    """Position the binary .chain.jsonl file `f` at entry `line_no` (O(log n) reads)."""
+    f.seek(0, 2)
+    lo, hi = 0, f.tell()
+    while lo < hi:  # smallest byte position whose next entry has line_no >= the target
+        mid = (lo + hi) // 2
+        f.seek(_line_at_or_after(f, mid))
+        raw = f.readline()
+        if not raw.strip() or json.loads(raw)['line_no'] >= line_no:
+            hi = mid
+        else:
+            lo = mid + 1
+    start = _line_at_or_after(f, lo)
+    f.seek(start)
+    raw = f.readline()
+    if not raw.strip() or json.loads(raw)['line_no'] != line_no:
+        return False
+    f.seek(start)
+    return True
+
+
+def entry_at(path: pathlib.Path, line_no: int):
+    with path.open('rb') as f:
+        return json.loads(f.readline()) if seek_entry(f, line_no) else None
+
+
+def append_chain(csv_path: pathlib.Path) -> int:
+    """Extend <csv>.chain.jsonl with lines appended since the last run. Returns entries added."""
+    out = jsonl_path(csv_path)
+    last = last_entry(out)
+    offset, prev, line_no = 0, b'', 0
+    if last:
+        offset, prev, line_no = last['end'], bytes.fromhex(last['chain_hash']), last['line_no'] + 1
+        if csv_path.stat().st_size < offset:
+            raise ValueError(f'{csv_path.name} is shorter than its chain; log was truncated or rewritten')
+    added = 0
+    with instrument.span('log_integrity_chain.append_chain'), csv_path.open('rb') as f:
+        if last:
+            tail = next(iter_lines(f, last['offset']), None)
+            if tail is None or hashlib.sha256(tail[0]).hexdigest() != last['sha256_line']:
+                raise ValueError(f'Line {last["line_no"]} no longer matches its chain entry')
+        with out.open('a') as sink:
+            for e in iter_chain(f, offset, prev, line_no, complete_only=True):
+                sink.write(json.dumps(e, separators=(',', ':')) + '\n')
+                added += 1
+    instrument.count('log_integrity_chain.lines', added)
+    return added
+
+
+def verify_chain(csv_path: pathlib.Path, start_line: int = 0):
+    """Check .chain.jsonl entries from start_line onward against the CSV.
+    Returns (ok, lines_checked, message)."""
+    src = jsonl_path(csv_path)
+    if not src.exists():
+        return False, 0, f'No chain file {src.name}; run with --append first'
+    offset, prev = 0, b''
+    checked = 0
+    with csv_path.open('rb') as f, src.open('rb') as entries:
+        if start_line > 0:
+            if not seek_entry(entries, start_line - 1):
+                return False, 0, f'Chain has no entry {start_line - 1}'
+            seed = json.loads(entries.readline())
+            offset, prev = seed['end'], bytes.fromhex(seed['chain_hash'])
+        actual = iter_chain(f, offset, prev, start_line)
+        for i, raw in enumerate(entries, start_line):
+            expected = json.loads(raw)
+            got = next(actual, None)
+            if got is None:
+                return False, checked, f'Line {i} missing from CSV (truncated?)'
+            if got['chain_hash'] != expected['chain_hash'] or got['end'] != expected['end']:
+                return False, checked, f'Mismatch at line {i}'
+            checked += 1
+    return True, checked, f'OK: {checked} lines verified from line {start_line}'
+
+
 def main():
-    if len(sys.argv)<2:
+    ap = argparse.ArgumentParser(description='Build, append or verify a rolling hash chain for a CSV log.')
+    ap.add_argument('csv', nargs='?', help='CSV log path')
+    ap.add_argument('--append', action='store_true', help='Hash only new lines into <csv>.chain.jsonl')
+    ap.add_argument('--verify', action='store_true', help='Verify <csv>.chain.jsonl against the CSV')
+    ap.add_argument('--from', dest='start', type=int, default=0, help='With --verify, start at this line number')
+    instrument.add_profile_arguments(ap)
+    args = ap.parse_args()
+    instrument.start_profile(args.profile, args.profile_out)
+    if not args.csv:
         print('Provide CSV file path')
         return
-    p=pathlib.Path(sys.argv[1])
+    p = pathlib.Path(args.csv)
     if not p.exists():
         print('Missing file')
         return
-    chain=build_chain(p)
-    out=p.with_suffix(p.suffix + '.chain.json')
+    if args.verify:
+        ok, _, msg = verify_chain(p, args.start)
+        print(msg)
+        sys.exit(0 if ok else 1)
+    if args.append:
+        try:
+            added = append_chain(p)
+        except ValueError as e:
+            print(f'Chain error: {e}')
+            sys.exit(1)
+        print(f'Appended chain entries: {added} to {jsonl_path(p).name}')
+        return
+    chain = build_chain(p)
+    out = p.with_suffix(p.suffix + '.chain.json')
     out.write_text(json.dumps(chain, indent=2))
     print(f'Wrote chain entries: {len(chain)} to {out.name}')
 
-if __name__=='__main__':
+
+if __name__ == '__main__':
     main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Merkle tree over a CSV evidence log for O(log n) per-row integrity proofs.
+Tree entries are the per-line sha256_line values of log_integrity_chain.py. Leaves are
+SHA256(0x00 + sha256_line), interior nodes SHA256(0x01 + left + right), and an unpaired
+last node is carried up unchanged: RFC 6962 hashing and tree shape over those entries.
+Usage:
+  Build:  ./log_merkle.py build evidence_log.csv [--workers 8] [--checkpoint-every 10000] [--key-file key]
+  Prove:  ./log_merkle.py prove evidence_log.csv 1234 > row1234.proof.json
+  Verify: ./log_merkle.py verify row1234.proof.json [--csv evidence_log.csv] (--key-file key | --root HEX)
+Outputs (next to the CSV):
+  .merkle              every tree level, 32 bytes per node, so a proof needs only log2(n) reads
+  .merkle.idx          uint64 byte offset of each line start (+ final end) for O(1) row access
+  .merkle.checkpoints.jsonl  roots of the tree after every N lines and at the full size,
+                       HMAC-SHA256 signed with --key-file / $MERKLE_HMAC_KEY. Earlier checkpoints
+                       are re-derived on each build, so a rewritten prefix is reported.
+Leaf hashing is split across processes by line-aligned byte ranges (--workers).
+A proof carries its own root, so verify needs something it did not come with: the HMAC
+key that signed the root, or a root taken from a checkpoint you already trust.
+"""
+import argparse
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import pathlib
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import instrument
+from log_integrity_chain import iter_lines
+
+MAGIC = b'MRKL2\x00\x00\x00'  # 2: 0x00-prefixed leaves
+HEADER = struct.Struct('<8sQ')
+NODE = 32
+DEFAULT_CHECKPOINT_EVERY = 10000
+MIN_PARALLEL_BYTES = 4 << 20
+CHECKPOINT_VERSION = 2  # roots from version 1 (unprefixed leaves) are not comparable
+
+
+def leaf_hash(sha256_line: bytes) -> bytes:
+    return hashlib.sha256(b'\x00' + sha256_line).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+def level_sizes(n: int) -> List[int]:
+    sizes = [n]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+def _hash_range(path: str, start: int, end: int):
+    """Worker: leaf digests and line start offsets for lines beginning in [start, end)."""
+    digests = bytearray()
+    starts = array('Q')
+    last_end = start
+    with open(path, 'rb') as f:
+        for raw, s, e in iter_lines(f, start):
+            if s >= end:
+                break
+            digests += leaf_hash(hashlib.sha256(raw).digest())
+            starts.append(s)
+            last_end = e
+    return bytes(digests), starts.tobytes(), last_end
+
+
+def _split_ranges(path: pathlib.Path, parts: int):
+    size = path.stat().st_size
+    bounds = [0]
+    with path.open('rb') as f:
+        for i in range(1, parts):
+            f.seek(size * i // parts)
+            f.readline()  # advance to the next line start
+            pos = f.tell()
+            if bounds[-1] < pos < size:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def hash_leaves(path: pathlib.Path, workers: int = 1):
+    """Return (leaf digests concatenated, array of line starts + final end)."""
+    if workers > 1 and path.stat().st_size >= MIN_PARALLEL_BYTES:
+        ranges = _split_ranges(path, workers * 4)
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(_hash_range, [str(path)] * len(ranges), *zip(*ranges)))
+    else:
+        results = [_hash_range(str(path), 0, path.stat().st_size)]
+    leaves = b''.join(r[0] for r in results)
+    offsets = array('Q')
+    for _, starts, _ in results:
+        offsets.frombytes(starts)
+    offsets.append(results[-1][2] if offsets else 0)
+    return leaves, offsets
+
+
+def prefix_roots(leaves: bytes, every: int):
+    """Yield (size, root) every `every` leaves and at the end, via a stack of perfect subtrees."""
+    peaks = []  # (height, hash)
+    n = len(leaves) // NODE
+    for i in range(n):
+        h, node = 0, leaves[i * NODE:(i + 1) * NODE]
+        while peaks and peaks[-1][0] == h:
+            node = node_hash(peaks.pop()[1], node)
+            h += 1
+        peaks.append((h, node))
+        size = i + 1
+        if size % every == 0 or size == n:
+            acc = peaks[-1][1]
+            for _, p in reversed(peaks[:-1]):
+                acc = node_hash(p, acc)
+            yield size, acc
+
+
+def _paths(csv_path: pathlib.Path):
+    base = csv_path.with_suffix(csv_path.suffix + '.merkle')
+    return base, base.with_name(base.name + '.idx'), base.with_name(base.name + '.checkpoints.jsonl')
+
+
+def load_key(key_file: Optional[str] = None) -> bytes:
+    if key_file:
+        return pathlib.Path(key_file).read_bytes().strip()
+    return os.environ.get('MERKLE_HMAC_KEY', '').encode()
+
+
+def sign(key: bytes, size: int, root_hex: str) -> str:
+    if not key:
+        return ''
+    return hmac.new(key, f'{size}:{root_hex}'.encode(), hashlib.sha256).hexdigest()
+
+
+def build_tree(csv_path: pathlib.Path, workers: int = 1, every: int = DEFAULT_CHECKPOINT_EVERY, key: bytes = b''):
+    """Write tree levels, line index and checkpoints. Returns (size, root_hex, mismatched_checkpoint_sizes)."""
+    tree_path, idx_path, ckpt_path = _paths(csv_path)
+    leaves, offsets = hash_leaves(csv_path, workers)
+    n = len(leaves) // NODE
+    tmp = tree_path.with_name(tree_path.name + '.tmp')
+    with tmp.open('w+b') as out:
+        out.write(HEADER.pack(MAGIC, n))
+        out.write(leaves)
+        out.flush()
+        fd = out.fileno()
+        pos = HEADER.size
+        for size in level_sizes(n)[:-1]:
+            nxt = pos + size * NODE
+            for block in range(0, size, 8192):  # pairs read in bounded blocks
+                cnt = min(8192, size - block)
+                buf = os.pread(fd, cnt * NODE, pos + block * NODE)
+                level = bytearray()
+                for j in range(0, cnt - 1, 2):
+                    level += node_hash(buf[j * NODE:(j + 1) * NODE], buf[(j + 1) * NODE:(j + 2) * NODE])
+                if cnt % 2:
+                    level += buf[(cnt - 1) * NODE:]
+                out.write(level)
+            out.flush()
+            pos = nxt
+        root = os.pread(fd, NODE, pos) if n else hashlib.sha256(b'').digest()
+    tmp.replace(tree_path)
+    idx_path.write_bytes(offsets.tobytes())
+
+    known = {}
+    if ckpt_path.exists():
+        for line in ckpt_path.read_text().splitlines():
+            c = json.loads(line)
+            if c.get('v') == CHECKPOINT_VERSION:
+                known[c['tree_size']] = c['root']
+    mismatched = []
+    ts = datetime.datetime.now(datetime.timezone.utc).isoformat().replace('+00:00', 'Z')
+    with ckpt_path.open('a') as sink:
+        for size, r in prefix_roots(leaves, every):
+            if size in known:
+                if known[size] != r.hex():
+                    mismatched.append(size)
+                continue
+            sink.write(json.dumps({'v': CHECKPOINT_VERSION, 'tree_size': size, 'root': r.hex(), 'utc_timestamp': ts,
+                                   'sig': sign(key, size, r.hex())}, separators=(',', ':')) + '\n')
+    return n, root.hex(), mismatched
+
+
+def _read_line(csv_path: pathlib.Path, idx_path: pathlib.Path, line_no: int):
+    with idx_path.open('rb') as f:
+        f.seek(line_no * 8)
+        start, end = struct.unpack('<QQ', f.read(16))
+    with csv_path.open('rb') as f:
+        raw, _, _ = next(iter_lines(f, start))
+    return raw, start, end
+
+
+def prove(csv_path: pathlib.Path, line_no: int) -> dict:
+    """Inclusion proof for one row, reading only log2(n) nodes plus the row itself."""
+    tree_path, idx_path, ckpt_path = _paths(csv_path)
+    with tree_path.open('rb') as f:
+        magic, n = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f'Not a Merkle tree file: {tree_path}')
+        if not 0 <= line_no < n:
+            raise IndexError(f'Line {line_no} outside tree of {n} lines')
+        fd = f.fileno()
+        pos, i, path = HEADER.size, line_no, []
+        sizes = level_sizes(n)
+        for size in sizes[:-1]:
+            sib = i ^ 1
+            if sib < size:
+                path.append(os.pread(fd, NODE, pos + sib * NODE).hex())
+            pos += size * NODE
+            i //= 2
+        root = os.pread(fd, NODE, pos).hex()
+    raw, start, end = _read_line(csv_path, idx_path, line_no)
+    sig = ''
+    if ckpt_path.exists():
+        for line in ckpt_path.read_text().splitlines():
+            c = json.loads(line)
+            if c['tree_size'] == n and c['root'] == root:
+                sig = c['sig']
+    return {'file': csv_path.name, 'line_no': line_no, 'offset': start, 'end': end,
+            'sha256_line': hashlib.sha256(raw).hexdigest(), 'tree_size': n, 'proof': path, 'root': root, 'sig': sig}
+
+
+def root_from_proof(leaf: bytes, index: int, size: int, proof: List[str]) -> bytes:
+    node, i, k = leaf, index, 0
+    for lsize in level_sizes(size)[:-1]:
+        sib = i ^ 1
+        if sib < lsize:
+            other = bytes.fromhex(proof[k])
+            k += 1
+            node = node_hash(other, node) if i & 1 else node_hash(node, other)
+        i //= 2
+    if k != len(proof):
+        raise ValueError('Proof length does not match tree size')
+    return node
+
+
+def verify_proof(proof: dict, csv_path: Optional[pathlib.Path] = None, key: bytes = b'',
+                 trusted_root: Optional[str] = None):
+    """Check a proof against a root it cannot forge: one signed with `key`, or `trusted_root`
+    (hex, from a checkpoint obtained independently). With csv_path, the row is re-read
+    (by offset) and re-hashed. Returns (ok, message)."""
+    if not key and not trusted_root:
+        return False, 'Nothing to verify against: give the HMAC key or a trusted checkpoint root'
+    line_digest = bytes.fromhex(proof['sha256_line'])
+    if csv_path is not None:
+        with csv_path.open('rb') as f:
+            row = next(iter_lines(f, proof['offset']), None)
+        if row is None or row[2] != proof['end'] or hashlib.sha256(row[0]).digest() != line_digest:
+            return False, f'Row {proof["line_no"]} in {csv_path.name} does not match the proof leaf'
+    try:
+        root = root_from_proof(leaf_hash(line_digest), proof['line_no'], proof['tree_size'], proof['proof'])
+    except (ValueError, IndexError) as e:
+        return False, str(e)
+    if root.hex() != proof['root']:
+        return False, 'Recomputed root does not match'
+    if trusted_root:
+        if not hmac.compare_digest(root.hex(), trusted_root.strip().lower()):
+            return False, 'Root does not match the trusted checkpoint root'
+        return True, 'OK: inclusion proof verified against the trusted root'
+    if not hmac.compare_digest(sign(key, proof['tree_size'], proof['root']), proof.get('sig', '')):
+        return False, 'Root checkpoint signature invalid'
+    return True, 'OK: inclusion proof and signed root verified'
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Merkle checkpoints and inclusion proofs for CSV logs.')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    b = sub.add_parser('build', help='Build tree levels, line index and signed checkpoints')
+    b.add_argument('csv')
+    b.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processes for leaf hashing')
+    b.add_argument('--checkpoint-every', type=int, default=DEFAULT_CHECKPOINT_EVERY)
+    b.add_argument('--key-file', help='HMAC key for signing roots (default $MERKLE_HMAC_KEY)')
+    p = sub.add_parser('prove', help='Print an inclusion proof for one line as JSON')
+    p.add_argument('csv')
+    p.add_argument('line_no', type=int)
+    v = sub.add_parser('verify', help='Verify a proof JSON file')
+    v.add_argument('proof')
+    v.add_argument('--csv', help='Re-read and hash the row from this log')
+    v.add_argument('--key-file', help='HMAC key to check the root signature (default $MERKLE_HMAC_KEY)')
+    v.add_argument('--root', help='Trusted checkpoint root (hex) to verify against instead of a signature')
+    instrument.add_profile_arguments(ap)
+    args = ap.parse_args()
+    instrument.start_profile(args.profile, args.profile_out)
+    if args.cmd == 'build':
+        csv_path = pathlib.Path(args.csv)
+        if not csv_path.exists():
+            ap.error('Missing file')
+        key = load_key(args.key_file)
+        if not key:
+            print('Warning: no HMAC key; checkpoints are unsigned', file=sys.stderr)
+        n, root, bad = build_tree(csv_path, args.workers, args.checkpoint_every, key)
+        print(f'Merkle root over {n} lines: {root}')
+        if bad:
+            print(f'Checkpoint mismatch at sizes {bad}: log prefix changed since signing')
+            sys.exit(1)
+    elif args.cmd == 'prove':
+        print(json.dumps(prove(pathlib.Path(args.csv), args.line_no), indent=2))
+    else:
+        proof = json.loads(pathlib.Path(args.proof).read_text())
+        ok, msg = verify_proof(proof, pathlib.Path(args.csv) if args.csv else None, load_key(args.key_file), args.root)
+        print(msg)
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
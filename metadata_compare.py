@@ -1,90 +1,181 @@
 #!/usr/bin/env python3
 """Compare metadata across multiple DOCX/PDF artifacts previously logged.
 Usage: ./metadata_compare.py file1 file2 [file3 ...]
+       ./metadata_compare.py --index evidence_log.index.sqlite3 file1 sha256:<hex> ...
+       ./metadata_compare.py --cluster [--min-shared 2] [--format csv] --out clusters.json artifacts_dir/
+       ./metadata_compare.py --cluster --index evidence_log.index.sqlite3 --out clusters.json
 Outputs a markdown table of selected fields and notes deltas.
+--cluster groups artifacts by shared authoring fingerprints (--fields, default creator,
+last_modified_by, rsid_root): an inverted index keyed on (field, value), or on every
+--min-shared-sized combination of them, feeds a union-find, so grouping is linear in the
+number of artifacts rather than pairwise. application / app_version are shared by every
+document from the same suite: if you add them to --fields, raise --min-shared so they
+cannot link two documents on their own. With --index and no paths, every indexed
+artifact is clustered from cached metadata.
+With --index (artifact index written by scripts_doc_processing.py), unchanged files and
+sha256:<hex> references are compared from cached metadata without reopening any file.
 """
-import sys
+import argparse
+import csv
 import pathlib
 import json
-import hashlib
-import zipfile
-from typing import Dict
+import sys
+from itertools import combinations
+from typing import Dict, Iterable, List
 
-FIELDS = ["creator","last_modified_by","application","app_version","revision","created","modified","title","author","producer","creationdate","moddate"]
+import artifact_extract
+import instrument
+from artifact_index import ArtifactIndex
+from union_find import UnionFind
 
-try:
-    from pypdf import PdfReader  # optional
-except ImportError:  # pragma: no cover
-    PdfReader = None
+FIELDS = ["creator","last_modified_by","application","app_version","revision","created","modified","title","author","producer","creationdate","moddate","template","company","rsid_root","attached_template"]
 
+CLUSTER_FIELDS = ["creator","last_modified_by","rsid_root"]
 
 def sha256_path(p: pathlib.Path) -> str:
-    h = hashlib.sha256()
-    h.update(p.read_bytes())
-    return h.hexdigest()
+    return artifact_extract.sha256_file(p)
 
 
 def extract_docx(p: pathlib.Path) -> Dict[str,str]:
-    out={}
-    try:
-        with zipfile.ZipFile(p) as z:
-            def r(name):
-                try:
-                    return z.read(name).decode('utf-8','ignore')
-                except KeyError:
-                    return ''
-            core = r('docProps/core.xml')
-            app = r('docProps/app.xml')
-            import re
-            patterns=[('creator','<dc:creator>(.*?)</dc:creator>'),
-                      ('last_modified_by','<cp:lastModifiedBy>(.*?)</cp:lastModifiedBy>'),
-                      ('revision','<cp:revision>(.*?)</cp:revision>'),
-                      ('created','<dcterms:created[^>]*>(.*?)</dcterms:created>'),
-                      ('modified','<dcterms:modified[^>]*>(.*?)</dcterms:modified>'),
-                      ('application','<Application>(.*?)</Application>'),
-                      ('app_version','<AppVersion>(.*?)</AppVersion>')]
-            blob=core+app
-            for k,pat in patterns:
-                m=re.search(pat, blob, re.DOTALL)
-                if m:
-                    out[k] = m.group(1)[:120]
-    except Exception as e:
-        out['error']=str(e)
-    return out
+    return artifact_extract.meta_for(p, 120)
 
 
 def extract_pdf(p: pathlib.Path) -> Dict[str,str]:
-    out={}
-    if not PdfReader:
-        out['error']='pypdf not installed'
-        return out
-    try:
-        r=PdfReader(str(p))
-        info=r.metadata or {}
-        for k in ['/Author','/Creator','/Producer','/CreationDate','/ModDate','/Title']:
-            if k in info:
-                out[k.strip('/').lower()]=str(info[k])[:120]
-    except Exception as e:
-        out['error']=str(e)
-    return out
+    return artifact_extract.meta_for(p, 120)
 
 
 def collect(path: pathlib.Path) -> Dict[str,str]:
-    meta={}
-    if path.suffix.lower()=='.docx':
-        meta=extract_docx(path)
-    elif path.suffix.lower()=='.pdf':
-        meta=extract_pdf(path)
-    meta['sha256']=sha256_path(path)
-    meta['file']=path.name
+    with instrument.span('metadata_compare.collect'):
+        rec=artifact_extract.extract(path, 120)
+    meta=dict(rec.meta)
+    meta['sha256']=rec.sha256
+    meta['file']=rec.name
+    return meta
+
+
+def from_index(ref: str, index: ArtifactIndex) -> Dict[str,str]:
+    """Cached metadata for a path (if unchanged since indexing) or a sha256:<hex> reference."""
+    if ref.startswith('sha256:'):
+        art=index.get(ref[len('sha256:'):])
+        if art is None:
+            return {'file':ref,'error':'not in index'}
+        name=ref[:19]
+    else:
+        p=pathlib.Path(ref)
+        art=index.meta_for_path(p)
+        if art is None:
+            return collect(p)
+        name=p.name
+    meta={k:str(v)[:120] for k,v in art['meta'].items()}
+    meta['sha256']=art['sha256']
+    meta['file']=name
     return meta
 
 
+def _norm(value) -> str:
+    return ' '.join(str(value).split()).casefold()
+
+
+def cluster(metas: List[Dict[str,str]], fields: List[str] = CLUSTER_FIELDS, min_shared: int = 1) -> List[Dict]:
+    """Group artifacts sharing at least `min_shared` (field, value) pairs, transitively.
+
+    Each artifact contributes one key per `min_shared`-sized combination of its non-empty
+    fields; the first artifact seen under a key becomes the anchor the others are unioned
+    with. Returns clusters (largest first) with the values their members share.
+    """
+    uf=UnionFind(len(metas))
+    anchors={}
+    for i, m in enumerate(metas):
+        pairs=[(f, _norm(m[f])) for f in fields if str(m.get(f,'')).strip()]
+        for key in combinations(pairs, min_shared):
+            j=anchors.setdefault(key, i)
+            if j!=i:
+                uf.union(i, j)
+    clusters=[]
+    for members in uf.groups().values():
+        shared={}
+        for f in fields:
+            counts={}
+            for i in members:
+                v=str(metas[i].get(f,'')).strip()
+                if v:
+                    counts[v]=counts.get(v,0)+1
+            if counts:
+                shared[f]=dict(sorted(counts.items(), key=lambda kv: -kv[1]))
+        clusters.append({'size':len(members),
+                         'files':[{'file':metas[i].get('file',''),'sha256':metas[i].get('sha256','')} for i in members],
+                         'shared':shared})
+    clusters.sort(key=lambda c: -c['size'])
+    for n, c in enumerate(clusters):
+        c['cluster_id']=n
+    return clusters
+
+
+def _walk(paths: Iterable[str]):
+    for path in paths:
+        p=pathlib.Path(path)
+        if p.is_dir():
+            yield from (c for c in sorted(p.rglob('*')) if c.is_file() and c.suffix.lower() in ('.docx','.pdf'))
+        else:
+            yield p
+
+
+def write_clusters(clusters: List[Dict], fields: List[str], fmt: str, out):
+    if fmt=='json':
+        json.dump(clusters, out, indent=2)
+        out.write('\n')
+        return
+    w=csv.writer(out)
+    w.writerow(['cluster_id','cluster_size','file','sha256']+[f'top_{f}' for f in fields])
+    for c in clusters:
+        top=[next(iter(c['shared'].get(f,{'':0}))) for f in fields]
+        for f in c['files']:
+            w.writerow([c['cluster_id'], c['size'], f['file'], f['sha256']]+top)
+
+
 def main():
-    if len(sys.argv)<3:
+    ap=argparse.ArgumentParser(description='Compare DOCX/PDF metadata across artifact versions.')
+    ap.add_argument('files', nargs='*', help='Artifact paths (or sha256:<hex> with --index); directories with --cluster')
+    ap.add_argument('--index', help='Artifact index (from scripts_doc_processing.py) to read cached metadata from')
+    ap.add_argument('--cluster', action='store_true', help='Group artifacts by shared authoring fingerprints')
+    ap.add_argument('--fields', default=','.join(CLUSTER_FIELDS), help='Comma-separated fields used for clustering')
+    ap.add_argument('--min-shared', type=int, default=1, help='Fields two artifacts must share to be linked (default 1)')
+    ap.add_argument('--include-singletons', action='store_true', help='Also report artifacts that matched nothing')
+    ap.add_argument('--format', choices=['json','csv'], default='json', help='Cluster report format')
+    ap.add_argument('--out', help='Cluster report path (default stdout)')
+    instrument.add_profile_arguments(ap)
+    args=ap.parse_args()
+    instrument.start_profile(args.profile, args.profile_out)
+    if args.cluster:
+        fields=[f.strip() for f in args.fields.split(',') if f.strip()]
+        if not 1<=args.min_shared<=len(fields):
+            ap.error('--min-shared must be between 1 and the number of --fields')
+        if args.index:
+            with ArtifactIndex(pathlib.Path(args.index)) as index:
+                if args.files:
+                    metas=[from_index(str(p), index) for p in _walk(args.files)]
+                else:
+                    metas=[dict(a['meta'], sha256=a['sha256'], file=a['file']) for a in index.iter_artifacts()]
+        else:
+            metas=[collect(p) for p in _walk(args.files)]
+        clusters=cluster(metas, fields, args.min_shared)
+        if not args.include_singletons:
+            clusters=[c for c in clusters if c['size']>1]
+        if args.out:
+            with open(args.out, 'w', newline='') as out:
+                write_clusters(clusters, fields, args.format, out)
+            print(f'Wrote {len(clusters)} clusters over {len(metas)} artifacts to {args.out}')
+        else:
+            write_clusters(clusters, fields, args.format, sys.stdout)
+        return
+    if len(args.files)<2:
         print('Need at least two files to compare.')
         return
-    metas=[collect(pathlib.Path(p)) for p in sys.argv[1:]]
+    if args.index:
+        with ArtifactIndex(pathlib.Path(args.index)) as index:
+            metas=[from_index(ref, index) for ref in args.files]
+    else:
+        metas=[collect(pathlib.Path(p)) for p in args.files]
     # Build markdown table
     header=['field']+[m['file'] for m in metas]
     lines=['|'+'|'.join(header)+'|', '|'+'|'.join(['---']*len(header))+'|']
@@ -0,0 +1,329 @@
+"""Low-cost PDF metadata reader: trailer -> xref -> Info dict / XMP stream only.
+
+Works directly on a memory-mapped (or bytes) buffer and touches only the pages holding
+the trailer, the needed xref entries and the Info / Metadata objects, instead of
+building a full document model. Classic xref tables (incl. incremental updates via
+/Prev) are supported; cross-reference streams, object streams and encrypted files
+raise FastPathError so callers can fall back to pypdf.
+"""
+import re
+import xml.etree.ElementTree as ET
+import zlib
+from typing import Dict, NamedTuple
+
+INFO_KEYS = ['Title', 'Author', 'Creator', 'Producer', 'CreationDate', 'ModDate']
+MAX_XMP_BYTES = 4 << 20
+MAX_SECTIONS = 64
+WS = b' \t\r\n\x0c\x00'
+DELIMS = b'()<>[]{}/%'
+_STARTXREF = re.compile(rb'startxref\s+(\d+)')
+_SUBSECTION = re.compile(rb'(\d+)\s+(\d+)')
+_OBJ_HEAD = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj')
+_NUM = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)')
+_REF_TAIL = re.compile(rb'\s+(\d+)\s+R(?=[\s/<>\[\]()%]|$)')
+_ESCAPES = {ord('n'): b'\n', ord('r'): b'\r', ord('t'): b'\t', ord('b'): b'\b', ord('f'): b'\f',
+            ord('('): b'(', ord(')'): b')', ord('\\'): b'\\'}
+
+
+class FastPathError(Exception):
+    pass
+
+
+class NoDtdTreeBuilder(ET.TreeBuilder):
+    """TreeBuilder that refuses any DTD, wherever it sits and in whatever encoding: expat
+    reports the declaration itself, so padding or UTF-16 cannot hide it the way they hide
+    it from a byte scan. XMP and OOXML never declare one; entity expansion attacks need one."""
+    def doctype(self, name, pubid, system):
+        raise ValueError(f'XML declares a DTD ({name})')
+
+
+class Ref(NamedTuple):
+    num: int
+    gen: int
+
+
+class _Parser:
+    """Minimal PDF object parser (dicts, arrays, names, strings, numbers, refs)."""
+    def __init__(self, buf, pos: int):
+        self.buf = buf
+        self.pos = pos
+
+    def skip_ws(self):
+        buf, n = self.buf, len(self.buf)
+        while self.pos < n:
+            c = buf[self.pos]
+            if c in WS:
+                self.pos += 1
+            elif c == 0x25:  # % comment
+                while self.pos < n and buf[self.pos] not in b'\r\n':
+                    self.pos += 1
+            else:
+                return
+
+    def value(self):
+        self.skip_ws()
+        buf, pos = self.buf, self.pos
+        if pos >= len(buf):
+            raise FastPathError('unexpected end of data')
+        c = buf[pos]
+        if c == 0x2F:  # /
+            return self.name()
+        if c == 0x28:  # (
+            return self.literal()
+        if buf[pos:pos + 2] == b'<<':
+            return self.dictionary()
+        if c == 0x3C:  # <
+            return self.hexstring()
+        if c == 0x5B:  # [
+            self.pos += 1
+            items = []
+            while True:
+                self.skip_ws()
+                if buf[self.pos:self.pos + 1] == b']':
+                    self.pos += 1
+                    return items
+                items.append(self.value())
+        m = _NUM.match(buf, pos)
+        if m:
+            self.pos = m.end()
+            tail = _REF_TAIL.match(buf, self.pos)
+            if tail and m.group().isdigit():
+                self.pos = tail.end()
+                return Ref(int(m.group()), int(tail.group(1)))
+            text = m.group()
+            return float(text) if b'.' in text else int(text)
+        end = pos
+        while end < len(buf) and buf[end] not in WS and buf[end] not in DELIMS:
+            end += 1
+        if end == pos:
+            raise FastPathError(f'unexpected byte at {pos}')
+        self.pos = end
+        word = bytes(buf[pos:end])
+        return {b'true': True, b'false': False, b'null': None}.get(word, word)
+
+    def name(self) -> str:
+        self.pos += 1
+        start = self.pos
+        buf = self.buf
+        while self.pos < len(buf) and buf[self.pos] not in WS and buf[self.pos] not in DELIMS:
+            self.pos += 1
+        raw = bytes(buf[start:self.pos])
+        raw = re.sub(rb'#([0-9A-Fa-f]{2})', lambda m: bytes([int(m.group(1), 16)]), raw)
+        return raw.decode('latin-1')
+
+    def literal(self) -> bytes:
+        buf, out, depth = self.buf, bytearray(), 0
+        self.pos += 1
+        while self.pos < len(buf):
+            c = buf[self.pos]
+            self.pos += 1
+            if c == 0x5C:  # backslash
+                e = buf[self.pos]
+                self.pos += 1
+                if e in _ESCAPES:
+                    out += _ESCAPES[e]
+                elif 0x30 <= e <= 0x37:
+                    digits = bytes([e])
+                    while len(digits) < 3 and 0x30 <= buf[self.pos] <= 0x37:
+                        digits += bytes([buf[self.pos]])
+                        self.pos += 1
+                    out.append(int(digits, 8) & 0xFF)
+                elif e == 0x0D:  # line continuation
+                    if buf[self.pos] == 0x0A:
+                        self.pos += 1
+                elif e != 0x0A:
+                    out.append(e)
+            elif c == 0x28:
+                depth += 1
+                out.append(c)
+            elif c == 0x29:
+                if depth == 0:
+                    return bytes(out)
+                depth -= 1
+                out.append(c)
+            else:
+                out.append(c)
+        raise FastPathError('unterminated string')
+
+    def hexstring(self) -> bytes:
+        end = self.buf.find(b'>', self.pos)
+        if end < 0:
+            raise FastPathError('unterminated hex string')
+        digits = re.sub(rb'\s', b'', bytes(self.buf[self.pos + 1:end]))
+        self.pos = end + 1
+        if len(digits) % 2:
+            digits += b'0'
+        return bytes.fromhex(digits.decode('ascii'))
+
+    def dictionary(self) -> dict:
+        self.pos += 2
+        out = {}
+        while True:
+            self.skip_ws()
+            if self.buf[self.pos:self.pos + 2] == b'>>':
+                self.pos += 2
+                return out
+            if self.buf[self.pos:self.pos + 1] != b'/':
+                raise FastPathError(f'bad dictionary key at {self.pos}')
+            key = self.name()
+            out[key] = self.value()
+
+
+def decode_text(value) -> str:
+    """PDF text string -> str (UTF-16BE with BOM, UTF-8 with BOM, else PDFDocEncoding ~ latin-1)."""
+    if isinstance(value, bytes):
+        if value.startswith(b'\xfe\xff'):
+            return value[2:].decode('utf-16-be', 'replace')
+        if value.startswith(b'\xef\xbb\xbf'):
+            return value[3:].decode('utf-8', 'replace')
+        return value.decode('latin-1')
+    return str(value)
+
+
+class _Document:
+    def __init__(self, buf):
+        self.buf = buf
+        tail_start = max(0, len(buf) - 2048)
+        matches = list(_STARTXREF.finditer(buf, tail_start))
+        if not matches:
+            raise FastPathError('no startxref')
+        self.sections = []  # (xref offset, trailer dict)
+        offset = int(matches[-1].group(1))
+        seen = set()
+        while offset is not None and offset not in seen and len(self.sections) < MAX_SECTIONS:
+            seen.add(offset)
+            trailer = self._read_trailer(offset)
+            self.sections.append((offset, trailer))
+            prev = trailer.get('Prev')
+            offset = prev if isinstance(prev, int) else None
+        self.trailer = self.sections[0][1]
+        if 'Encrypt' in self.trailer:
+            raise FastPathError('encrypted')
+
+    def _subsections(self, offset: int):
+        """Yield (first_obj, count, entries_pos) for a classic xref section; return trailer pos."""
+        buf = self.buf
+        p = _Parser(buf, offset)
+        p.skip_ws()
+        if buf[p.pos:p.pos + 4] != b'xref':
+            raise FastPathError('xref stream (not a classic table)')
+        p.pos += 4
+        while True:
+            p.skip_ws()
+            if buf[p.pos:p.pos + 7] == b'trailer':
+                return p.pos + 7
+            m = _SUBSECTION.match(buf, p.pos)
+            if not m:
+                raise FastPathError('bad xref subsection')
+            first, count = int(m.group(1)), int(m.group(2))
+            p.pos = m.end()
+            p.skip_ws()
+            yield first, count, p.pos
+            p.pos += count * 20
+
+    def _read_trailer(self, offset: int) -> dict:
+        gen = self._subsections(offset)
+        while True:
+            try:
+                next(gen)
+            except StopIteration as stop:
+                trailer = _Parser(self.buf, stop.value).value()
+                if not isinstance(trailer, dict):
+                    raise FastPathError('bad trailer')
+                if 'XRefStm' in trailer:
+                    raise FastPathError('hybrid xref file')
+                return trailer
+
+    def offset_of(self, num: int) -> int:
+        for xref_offset, _ in self.sections:
+            for first, count, pos in self._subsections(xref_offset):
+                if first <= num < first + count:
+                    entry = bytes(self.buf[pos + (num - first) * 20:pos + (num - first) * 20 + 18])
+                    fields = entry.split()
+                    if len(fields) != 3 or fields[2] != b'n':
+                        raise FastPathError(f'object {num} not in use')
+                    return int(fields[0])
+        raise FastPathError(f'object {num} not in xref')
+
+    def resolve(self, value, depth: int = 0):
+        if not isinstance(value, Ref):
+            return value
+        if depth > 8:
+            raise FastPathError('reference chain too deep')
+        obj, _ = self.object(value.num)
+        return self.resolve(obj, depth + 1)
+
+    def object(self, num: int):
+        """Return (value, parser positioned after the value)."""
+        pos = self.offset_of(num)
+        m = _OBJ_HEAD.match(self.buf, pos)
+        if not m or int(m.group(1)) != num:
+            raise FastPathError(f'xref offset for object {num} is wrong')
+        p = _Parser(self.buf, m.end())
+        return p.value(), p
+
+    def stream(self, num: int) -> bytes:
+        obj, p = self.object(num)
+        if not isinstance(obj, dict):
+            raise FastPathError('not a stream')
+        p.skip_ws()
+        if self.buf[p.pos:p.pos + 6] != b'stream':
+            raise FastPathError('missing stream keyword')
+        start = p.pos + 6
+        if self.buf[start:start + 2] == b'\r\n':
+            start += 2
+        elif self.buf[start:start + 1] in (b'\n', b'\r'):
+            start += 1
+        length = self.resolve(obj.get('Length'))
+        if not isinstance(length, int) or length > MAX_XMP_BYTES:
+            raise FastPathError('bad or oversized stream length')
+        data = bytes(self.buf[start:start + length])
+        filters = obj.get('Filter')
+        filters = filters if isinstance(filters, list) else [filters] if filters else []
+        for f in filters:
+            if f != 'FlateDecode':
+                raise FastPathError(f'unsupported filter {f}')
+            d = zlib.decompressobj()
+            data = d.decompress(data, MAX_XMP_BYTES)
+            if d.unconsumed_tail:
+                raise FastPathError('XMP stream too large')
+        return data
+
+
+def xmp_fields(xml: bytes, limit: int) -> Dict[str, str]:
+    try:
+        parser = ET.XMLParser(target=NoDtdTreeBuilder())
+        parser.feed(xml)
+        root = parser.close()
+    except (ET.ParseError, ValueError):
+        return {}
+    out = {}
+    names = {'Producer': 'xmp_producer', 'CreatorTool': 'xmp_creator_tool', 'xmptk': 'xmp_toolkit'}
+    for el in root.iter():
+        local = el.tag.rsplit('}', 1)[-1]
+        if local in names and el.text and el.text.strip():
+            out.setdefault(names[local], el.text.strip()[:limit])
+        for k, v in el.attrib.items():
+            k = k.rsplit('}', 1)[-1]
+            if k in names and v.strip():
+                out.setdefault(names[k], v.strip()[:limit])
+    return out
+
+
+def read_metadata(buf, limit: int = 300) -> Dict[str, str]:
+    """Info dictionary fields (keys as in INFO_KEYS, lower-cased) plus XMP producer/toolkit.
+    Raises FastPathError when the file layout needs a full parser."""
+    doc = _Document(buf)
+    out = {}
+    info = doc.resolve(doc.trailer.get('Info'))
+    if isinstance(info, dict):
+        for k in INFO_KEYS:
+            if k in info:
+                out[k.lower()] = decode_text(doc.resolve(info[k]))[:limit]
+    root = doc.resolve(doc.trailer.get('Root'))
+    if isinstance(root, dict) and isinstance(root.get('Metadata'), Ref):
+        try:
+            out.update(xmp_fields(doc.stream(root['Metadata'].num), limit))
+        except FastPathError:
+            pass  # Info fields are still good; XMP is best-effort
+    return out
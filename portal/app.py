@@ -1,47 +1,79 @@
 #!/usr/bin/env python3
 """Minimal portal beacon server.
 Serves /logo.png and logs requester IP, UA, timestamp to session_log.csv (create from template first).
+Rows follow session_log_template.csv; set PORTAL_ASN_INDEX=<asn.idx> (asn_index.py) to fill
+asn/country live in the log writer thread (see beacon_log.resolver_from_env).
+Per-campaign assets: every <token>.png in PORTAL_ASSET_DIR (default ./branding) is preloaded
+into memory and served for /branding/<token>.png, matching the footer URL written by
+create_sample_agreement.py; unknown tokens get the default logo. The token is logged.
+Assets carry an ETag and are sent with Cache-Control: no-cache, so every re-open is
+revalidated (and logged) while repeat fetches are answered with a body-less 304.
 Usage: FLASK_APP=app.py flask run --host 0.0.0.0 --port 8000
+       gunicorn -w 4 -b 0.0.0.0:8000 app:app   (workers can share the log safely)
+Logging is buffered: requests enqueue the hit and a background writer (beacon_log.py)
+appends batches every PORTAL_LOG_FLUSH_SECONDS (default 1) or PORTAL_LOG_BATCH rows
+(default 256), and drains on shutdown.
+An ASGI variant with the same routes and log schema lives in asgi_app.py.
+PORTAL_METRICS=1 enables hit / log-flush metrics on /metrics (Prometheus text), served only
+to IPs in PORTAL_METRICS_ALLOW or with "Authorization: Bearer $PORTAL_METRICS_TOKEN"; with
+neither set it stays a 404 (loopback is not trusted: see beacon_log.py). Scrapes are not logged.
 """
-from flask import Flask, send_file, request, make_response
-import hashlib
+from flask import Flask, Response, request
 import datetime
-import csv
+import os
 import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))  # asn_enrich / asn_index
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+from assets import BLANK_PNG, TOKEN_RE, AssetStore, not_modified  # noqa: E402
+from beacon_log import METRICS_CONTENT_TYPE, metrics_allowed, metrics_text, record_hit, writer_from_env  # noqa: E402
 
 LOG_PATH = pathlib.Path('../session_log.csv')
-LOG_HEADERS = ['utc_timestamp','remote_ip','user_agent','path','referer','etag','notes']
+LOG_WRITER = writer_from_env(LOG_PATH)
 app = Flask(__name__)
 
 ASSET_PATH = pathlib.Path('logo.png')
 if not ASSET_PATH.exists():
     # create 1x1 transparent png
-    import base64
-    png_bytes=base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR4nGNgYAAAAAMAASsJTYQAAAAASUVORK5CYII=')
-    ASSET_PATH.write_bytes(png_bytes)
-
-
-def log_event(path:str, notes:str=''):
-    LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-    exists=LOG_PATH.exists()
-    with LOG_PATH.open('a', newline='') as f:
-        w=csv.writer(f)
-        if not exists:
-            w.writerow(LOG_HEADERS)
-        ua=request.headers.get('User-Agent','')
-        ref=request.headers.get('Referer','')
-        ts=datetime.datetime.utcnow().isoformat()+'Z'
-        etag=hashlib.sha256(f'{request.remote_addr}{ua}{ts}'.encode()).hexdigest()[:16]
-        w.writerow([ts, request.remote_addr, ua, path, ref, etag, notes])
+    ASSET_PATH.write_bytes(BLANK_PNG)
+ASSETS = AssetStore(pathlib.Path(os.environ.get('PORTAL_ASSET_DIR', 'branding')), default=ASSET_PATH.read_bytes())
+
+
+def log_event(path:str, notes:str='', token:str=''):
+    ua=request.headers.get('User-Agent','')
+    ref=request.headers.get('Referer','')
+    ts=datetime.datetime.utcnow().isoformat()+'Z'
+    LOG_WRITER.write((ts, request.remote_addr, ua, path, ref, token, notes))
+    record_hit(path, token, notes)
+
+def serve_asset(asset):
+    if not_modified(request.headers.get('If-None-Match'), asset.etag):
+        resp=Response(status=304)
+    else:
+        resp=Response(asset.body, mimetype=asset.content_type)
+    resp.headers['ETag']=asset.etag
+    resp.headers['Cache-Control']='no-cache'
+    return resp
 
 @app.route('/logo.png')
 @app.route('/l.png')
 @app.route('/asset/logo')
 def logo():
     log_event('/logo.png')
-    resp=make_response(send_file(str(ASSET_PATH)))
-    resp.headers['Cache-Control']='no-store'
-    return resp
+    return serve_asset(ASSETS.default)
+
+@app.route('/branding/<token>.png')
+def branding(token):
+    asset=ASSETS.get(token) if TOKEN_RE.match(token) else None
+    log_event(request.path, '' if asset else 'unknown_token', token[:64])
+    return serve_asset(asset or ASSETS.default)
+
+@app.route('/metrics')
+def metrics():
+    if not metrics_allowed(request.remote_addr, request.headers.get('Authorization')):
+        return Response('not found', status=404, mimetype='text/plain')
+    return Response(metrics_text(LOG_WRITER), content_type=METRICS_CONTENT_TYPE)
 
 @app.route('/')
 def index():
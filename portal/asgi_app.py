@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""ASGI variant of the portal beacon (same routes and session log schema as app.py).
+
+Plain ASGI callable, no framework: assets are served from memory (assets.py) and each
+hit is handed to the buffered log writer (beacon_log.py) with a non-blocking enqueue,
+so the event loop never touches the log file. The lifespan shutdown drains the queue.
+Usage: uvicorn asgi_app:app --host 0.0.0.0 --port 8000 --workers 4
+       (run from portal/; workers share session_log.csv safely)
+Routes: /, /logo.png, /l.png, /asset/logo, /branding/<token>.png, /metrics (PORTAL_METRICS=1 plus
+PORTAL_METRICS_ALLOW or PORTAL_METRICS_TOKEN)
+Benchmark: python bench_load.py --url http://127.0.0.1:8000 --concurrency 64 --duration 10
+"""
+import asyncio
+import datetime
+import os
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))  # asn_enrich / asn_index
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+from assets import BLANK_PNG, TOKEN_RE, AssetStore, not_modified  # noqa: E402
+from beacon_log import METRICS_CONTENT_TYPE, metrics_allowed, metrics_text, record_hit, writer_from_env  # noqa: E402
+
+LOG_PATH = pathlib.Path('../session_log.csv')
+LOG_WRITER = writer_from_env(LOG_PATH)
+
+ASSET_PATH = pathlib.Path('logo.png')
+if not ASSET_PATH.exists():
+    # create 1x1 transparent png
+    ASSET_PATH.write_bytes(BLANK_PNG)
+ASSETS = AssetStore(pathlib.Path(os.environ.get('PORTAL_ASSET_DIR', 'branding')), default=ASSET_PATH.read_bytes())
+LOGO_PATHS = {'/logo.png', '/l.png', '/asset/logo'}
+
+
+def log_event(scope, headers, path: str, notes: str = '', token: str = ''):
+    client = scope.get('client') or ('', 0)
+    ts = datetime.datetime.utcnow().isoformat() + 'Z'
+    LOG_WRITER.write((ts, client[0], headers.get('user-agent', ''), path, headers.get('referer', ''), token, notes))
+    record_hit(path, token, notes)
+
+
+def asset_response(asset, headers):
+    common = [(b'etag', asset.etag.encode()), (b'cache-control', b'no-cache')]
+    if not_modified(headers.get('if-none-match'), asset.etag):
+        return 304, common, b''
+    return 200, common + [(b'content-type', asset.content_type.encode()),
+                          (b'content-length', str(len(asset.body)).encode())], asset.body
+
+
+def route(scope, headers):
+    """-> (status, header list, body); logs the hit like the Flask routes do."""
+    path = scope['path']
+    if path in LOGO_PATHS:
+        log_event(scope, headers, '/logo.png')
+        return asset_response(ASSETS.default, headers)
+    if path.startswith('/branding/') and path.endswith('.png'):
+        token = path[len('/branding/'):-len('.png')]
+        asset = ASSETS.get(token) if TOKEN_RE.match(token) else None
+        log_event(scope, headers, path, '' if asset else 'unknown_token', token[:64])
+        return asset_response(asset or ASSETS.default, headers)
+    if path == '/metrics' and metrics_allowed((scope.get('client') or ('', 0))[0], headers.get('authorization')):
+        body = metrics_text(LOG_WRITER).encode()
+        return 200, [(b'content-type', METRICS_CONTENT_TYPE.encode()), (b'content-length', str(len(body)).encode())], body
+    if path == '/':
+        log_event(scope, headers, '/', 'index')
+        return 200, [(b'content-type', b'text/html; charset=utf-8'), (b'content-length', b'2')], b'ok'
+    return 404, [(b'content-type', b'text/plain'), (b'content-length', b'9')], b'not found'
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            LOG_WRITER.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, LOG_WRITER.close)
+            except Exception as e:  # rows were dropped (disk, store or resolver error); tell the server
+                await send({'type': 'lifespan.shutdown.failed', 'message': f'session log: {e}'})
+                return
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+    if scope['method'] not in ('GET', 'HEAD'):
+        status, out, body = 405, [(b'allow', b'GET, HEAD'), (b'content-length', b'0')], b''
+    else:
+        status, out, body = route(scope, headers)
+    await send({'type': 'http.response.start', 'status': status, 'headers': out})
+    await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run('asgi_app:app', host='0.0.0.0', port=8000)
@@ -0,0 +1,60 @@
+"""In-memory beacon assets keyed by campaign token.
+
+At startup every image in the asset directory is read once; `<token>.png` is served
+for `/branding/<token>.png` (the footer URL written by create_sample_agreement.py).
+Each asset carries a strong ETag so conditional requests can be answered with 304.
+"""
+import base64
+import hashlib
+import pathlib
+import re
+from typing import Dict, NamedTuple, Optional
+
+TOKEN_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+CONTENT_TYPES = {'.png': 'image/png', '.gif': 'image/gif', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
+                 '.svg': 'image/svg+xml', '.webp': 'image/webp'}
+# 1x1 transparent png
+BLANK_PNG = base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR4nGNgYAAAAAMAASsJTYQAAAAASUVORK5CYII=')
+
+
+class Asset(NamedTuple):
+    body: bytes
+    content_type: str
+    etag: str
+
+
+def make_asset(body: bytes, content_type: str = 'image/png') -> Asset:
+    return Asset(body, content_type, '"%s"' % hashlib.sha256(body).hexdigest()[:32])
+
+
+def not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(',')]
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+
+class AssetStore:
+    def __init__(self, directory: Optional[pathlib.Path] = None, default: bytes = BLANK_PNG):
+        self.default = make_asset(default)
+        self.assets: Dict[str, Asset] = {}
+        if directory is not None:
+            self.load(pathlib.Path(directory))
+
+    def load(self, directory: pathlib.Path) -> int:
+        """Preload `<token>.<ext>` files; invalid token names are ignored. Returns count loaded."""
+        if not directory.is_dir():
+            return 0
+        n = 0
+        for p in sorted(directory.iterdir()):
+            ctype = CONTENT_TYPES.get(p.suffix.lower())
+            if ctype and p.is_file() and TOKEN_RE.match(p.stem):
+                self.assets[p.stem] = make_asset(p.read_bytes(), ctype)
+                n += 1
+        return n
+
+    def get(self, token: str) -> Optional[Asset]:
+        return self.assets.get(token)
+
+    def __len__(self):
+        return len(self.assets)
@@ -0,0 +1,270 @@
+"""Buffered, non-blocking session log writer for the portal beacon.
+
+Request handlers only enqueue a small tuple; a single background thread owns the
+file descriptor, builds the CSV rows and appends them in batches. Each batch is one
+os.write() on an O_APPEND descriptor under an exclusive flock, so several gunicorn
+workers can share session_log.csv without interleaving or tearing lines. Batches are
+flushed every `flush_interval` seconds or once `max_batch` rows are queued, and
+close() (registered with atexit) drains the queue. An existing log whose header is
+not the current schema is renamed to <name>.<UTC time>.bak and a fresh log started.
+A failed write drops (and counts) that batch without stopping the thread; close()
+re-raises the last such error.
+
+Rows use the session_log_template.csv schema and are enriched with ASN / country in
+that background thread (asn_enrich.make_resolver: local asn_index.py index behind an
+LRU), so asn_enrich.py no longer needs a second pass over the log. With PORTAL_STORE set,
+each batch is also inserted into that evidence_store.py database (session table).
+
+With PORTAL_METRICS=1, hits, batch flush times and writer queue stats are recorded
+(instrument.py) and served as Prometheus text on /metrics, but only to scrapers that are
+explicitly allowed: a client IP listed in PORTAL_METRICS_ALLOW (comma-separated) or a
+request with "Authorization: Bearer $PORTAL_METRICS_TOKEN". Neither is set by default,
+and loopback is not trusted implicitly: behind a reverse proxy on the same host every
+visitor arrives from 127.0.0.1. Otherwise /metrics is a plain 404.
+Metrics are per process: with several workers each scrape sees the worker that answered.
+"""
+import atexit
+import csv
+import functools
+import hmac
+import io
+import os
+import pathlib
+import queue
+import sys
+import threading
+import time
+from typing import Callable, List, Optional, Sequence
+
+import instrument
+from asn_enrich import LRU_SIZE, SESSION_FIELDS, load_cache, make_resolver
+from asn_index import AsnIndex
+from evidence_store import EvidenceStore
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: O_APPEND only
+    fcntl = None
+
+LOG_HEADERS = SESSION_FIELDS
+_STOP = object()
+METRICS_ON = os.environ.get('PORTAL_METRICS') == '1'
+METRICS_ALLOW = frozenset(filter(None, (ip.strip() for ip in os.environ.get('PORTAL_METRICS_ALLOW', '').split(','))))
+METRICS_TOKEN = os.environ.get('PORTAL_METRICS_TOKEN', '')
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+if METRICS_ON:
+    instrument.enable()
+
+
+def record_hit(path: str, token: str = '', notes: str = ''):
+    """Count a beacon hit; branding hits share one label so tokens do not explode cardinality."""
+    instrument.count('portal.hits', route='/branding/<token>.png' if path.startswith('/branding/') else path)
+    if notes == 'unknown_token':
+        instrument.count('portal.unknown_tokens')
+
+
+def metrics_allowed(ip: Optional[str], authorization: Optional[str] = None) -> bool:
+    """/metrics is served only with PORTAL_METRICS=1 and an allowlisted IP or the bearer token."""
+    if not METRICS_ON:
+        return False
+    if ip and ip in METRICS_ALLOW:
+        return True
+    return bool(METRICS_TOKEN) and hmac.compare_digest((authorization or '').encode(),
+                                                       f'Bearer {METRICS_TOKEN}'.encode())
+
+
+def metrics_text(writer: 'BufferedLogWriter') -> str:
+    instrument.gauge('portal.log_queue', writer.queue.qsize())
+    instrument.gauge('portal.log_rows_written', writer.written)
+    instrument.gauge('portal.log_rows_dropped', writer.dropped)
+    instrument.gauge('portal.log_write_errors', writer.errors)
+    return instrument.prometheus_text()
+
+
+def beacon_row(item: Sequence[str], resolver: Optional[Callable] = None) -> List[str]:
+    """(ts, remote_ip, ua, path, referer, token, notes) -> session_log_template.csv row.
+    The referer has no column of its own and is kept in notes as ref=<url>."""
+    ts, ip, ua, path, ref, token, notes = item
+    info = resolver(ip) if resolver and ip else {}
+    if ref:
+        notes = f'{notes}; ref={ref}' if notes else f'ref={ref}'
+    return [ts, ip, info.get('asn', ''), info.get('country', ''), ua, path, token, notes]
+
+
+def resolver_from_env() -> Optional[Callable]:
+    """PORTAL_ASN_INDEX (asn_index.py file) enables live enrichment; PORTAL_ENRICH_FALLBACK=1
+    adds the cached (PORTAL_IP_CACHE, default ip_cache.sqlite3), rate-limited HTTP lookup for
+    IPs the index lacks (slow: off by default); PORTAL_ENRICH_LRU sizes the in-process cache."""
+    db = os.environ.get('PORTAL_ASN_INDEX')
+    fallback = os.environ.get('PORTAL_ENRICH_FALLBACK') == '1'
+    if not db and not fallback:
+        return None
+    index = AsnIndex(pathlib.Path(db)) if db else None
+    cache = load_cache(os.environ.get('PORTAL_IP_CACHE')) if fallback else None
+    return make_resolver(index, cache, fallback, lru_size=int(os.environ.get('PORTAL_ENRICH_LRU', LRU_SIZE)))
+
+
+def store_sink(path: pathlib.Path) -> Callable:
+    """on_batch callback inserting rows into an evidence store; opened lazily in the writer thread."""
+    store = None
+
+    def sink(rows):
+        nonlocal store
+        if store is None:
+            store = EvidenceStore(path)
+        store.insert('session', rows)
+    return sink
+
+
+def writer_from_env(path: pathlib.Path) -> 'BufferedLogWriter':
+    """Session log writer tuned by PORTAL_LOG_FLUSH_SECONDS / PORTAL_LOG_BATCH (shared by both portals)."""
+    store = os.environ.get('PORTAL_STORE')
+    return BufferedLogWriter(path, LOG_HEADERS, prepare=functools.partial(beacon_row, resolver=resolver_from_env()),
+                             flush_interval=float(os.environ.get('PORTAL_LOG_FLUSH_SECONDS', '1')),
+                             max_batch=int(os.environ.get('PORTAL_LOG_BATCH', '256')),
+                             on_batch=store_sink(pathlib.Path(store)) if store else None)
+
+
+class BufferedLogWriter:
+    def __init__(self, path: pathlib.Path, headers: List[str], prepare: Optional[Callable] = None,
+                 flush_interval: float = 1.0, max_batch: int = 256, max_queue: int = 100000,
+                 on_batch: Optional[Callable] = None):
+        self.path = pathlib.Path(path)
+        self.headers = headers
+        self.prepare = prepare or list
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.on_batch = on_batch
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+        self.errors = 0
+        self.error: Optional[BaseException] = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='beacon-log', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+        return self
+
+    def write(self, item):
+        """Enqueue one event; never blocks the request. Drops (and counts) if the queue is full."""
+        if self._thread is None:
+            self.start()
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 10.0):
+        """Drain the queue and stop the thread; raises the last write error, if any."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self.queue.put(_STOP)
+            thread.join(timeout)
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def _failed(self, what: str, e: BaseException, rows: int = 0):
+        self.errors += 1
+        self.dropped += rows
+        self.error = e
+        print(f'beacon_log: {what} {self.path} failed ({rows} rows dropped): {e}', file=sys.stderr)
+
+    def _run(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = self._open()
+        except OSError as e:
+            self._failed('opening', e)
+            return
+        try:
+            stop = False
+            while not stop:
+                batch = []
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                    while True:
+                        if item is _STOP:
+                            stop = True
+                            break
+                        batch.append(item)
+                        if len(batch) >= self.max_batch:
+                            break
+                        item = self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+                if batch:
+                    try:
+                        self._append(fd, batch)
+                    except Exception as e:  # keep serving; the next batch may succeed (disk freed, etc.)
+                        self._failed('appending to', e, len(batch))
+        finally:
+            os.close(fd)
+
+    def _open(self) -> int:
+        """O_APPEND descriptor for the log; an existing file with another header is rotated
+        aside first (under the flock, so concurrent workers rotate it once)."""
+        while True:
+            fd = os.open(str(self.path), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                try:
+                    current = os.stat(self.path).st_ino == os.fstat(fd).st_ino
+                except FileNotFoundError:
+                    current = False  # another worker rotated it between our open and flock
+                if current:
+                    text = os.pread(fd, 65536, 0).decode('utf-8', 'replace')
+                    first = next(csv.reader(io.StringIO(text)), None)
+                    if first is None or first == self.headers:
+                        return fd
+                    stamp = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+                    backup, n = self.path.with_name(f'{self.path.name}.{stamp}.bak'), 1
+                    while backup.exists():
+                        backup, n = self.path.with_name(f'{self.path.name}.{stamp}.{n}.bak'), n + 1
+                    os.rename(self.path, backup)
+                    print(f'beacon_log: {self.path} header {first} differs from {self.headers}; '
+                          f'moved it to {backup.name} and started a new log', file=sys.stderr)
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _append(self, fd: int, batch):
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        rows = []
+        for item in batch:
+            try:
+                rows.append(self.prepare(item))
+            except Exception:
+                self.dropped += 1
+        w.writerows(rows)
+        data = buf.getvalue().encode('utf-8')
+        with instrument.span('portal.log_flush'):
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size == 0:
+                    hb = io.StringIO()
+                    csv.writer(hb).writerow(self.headers)
+                    data = hb.getvalue().encode('utf-8') + data
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+        self.written += len(batch)
+        if self.on_batch is not None:
+            try:
+                self.on_batch(rows)
+            except Exception as e:  # the CSV is the record of truth; a store hiccup must not stop logging
+                print(f'beacon_log: on_batch failed: {e}', file=sys.stderr)
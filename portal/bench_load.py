@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Local load generator for the portal beacon routes (stdlib only; works against app.py or asgi_app.py).
+
+Opens --concurrency keep-alive HTTP/1.1 connections and issues GETs round-robin over
+--paths until --requests are done or --duration seconds pass, then reports p50/p90/p99
+latency per path and overall requests/sec. --revalidate sends If-None-Match with the
+ETag from the previous response, exercising the 304 path browsers take on re-open.
+Usage: python bench_load.py --url http://127.0.0.1:8000 --concurrency 64 --duration 10
+       python bench_load.py --url http://127.0.0.1:8000 --requests 20000 --paths /logo.png,/branding/TOKEN.png --json
+Note: every request is a real beacon hit and is written to the server's session log;
+point the server at a scratch log (run it from a scratch copy of portal/) when benchmarking.
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+DEFAULT_PATHS = ['/logo.png', '/l.png', '/branding/BENCH.png']
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list (q in 0..100)."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+async def read_response(reader: asyncio.StreamReader):
+    """-> (status, headers, body) for one HTTP/1.1 response with Content-Length (or none for 304)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split(None, 2)[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        k, _, v = line.decode('latin-1').partition(':')
+        headers[k.strip().lower()] = v.strip()
+    length = int(headers.get('content-length', '0'))
+    if 'chunked' in headers.get('transfer-encoding', ''):
+        body = b''
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                break
+            body += chunk[:-2]
+        return status, headers, body
+    body = await reader.readexactly(length) if length and status not in (204, 304) else b''
+    return status, headers, body
+
+
+async def worker(host: str, port: int, paths: List[str], offset: int, state: Dict, revalidate: bool):
+    reader = writer = None
+    etags = {}
+    i = offset
+    while state['remaining'] > 0 and time.perf_counter() < state['deadline']:
+        state['remaining'] -= 1
+        path = paths[i % len(paths)]
+        i += 1
+        extra = f'If-None-Match: {etags[path]}\r\n' if revalidate and path in etags else ''
+        req = (f'GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: bench_load/1\r\n{extra}\r\n').encode()
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(req)
+            status, headers, _ = await read_response(reader)
+            if headers.get('connection', '').lower() == 'close':
+                writer.close()
+                reader = writer = None
+        except (OSError, ConnectionError, ValueError, IndexError, asyncio.IncompleteReadError):
+            state['errors'] += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        state['latencies'][path].append(time.perf_counter() - start)
+        state['status'][status] += 1
+        if 'etag' in headers:
+            etags[path] = headers['etag']
+    if writer is not None:
+        writer.close()
+
+
+async def run(url: str, paths: List[str], concurrency: int, requests: int, duration: float,
+              revalidate: bool = False, warmup: int = 0) -> Dict:
+    parsed = urllib.parse.urlsplit(url)
+    host, port = parsed.hostname or '127.0.0.1', parsed.port or 80
+    if warmup:
+        warm = {'remaining': warmup, 'deadline': float('inf'), 'errors': 0,
+                'latencies': defaultdict(list), 'status': Counter()}
+        await asyncio.gather(*(worker(host, port, paths, k, warm, revalidate) for k in range(min(concurrency, warmup))))
+    state = {'remaining': requests or float('inf'), 'deadline': time.perf_counter() + (duration or float('inf')),
+             'errors': 0, 'latencies': defaultdict(list), 'status': Counter()}
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, paths, k, state, revalidate) for k in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return summarize(state, elapsed, concurrency)
+
+
+def summarize(state: Dict, elapsed: float, concurrency: int) -> Dict:
+    def stats(values):
+        values = sorted(values)
+        return {'requests': len(values), 'p50_ms': round(percentile(values, 50) * 1000, 3),
+                'p90_ms': round(percentile(values, 90) * 1000, 3), 'p99_ms': round(percentile(values, 99) * 1000, 3),
+                'max_ms': round(values[-1] * 1000, 3) if values else 0.0}
+    every = [v for vals in state['latencies'].values() for v in vals]
+    out = stats(every)
+    out.update({'elapsed_s': round(elapsed, 3), 'rps': round(len(every) / elapsed, 1) if elapsed else 0.0,
+                'concurrency': concurrency, 'errors': state['errors'],
+                'status': {str(k): v for k, v in sorted(state['status'].items())},
+                'paths': {p: stats(v) for p, v in state['latencies'].items()}})
+    return out
+
+
+def print_report(r: Dict):
+    print(f"{r['requests']} requests in {r['elapsed_s']}s  concurrency={r['concurrency']}  "
+          f"rps={r['rps']}  errors={r['errors']}  status={r['status']}")
+    print(f"{'path':30} {'n':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for path, s in sorted(r['paths'].items()) + [('ALL', r)]:
+        print(f"{path[:30]:30} {s['requests']:>8} {s['p50_ms']:>9} {s['p90_ms']:>9} {s['p99_ms']:>9} {s['max_ms']:>9}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Load-test the portal beacon routes')
+    ap.add_argument('--url', default='http://127.0.0.1:8000', help='server base URL (http only)')
+    ap.add_argument('--paths', default=','.join(DEFAULT_PATHS), help='comma-separated paths, requested round-robin')
+    ap.add_argument('--concurrency', type=int, default=32, help='parallel keep-alive connections')
+    ap.add_argument('--requests', type=int, default=0, help='total requests (0 = until --duration)')
+    ap.add_argument('--duration', type=float, default=10.0, help='seconds to run (0 = until --requests)')
+    ap.add_argument('--warmup', type=int, default=200, help='requests sent before measuring')
+    ap.add_argument('--revalidate', action='store_true', help='send If-None-Match with the last ETag (304 path)')
+    ap.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = ap.parse_args()
+    if not args.requests and not args.duration:
+        ap.error('set --requests and/or --duration')
+    paths = [p.strip() for p in args.paths.split(',') if p.strip()]
+    report = asyncio.run(run(args.url, paths, args.concurrency, args.requests, args.duration,
+                             args.revalidate, args.warmup))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,118 +1,215 @@
 #!/usr/bin/env python3
 """Utility: hash files and extract limited metadata from DOCX / PDF for logging.
 Usage: ./scripts_doc_processing.py <path1> [<path2> ...]
+       ./scripts_doc_processing.py --workers 8 seized_archive/   (directories are walked recursively)
 Appends rows to evidence_log.csv (create from template first).
+With --workers N, hashing and metadata extraction run in a process pool. In either mode a
+single writer in the parent batches the appends (--batch-size rows per open of the log and
+per index / store commit).
+An artifact index (<log>.index.sqlite3, see artifact_index.py) remembers what was already
+logged: unchanged files (same path, size, mtime) are not re-hashed, and known content only
+gains a sighting record unless --on-duplicate says otherwise.
+With --store ops_store.sqlite3, logged rows are also written to the indexed evidence store
+(evidence_store.py).
 """
 import argparse
-import hashlib
-import zipfile
 import json
 import csv
 import datetime
 import pathlib
-from typing import Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import artifact_extract
+import instrument
+from artifact_index import ArtifactIndex
+from evidence_store import EvidenceStore
 
 DEFAULT_LOG = pathlib.Path('counter_scam_op/evidence_log.csv')
 
-PDF_KEYS = ["/Title","/Author","/Creator","/Producer","/CreationDate","/ModDate"]
+PDF_KEYS = artifact_extract.PDF_KEYS
+LOG_FIELDS = ['artifact_id','utc_timestamp','sha256','source_channel','type','original_filename','creator','last_modified_by','application','version','notes']
 
 def sha256_file(p: pathlib.Path) -> str:
-    h=hashlib.sha256()
-    with p.open('rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
-            h.update(chunk)
-    return h.hexdigest()
+    return artifact_extract.sha256_file(p)
 
 def extract_docx_meta(p: pathlib.Path) -> Dict[str,str]:
-    out={}
-    try:
-        with zipfile.ZipFile(p) as z:
-            def read_xml(name):
-                try:
-                    return z.read(name).decode('utf-8','ignore')
-                except KeyError:
-                    return ''
-            core=read_xml('docProps/core.xml')
-            app=read_xml('docProps/app.xml')
-            # naive tag pulls
-            import re
-            for tag,key in [ ('<dc:creator>(.*?)</dc:creator>','creator'),
-                             ('<cp:lastModifiedBy>(.*?)</cp:lastModifiedBy>','last_modified_by'),
-                             ('<cp:revision>(.*?)</cp:revision>','revision'),
-                             ('<dcterms:created[^>]*>(.*?)</dcterms:created>','created'),
-                             ('<dcterms:modified[^>]*>(.*?)</dcterms:modified>','modified'),
-                             ('<Application>(.*?)</Application>','application'),
-                             ('<AppVersion>(.*?)</AppVersion>','app_version')]:
-                m=re.search(tag, core+app, re.DOTALL)
-                if m:
-                    out[key]=m.group(1)[:200]
-    except Exception as e:
-        out['error']=str(e)
-    return out
+    with instrument.span('doc_processing.extract_meta', type='docx'):
+        return artifact_extract.meta_for(p, artifact_extract.DEFAULT_LIMITS['docx'])
 
 def extract_pdf_meta(p: pathlib.Path) -> Dict[str,str]:
-    try:
-        from pypdf import PdfReader
-    except ImportError:
-        return {'error':'pypdf not installed'}
-    out={}
-    try:
-        r=PdfReader(str(p))
-        info=r.metadata or {}
-        for k in PDF_KEYS:
-            if k in info:
-                out[k.strip('/').lower()]=str(info[k])[:300]
-    except Exception as e:
-        out['error']=str(e)
-    return out
+    with instrument.span('doc_processing.extract_meta', type='pdf'):
+        return artifact_extract.meta_for(p, artifact_extract.DEFAULT_LIMITS['pdf'])
 
-def append_log(row: Dict[str,str], log_path: pathlib.Path):
+def append_rows(rows: List[Dict[str,str]], log_path: pathlib.Path):
     if log_path.name.endswith('_template.csv'):
         raise ValueError('Refusing to write into a template file. Provide a working log path.')
+    if not rows:
+        return
     exists=log_path.exists()
-    with log_path.open('a', newline='') as f:
+    with instrument.span('doc_processing.append_log'), log_path.open('a', newline='') as f:
         w=csv.writer(f)
         if not exists:
-            w.writerow(['artifact_id','utc_timestamp','sha256','source_channel','type','original_filename','creator','last_modified_by','application','version','notes'])
-        w.writerow([row.get(k,'') for k in ['artifact_id','utc_timestamp','sha256','source_channel','type','original_filename','creator','last_modified_by','application','version','notes']])
+            w.writerow(LOG_FIELDS)
+        w.writerows([row.get(k,'') for k in LOG_FIELDS] for row in rows)
+    instrument.count('doc_processing.rows_logged', len(rows))
+
+def append_log(row: Dict[str,str], log_path: pathlib.Path):
+    append_rows([row], log_path)
+
+def inspect_file(p: pathlib.Path) -> Tuple[str,str,Dict[str,str]]:
+    """Hash one file and pull DOCX/PDF metadata in a single read: (sha256, type, meta)."""
+    with instrument.span('doc_processing.inspect'):
+        rec=artifact_extract.extract(p)
+    instrument.count('doc_processing.files', type=rec.type)
+    return rec.sha256, rec.type, rec.meta
+
+def make_row(sha: str, ftype: str, meta: Dict[str,str], p: pathlib.Path, channel: str, ts: str) -> Dict[str,str]:
+    return {
+        'artifact_id': sha[:12],
+        'utc_timestamp': ts,
+        'sha256': sha,
+        'source_channel': channel,
+        'type': ftype,
+        'original_filename': p.name,
+        'creator': meta.get('creator',''),
+        'last_modified_by': meta.get('last_modified_by',''),
+        'application': meta.get('application',''),
+        'version': meta.get('app_version', meta.get('revision','')),
+        'notes': meta.get('error','')
+    }
+
+def _utc_now() -> str:
+    return datetime.datetime.utcnow().isoformat()+'Z'
+
+def process_file(p: pathlib.Path, channel: str) -> Dict[str,str]:
+    """Hash one file and pull DOCX/PDF metadata into an evidence_log row."""
+    return make_row(*inspect_file(p), p, channel, _utc_now())
+
+def iter_paths(paths: List[str], skip: Iterable[pathlib.Path] = ()) -> Iterator[pathlib.Path]:
+    """Expand CLI paths: files as given, directories walked recursively (sorted).
+    `skip` (the evidence log and index files) is never yielded from a directory walk."""
+    skip={s.resolve() for s in skip}
+    for path in paths:
+        p=pathlib.Path(path)
+        if p.is_dir():
+            yield from (c for c in sorted(p.rglob('*')) if c.is_file() and c.resolve() not in skip)
+        elif p.exists():
+            yield p
+        else:
+            print('Missing', p)
+
+def ingest(files: Iterable[pathlib.Path], log_path: pathlib.Path, channel: str, workers: int = 1,
+           batch_size: int = 200, index: ArtifactIndex = None, on_duplicate: str = 'sighting',
+           quiet: bool = False, store: EvidenceStore = None) -> Dict[str,int]:
+    """Hash/extract `files` (serially or in a process pool) and append new rows to the log.
+
+    With an index, files whose (path, size, mtime) are unchanged are not re-hashed, and
+    content already indexed under its sha256 is handled per `on_duplicate`:
+    'skip' (ignore), 'sighting' (record a sighting in the index only) or 'log' (append anyway).
+    With a `store`, each flushed batch is inserted into its evidence table as well.
+    Index writes are committed only once the batch they belong to is in the log; if
+    ingest fails they are rolled back, so a re-run picks those files up again.
+    """
+    stats={'logged':0,'duplicates':0,'unchanged':0}
+    pending=[]
+    def flush():
+        append_rows(pending, log_path)
+        if index:
+            index.flush()
+        if store:
+            store.insert('evidence', pending)
+        stats['logged']+=len(pending)
+        pending.clear()
+    def queue(row):
+        pending.append(row)
+        if not quiet:
+            print(json.dumps(row, indent=2))
+        if len(pending)>=batch_size:
+            flush()
+    def handle(p, sha, ftype, meta, st, ts):
+        duplicate=index is not None and not index.record(sha, p, ftype, meta, channel, ts, st,
+                                                         duplicate_sighting=on_duplicate!='skip')
+        if duplicate:
+            stats['duplicates']+=1
+            if on_duplicate!='log':
+                return
+        queue(make_row(sha, ftype, meta, p, channel, ts))
+    def fresh():
+        # pre-filter: unchanged files already in the index are never re-hashed
+        for p in files:
+            st=p.stat()
+            sha=index.known_sha(p, st) if index else None
+            if sha is None:
+                yield p, st
+                continue
+            stats['unchanged']+=1
+            stats['duplicates']+=1
+            if on_duplicate=='skip':
+                continue
+            ts=_utc_now()
+            index.add_sighting(sha, p, channel, ts)
+            if on_duplicate=='log':
+                art=index.get(sha)
+                queue(make_row(sha, art['type'], art['meta'], p, channel, ts))
+    try:
+        todo=fresh()
+        if workers<=1:
+            for p, st in todo:
+                handle(p, *inspect_file(p), st, _utc_now())
+        else:
+            batch=list(todo)  # Executor.map submits everything up front anyway
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                results=ex.map(inspect_file, [p for p, _ in batch], chunksize=8)
+                for (p, st), result in zip(batch, results):
+                    handle(p, *result, st, _utc_now())
+        flush()
+    except BaseException:
+        if index:
+            index.rollback()
+        raise
+    return stats
 
 def main():
     ap=argparse.ArgumentParser(description='Hash and log DOCX/PDF metadata')
-    ap.add_argument('paths', nargs='+', help='File paths to process')
+    ap.add_argument('paths', nargs='+', help='File or directory paths to process (directories are walked recursively)')
     ap.add_argument('--log', default=str(DEFAULT_LOG), help='Output CSV log path (default counter_scam_op/evidence_log.csv)')
     ap.add_argument('--channel', default='whatsapp', help='Source channel label')
+    ap.add_argument('--workers', type=int, default=1, help='Worker processes for hashing/extraction (default 1 = serial)')
+    ap.add_argument('--batch-size', type=int, default=200, help='Rows buffered per append to the log and per index/store commit (default 200)')
+    ap.add_argument('--quiet', action='store_true', help='Do not print each logged row')
+    ap.add_argument('--index', help='Artifact index path (default <log>.index.sqlite3 next to the log)')
+    ap.add_argument('--no-index', action='store_true', help='Disable the artifact index (log every file, always re-hash)')
+    ap.add_argument('--on-duplicate', choices=['skip','sighting','log'], default='sighting',
+                    help='Known artifacts: skip, record a sighting in the index (default), or log a new row anyway')
+    ap.add_argument('--store', help='Also write rows to this evidence store (evidence_store.py SQLite file)')
+    instrument.add_profile_arguments(ap)
     args=ap.parse_args()
+    instrument.start_profile(args.profile, args.profile_out)
     log_path=pathlib.Path(args.log)
-    for path in args.paths:
-        p=pathlib.Path(path)
-        if not p.exists():
-            print('Missing', p)
-            continue
-        sha=sha256_file(p)
-        meta={}
-        ftype='other'
-        if p.suffix.lower()=='.docx':
-            meta = extract_docx_meta(p)
-            ftype = 'docx'
-        elif p.suffix.lower()=='.pdf':
-            meta = extract_pdf_meta(p)
-            ftype = 'pdf'
-        ts=datetime.datetime.utcnow().isoformat()+'Z'
-        row={
-            'artifact_id': sha[:12],
-            'utc_timestamp': ts,
-            'sha256': sha,
-            'source_channel': args.channel,
-            'type': ftype,
-            'original_filename': p.name,
-            'creator': meta.get('creator',''),
-            'last_modified_by': meta.get('last_modified_by',''),
-            'application': meta.get('application',''),
-            'version': meta.get('app_version', meta.get('revision','')),
-            'notes': meta.get('error','')
-        }
-        append_log(row, log_path)
-        print(json.dumps(row, indent=2))
+    index=None
+    skip=[log_path]
+    if not args.no_index:
+        index_path=pathlib.Path(args.index) if args.index else log_path.with_name(log_path.stem+'.index.sqlite3')
+        index=ArtifactIndex(index_path)
+        skip+=[index_path, index_path.with_name(index_path.name+'-wal'), index_path.with_name(index_path.name+'-shm')]
+    store=None
+    if args.store:
+        store_path=pathlib.Path(args.store)
+        store=EvidenceStore(store_path)
+        skip+=[store_path, store_path.with_name(store_path.name+'-wal'), store_path.with_name(store_path.name+'-shm')]
+    ok=False
+    try:
+        stats=ingest(iter_paths(args.paths, skip=skip), log_path, args.channel, args.workers,
+                     args.batch_size, index, args.on_duplicate, args.quiet, store)
+        ok=True
+    finally:
+        if index:
+            index.close(commit=ok)
+        if store:
+            store.close()
+    print(f"Logged {stats['logged']} artifacts to {log_path} "
+          f"(known/duplicate: {stats['duplicates']}, unchanged and not re-hashed: {stats['unchanged']})")
 
 if __name__=='__main__':
     main()
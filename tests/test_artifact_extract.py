@@ -0,0 +1,84 @@
+import hashlib
+import zipfile
+
+import pytest
+
+import artifact_extract
+
+CORE = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+        '<dc:creator>Alice</dc:creator><cp:lastModifiedBy>Bob</cp:lastModifiedBy><cp:revision>4</cp:revision>'
+        '<dcterms:created xsi:type="dcterms:W3CDTF">2025-08-24T10:00:00Z</dcterms:created></cp:coreProperties>')
+APP = ('<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties" '
+       'xmlns:vt="http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes">'
+       '<Template>Normal.dotm</Template><TotalTime>12</TotalTime><Application>Microsoft Office Word</Application>'
+       '<TitlesOfParts><vt:vector size="1" baseType="lpstr"><vt:lpstr>Agreement</vt:lpstr></vt:vector></TitlesOfParts>'
+       '<Company>Acme Ltd</Company><AppVersion>16.0000</AppVersion></Properties>')
+CUSTOM = ('<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/custom-properties" '
+          'xmlns:vt="http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes">'
+          '<property fmtid="{D5CDD505-2E9C-101B-9397-08002B2CF9AE}" pid="2" name="ClientRef">'
+          '<vt:lpwstr>INV-77</vt:lpwstr></property></Properties>')
+SETTINGS = ('<w:settings xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<w:attachedTemplate r:id="rId1"/><w:rsids><w:rsidRoot w:val="00A1B2C3"/>'
+            '<w:rsid w:val="00A1B2C3"/><w:rsid w:val="00D4E5F6"/></w:rsids></w:settings>')
+RELS = ('<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'attachedTemplate" Target="file:///C:/Users/jdoe/Templates/Lure.dotm" TargetMode="External"/></Relationships>')
+FOOTER_RELS = ('<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+               '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image" '
+               'Target="https://cdn.company-docs.com/branding/TOKEN123.png" TargetMode="External"/>'
+               '<Relationship Id="rId3" Type="x/image" Target="media/image1.png"/></Relationships>')
+
+
+def make_docx(path, **parts):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        for name, data in parts.items():
+            z.writestr(name, data)
+
+
+def test_single_read_hash_and_forensic_fields(tmp_path):
+    p = tmp_path / 'Agreement_v2.docx'
+    make_docx(p, **{'docProps/core.xml': CORE, 'docProps/app.xml': APP, 'docProps/custom.xml': CUSTOM,
+                    'word/settings.xml': SETTINGS, 'word/_rels/settings.xml.rels': RELS,
+                    'word/_rels/footer1.xml.rels': FOOTER_RELS, 'word/document.xml': 'x' * 300000})
+    rec = artifact_extract.extract(p)
+    assert rec.sha256 == hashlib.sha256(p.read_bytes()).hexdigest()
+    assert rec.type == 'docx' and rec.size == p.stat().st_size
+    m = rec.meta
+    assert (m['creator'], m['last_modified_by'], m['revision'], m['created']) == ('Alice', 'Bob', '4', '2025-08-24T10:00:00Z')
+    assert (m['application'], m['app_version'], m['template'], m['company'], m['total_time']) == \
+        ('Microsoft Office Word', '16.0000', 'Normal.dotm', 'Acme Ltd', '12')
+    assert m['custom:ClientRef'] == 'INV-77'
+    assert (m['rsid_root'], m['rsid_count'], m['rsids']) == ('00A1B2C3', '2', '00A1B2C3,00D4E5F6')
+    assert m['attached_template'] == 'file:///C:/Users/jdoe/Templates/Lure.dotm'
+    assert 'https://cdn.company-docs.com/branding/TOKEN123.png' in m['external_targets']
+    assert 'media/image1.png' not in m['external_targets']
+    assert 'error' not in m
+
+
+LOL = '<!DOCTYPE lolz [<!ENTITY lol "lol">]><coreProperties><creator>&lol;</creator></coreProperties>'
+
+
+@pytest.mark.parametrize('payload', [
+    LOL,
+    '<!--' + ' ' * 4096 + '-->\n' + LOL,  # DTD pushed past any fixed-size header scan
+    ('<?xml version="1.0" encoding="UTF-16"?>' + LOL).encode('utf-16'),
+    '<a>' + 'x' * (artifact_extract.MAX_PART_BYTES + 1) + '</a>',
+])
+def test_hostile_parts_are_rejected(tmp_path, payload):
+    p = tmp_path / 'bomb.docx'
+    make_docx(p, **{'docProps/core.xml': payload})
+    assert 'error' in artifact_extract.extract(p).meta
+
+
+def test_other_and_empty_files(tmp_path):
+    other = tmp_path / 'note.txt'
+    other.write_text('hello')
+    assert artifact_extract.extract(other) == ('note.txt', 5, hashlib.sha256(b'hello').hexdigest(), 'other', {})
+    empty = tmp_path / 'blank.docx'
+    empty.write_bytes(b'')
+    rec = artifact_extract.extract(empty)
+    assert rec.sha256 == hashlib.sha256(b'').hexdigest() and 'error' in rec.meta
@@ -0,0 +1,107 @@
+import csv
+import zipfile
+
+import pytest
+
+from artifact_index import ArtifactIndex
+import metadata_compare
+import scripts_doc_processing as sdp
+
+
+def make_docx(path, creator):
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('docProps/core.xml', '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/'
+                   'metadata/core-properties" xmlns:dc="http://purl.org/dc/elements/1.1/">'
+                   f'<dc:creator>{creator}</dc:creator><cp:revision>3</cp:revision></cp:coreProperties>')
+        z.writestr('docProps/app.xml', '<Properties><Application>Microsoft Office Word</Application>'
+                   '<AppVersion>16.0000</AppVersion></Properties>')
+
+
+def test_reingest_skips_known_and_unchanged(tmp_path, monkeypatch):
+    src = tmp_path / 'in'
+    src.mkdir()
+    make_docx(src / 'a.docx', 'Alice')
+    make_docx(src / 'b.docx', 'Bob')
+    log = tmp_path / 'evidence_log.csv'
+    with ArtifactIndex(tmp_path / 'idx.sqlite3') as idx:
+        stats = sdp.ingest(sdp.iter_paths([str(src)]), log, 'email', index=idx, quiet=True)
+        assert stats == {'logged': 2, 'duplicates': 0, 'unchanged': 0}
+        (src / 'copy.docx').write_bytes((src / 'a.docx').read_bytes())
+        real_inspect = sdp.inspect_file
+
+        def only_new_files(p):
+            assert p.name == 'copy.docx', f'{p.name} was re-hashed'
+            return real_inspect(p)
+        monkeypatch.setattr(sdp, 'inspect_file', only_new_files)
+        stats = sdp.ingest(sdp.iter_paths([str(src)]), log, 'email', index=idx, quiet=True)
+        assert stats == {'logged': 0, 'duplicates': 3, 'unchanged': 2}
+        sha = log.read_text().splitlines()[1].split(',')[2]
+        assert len(idx.sightings(sha)) == 3  # a.docx twice + copy.docx
+    assert len(log.read_text().splitlines()) == 3
+
+
+
+def test_failed_append_rolls_back_index_and_skip_records_nothing(tmp_path, monkeypatch):
+    src = tmp_path / 'in'
+    src.mkdir()
+    make_docx(src / 'a.docx', 'Alice')
+    log = tmp_path / 'evidence_log.csv'
+    real_append = sdp.append_rows
+
+    def disk_full(rows, path):
+        raise OSError('disk full')
+    monkeypatch.setattr(sdp, 'append_rows', disk_full)
+    with pytest.raises(OSError):
+        with ArtifactIndex(tmp_path / 'idx.sqlite3') as idx:
+            sdp.ingest(sdp.iter_paths([str(src)]), log, 'email', index=idx, quiet=True)
+    monkeypatch.setattr(sdp, 'append_rows', real_append)
+    with ArtifactIndex(tmp_path / 'idx.sqlite3') as idx:
+        assert idx.known_sha(src / 'a.docx') is None
+        assert sdp.ingest(sdp.iter_paths([str(src)]), log, 'email', index=idx, quiet=True)['logged'] == 1
+        sha = idx.known_sha(src / 'a.docx')
+        (src / 'copy.docx').write_bytes((src / 'a.docx').read_bytes())
+        stats = sdp.ingest(sdp.iter_paths([str(src)]), log, 'email', index=idx, on_duplicate='skip', quiet=True)
+        assert stats == {'logged': 0, 'duplicates': 2, 'unchanged': 1}
+        assert len(idx.sightings(sha)) == 1
+        assert idx.known_sha(src / 'copy.docx') == sha
+
+
+def test_parallel_ingest_of_nested_tree_matches_serial(tmp_path):
+    src = tmp_path / 'seized'
+    (src / 'mail' / '2024').mkdir(parents=True)
+    make_docx(src / 'a.docx', 'Alice')
+    make_docx(src / 'mail' / 'b.docx', 'Bob')
+    make_docx(src / 'mail' / '2024' / 'c.docx', 'Carol')
+    (src / 'mail' / '2024' / 'notes.txt').write_text('call back friday\n')
+    runs = {}
+    skip = []
+    for workers in (1, 2):
+        log, db = src / f'log{workers}.csv', src / f'idx{workers}.sqlite3'
+        skip += [log, db, db.with_name(db.name + '-wal'), db.with_name(db.name + '-shm')]
+    for workers in (1, 2):
+        log, db = src / f'log{workers}.csv', src / f'idx{workers}.sqlite3'
+        with ArtifactIndex(db) as idx:
+            stats = sdp.ingest(sdp.iter_paths([str(src)], skip=skip), log, 'email', workers=workers,
+                               batch_size=2, index=idx, quiet=True)
+        assert stats == {'logged': 4, 'duplicates': 0, 'unchanged': 0}
+        runs[workers] = [{k: v for k, v in r.items() if k != 'utc_timestamp'}
+                         for r in csv.DictReader(log.open(newline=''))]
+    assert runs[1] == runs[2]
+    assert [r['original_filename'] for r in runs[2]] == ['a.docx', 'c.docx', 'notes.txt', 'b.docx']
+    assert [r['creator'] for r in runs[2]] == ['Alice', 'Carol', '', 'Bob']
+    assert all(p.name not in ('log1.csv', 'idx1.sqlite3') for p in sdp.iter_paths([str(src)], skip=skip))
+
+def test_compare_from_index_without_reopening(tmp_path, monkeypatch):
+    make_docx(tmp_path / 'v1.docx', 'Alice')
+    log = tmp_path / 'evidence_log.csv'
+    with ArtifactIndex(tmp_path / 'idx.sqlite3') as idx:
+        sdp.ingest([tmp_path / 'v1.docx'], log, 'email', index=idx, quiet=True)
+        sha = idx.known_sha(tmp_path / 'v1.docx')
+
+        def no_reopen(p):
+            raise AssertionError(f'{p} was reopened')
+        monkeypatch.setattr(metadata_compare, 'collect', no_reopen)
+        by_path = metadata_compare.from_index(str(tmp_path / 'v1.docx'), idx)
+        by_sha = metadata_compare.from_index(f'sha256:{sha}', idx)
+    assert by_path['creator'] == by_sha['creator'] == 'Alice'
+    assert by_path['sha256'] == sha and by_path['file'] == 'v1.docx'
@@ -0,0 +1,86 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import asn_enrich
+
+
+def start_stub():
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            ip = self.path.strip('/').split('/')[0]
+            hits.append(ip)
+            body = json.dumps({'asn': 'AS64500', 'country_name': f'C-{ip}'}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, hits
+
+
+def test_enrich_dedupes_and_skips_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(asn_enrich, 'CACHE_PATH', tmp_path / 'ip_cache.sqlite3')
+    monkeypatch.setattr(asn_enrich, 'LEGACY_CACHE_PATH', tmp_path / 'ip_cache.json')
+    (tmp_path / 'ip_cache.json').write_text(json.dumps({'10.0.0.9': {'asn': 'AS1', 'country': 'Cached'}}))
+    srv, hits = start_stub()
+    try:
+        base = f'http://127.0.0.1:{srv.server_address[1]}'
+        rows = [{'ip': ip, 'asn': '', 'country': ''} for ip in ['10.0.0.1', '10.0.0.2', '10.0.0.1', '10.0.0.9']]
+        out = asn_enrich.enrich(rows, workers=4, rate=0, base_url=base)
+    finally:
+        srv.shutdown()
+    assert sorted(hits) == ['10.0.0.1', '10.0.0.2']
+    assert out[2]['country'] == 'C-10.0.0.1'
+    assert out[3]['asn'] == 'AS1'
+
+
+def test_cache_ttl_negative_and_eviction(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(asn_enrich.time, 'time', lambda: clock[0])
+    cache = asn_enrich.LookupCache(tmp_path / 'c.sqlite3', ttl=60, negative_ttl=5, max_entries=2)
+    cache['1.1.1.1'] = {'asn': 'AS1', 'country': 'A'}
+    cache['2.2.2.2'] = {'asn': '', 'country': ''}
+    assert '2.2.2.2' in cache
+    clock[0] += 10  # negative entry expired, positive one still valid
+    assert cache.get('1.1.1.1') == {'asn': 'AS1', 'country': 'A'}
+    assert '2.2.2.2' not in cache
+    for ip in ['3.3.3.3', '4.4.4.4']:
+        clock[0] += 1
+        cache[ip] = {'asn': 'AS3', 'country': 'C'}
+    cache.evict()
+    assert len(cache) == 2 and '1.1.1.1' not in cache and '3.3.3.3' in cache
+    cache.close()
+    # a second connection sees the persisted entries
+    again = asn_enrich.LookupCache(tmp_path / 'c.sqlite3')
+    assert again.get('4.4.4.4') == {'asn': 'AS3', 'country': 'C'}
+    again.close()
+
+
+def test_token_bucket_limits_rate():
+    import time
+    bucket = asn_enrich.TokenBucket(rate=50)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_lru_resolver_evicts_and_skips_blanks():
+    calls = []
+
+    def resolve(ip):
+        calls.append(ip)
+        return {'asn': '', 'country': ''} if ip == 'x' else {'asn': 'AS' + ip, 'country': 'C'}
+    lru = asn_enrich.LRUResolver(resolve, maxsize=2)
+    for ip in ['1', '2', '1', '3', '2', 'x', 'x']:
+        lru(ip)
+    assert calls == ['1', '2', '3', '2', 'x', 'x'] and list(lru.entries) == ['3', '2']
@@ -0,0 +1,37 @@
+from asn_index import AsnIndex, build_index
+import asn_enrich
+
+
+def make_index(tmp_path):
+    src = tmp_path / 'ranges.tsv'
+    src.write_text(
+        'range_start\trange_end\tAS_number\tcountry_code\tAS_description\n'
+        '1.0.0.0\t1.0.0.255\t13335\tUS\tCLOUDFLARENET\n'
+        '1.0.1.0\t1.0.3.255\t0\tNone\tNot routed\n'
+        '8.8.8.0\t8.8.8.255\t15169\tUS\tGOOGLE\n'
+        '2001:4860::\t2001:4860:ffff:ffff:ffff:ffff:ffff:ffff\tAS15169\tUS\tGOOGLE\n'
+        '41.0.0.0\t41.31.255.255\t10474\tZA\tOPTINET\n'
+    )
+    db = tmp_path / 'asn.idx'
+    assert build_index(src, db) == 4
+    return db
+
+
+def test_lookup_v4_v6_and_gaps(tmp_path):
+    with AsnIndex(make_index(tmp_path)) as idx:
+        assert idx.lookup('8.8.8.8') == {'asn': 'AS15169', 'country': 'US'}
+        assert idx.lookup('41.10.2.3') == {'asn': 'AS10474', 'country': 'ZA'}
+        assert idx.lookup('2001:4860::8888')['asn'] == 'AS15169'
+        assert idx.lookup('1.0.2.1') is None  # not routed
+        assert idx.lookup('9.9.9.9') is None
+        assert idx.lookup('0.0.0.1') is None
+        assert idx.lookup('not-an-ip') is None
+
+
+def test_enrich_offline_without_fallback(tmp_path, monkeypatch):
+    monkeypatch.setattr(asn_enrich, 'CACHE_PATH', tmp_path / 'ip_cache.sqlite3')
+    rows = [{'ip': '41.1.1.1', 'asn': '', 'country': ''}, {'ip': '9.9.9.9', 'asn': '', 'country': ''}]
+    with AsnIndex(make_index(tmp_path)) as idx:
+        asn_enrich.enrich(rows, index=idx, fallback=False)
+    assert rows[0] == {'ip': '41.1.1.1', 'asn': 'AS10474', 'country': 'ZA'}
+    assert rows[1]['asn'] == ''
@@ -0,0 +1,104 @@
+import csv
+import functools
+import multiprocessing
+import os
+
+import pytest
+
+from asn_enrich import make_resolver
+from asn_index import AsnIndex
+from evidence_store import EvidenceStore
+from portal.beacon_log import BufferedLogWriter, beacon_row, store_sink
+from test_asn_index import make_index
+
+HEADERS = ['utc_timestamp', 'ip', 'asn', 'country', 'ua', 'path', 'token', 'notes']
+
+
+def hammer(path, worker, n):
+    w = BufferedLogWriter(path, HEADERS, prepare=beacon_row, flush_interval=0.01, max_batch=7)
+    for i in range(n):
+        w.write((f'ts{i}', f'10.0.{worker}.{i % 250}', 'UA, "quoted"\nnext', '/logo.png', '', 'tok', f'w{worker}'))
+    w.close()
+
+
+def test_flush_on_close_and_header_once(tmp_path):
+    path = tmp_path / 'logs' / 'session_log.csv'
+    w = BufferedLogWriter(path, HEADERS, prepare=beacon_row, flush_interval=60, max_batch=1000)
+    for i in range(5):
+        w.write((f'ts{i}', '1.2.3.4', 'UA', '/logo.png', '', '', ''))
+    w.close()
+    rows = list(csv.reader(path.open(newline='')))
+    assert rows[0] == HEADERS and len(rows) == 6
+    assert rows[1] == ['ts0', '1.2.3.4', '', '', 'UA', '/logo.png', '', '']
+
+
+def test_mismatched_header_is_rotated_not_appended_to(tmp_path):
+    path = tmp_path / 'session_log.csv'
+    path.write_text('ts,ip,ua\nold,1.1.1.1,UA\n')
+    w = BufferedLogWriter(path, HEADERS, prepare=beacon_row, flush_interval=60)
+    w.write(('ts0', '1.2.3.4', 'UA', '/logo.png', '', '', ''))
+    w.close()
+    backups = list(tmp_path.glob('session_log.csv.*.bak'))
+    assert len(backups) == 1 and backups[0].read_text() == 'ts,ip,ua\nold,1.1.1.1,UA\n'
+    rows = list(csv.reader(path.open(newline='')))
+    assert rows[0] == HEADERS and len(rows) == 2
+
+
+def test_write_error_keeps_thread_and_surfaces_on_close(tmp_path, monkeypatch):
+    path = tmp_path / 'session_log.csv'
+    w = BufferedLogWriter(path, HEADERS, prepare=beacon_row, flush_interval=0.01, max_batch=1)
+    real_write, calls = os.write, []
+
+    def flaky_write(fd, data):
+        calls.append(fd)
+        if len(calls) == 1:
+            raise OSError(28, 'No space left on device')
+        return real_write(fd, data)
+    monkeypatch.setattr(os, 'write', flaky_write)
+    w.write(('ts0', '1.2.3.4', 'UA', '/logo.png', '', '', ''))
+    w.write(('ts1', '1.2.3.4', 'UA', '/logo.png', '', '', ''))
+    with pytest.raises(OSError):
+        w.close()
+    assert (w.errors, w.dropped, w.written) == (1, 1, 1)
+    assert [r[0] for r in csv.reader(path.open(newline=''))] == ['utc_timestamp', 'ts1']
+
+
+def test_concurrent_processes_do_not_interleave(tmp_path):
+    path = tmp_path / 'session_log.csv'
+    ctx = multiprocessing.get_context('fork')
+    procs = [ctx.Process(target=hammer, args=(path, k, 300)) for k in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    rows = list(csv.reader(path.open(newline='')))
+    assert rows[0] == HEADERS and rows.count(HEADERS) == 1
+    assert len(rows) == 1 + 4 * 300
+    assert all(len(r) == 8 and r[4] == 'UA, "quoted"\nnext' for r in rows[1:])
+
+
+def test_live_enrichment_in_writer_thread(tmp_path):
+    path = tmp_path / 'session_log.csv'
+    path.write_text(','.join(HEADERS) + '\n')  # seeded from session_log_template.csv
+    with AsnIndex(make_index(tmp_path)) as idx:
+        resolver = make_resolver(idx, lru_size=2)
+        w = BufferedLogWriter(path, HEADERS, prepare=functools.partial(beacon_row, resolver=resolver), flush_interval=60)
+        for ip in ['8.8.8.8', '41.1.1.1', '8.8.8.8', '9.9.9.9']:
+            w.write(('ts', ip, 'UA', '/branding/T1.png', 'https://mail.example/', 'T1', ''))
+        w.close()
+    rows = list(csv.reader(path.open(newline='')))
+    assert rows[0] == HEADERS and len(rows) == 5
+    assert rows[1] == ['ts', '8.8.8.8', 'AS15169', 'US', 'UA', '/branding/T1.png', 'T1', 'ref=https://mail.example/']
+    assert rows[2][2:4] == ['AS10474', 'ZA'] and rows[4][2:4] == ['', '']
+    assert (resolver.hits, resolver.misses) == (1, 3)
+
+
+def test_batches_also_go_to_store(tmp_path):
+    db = tmp_path / 'ops.sqlite3'
+    w = BufferedLogWriter(tmp_path / 'session_log.csv', HEADERS, prepare=beacon_row, flush_interval=60,
+                          on_batch=store_sink(db))
+    for i in range(3):
+        w.write((f'ts{i}', '10.1.1.1', 'UA', '/l.png', '', 'T9', ''))
+    w.close()
+    with EvidenceStore(db) as store:
+        assert [r['utc_timestamp'] for r in store.query('session', token='T9')] == ['ts0', 'ts1', 'ts2']
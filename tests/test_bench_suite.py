@@ -0,0 +1,33 @@
+import random
+
+import artifact_extract
+from benchmarks import bench_suite, generators
+
+
+def test_generators_are_deterministic_and_parseable(tmp_path):
+    generators.session_log(tmp_path / 'a.csv', 50, seed=7)
+    generators.session_log(tmp_path / 'b.csv', 50, seed=7)
+    assert (tmp_path / 'a.csv').read_bytes() == (tmp_path / 'b.csv').read_bytes()
+    assert generators.docx_bytes(random.Random(3)) == generators.docx_bytes(random.Random(3))
+    paths = generators.corpus(tmp_path / 'corpus', 2, 2)
+    metas = [artifact_extract.extract(p).meta for p in paths]
+    assert all(m.get('creator') in generators.AUTHORS for m in metas[:2])
+    assert all(m.get('producer') and 'error' not in m for m in metas[2:])
+
+
+def test_cases_run_and_compare_flags_regressions(tmp_path):
+    data = bench_suite.generate(tmp_path / 'data', scale=0.001)
+    stamp = (data / 'generated.json').read_text()
+    assert bench_suite.generate(data, scale=0.001) == data and (data / 'generated.json').read_text() == stamp
+    results = [bench_suite.run_case(name, str(data)) for name in ('build_chain', 'watermark_insert', 'metadata_collect')]
+    assert [r['rows'] for r in results] == [101, (data / 'text.txt').read_text().count('\n'), 2]
+    assert all(r['rows_per_s'] > 0 and r['peak_rss_mb'] > 0 for r in results)
+    fast = {r['case']: {'rows_per_s': r['rows_per_s'] * 10, 'mb_per_s': 0, 'peak_rss_mb': 1e9} for r in results}
+    msgs = bench_suite.compare(results, {'scale': 0.001, 'cases': fast}, scale=0.001)
+    assert bench_suite.compare(results, {'scale': 1.0, 'cases': fast}, scale=0.001) == []  # other scale: skipped
+    assert len(msgs) == 3 and all('rows_per_s' in m for m in msgs)
+    big = {'build_chain': {'rows_per_s': 1, 'peak_rss_mb': 1}}
+    assert bench_suite.compare(results, {'scale': 0.001, 'cases': big}, scale=0.001) == \
+        [f"build_chain: peak_rss_mb {results[0]['peak_rss_mb']:g} vs baseline 1 "
+         f"({results[0]['peak_rss_mb'] - 1:+.0%})"]
+    assert bench_suite.compare(results, {'scale': 1.0, 'cases': big}, scale=0.001) == []
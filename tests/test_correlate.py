@@ -0,0 +1,58 @@
+import csv
+import random
+
+import correlate
+from correlate import Event, window_join
+
+
+def write(path, header, rows):
+    with path.open('w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        w.writerows(rows)
+    return path
+
+
+def test_window_join_matches_brute_force():
+    rng = random.Random(5)
+    left = sorted(Event(rng.uniform(0, 1000), f'l{i}', '') for i in range(200))
+    right = sorted(Event(rng.uniform(0, 1000), f'r{i}', '') for i in range(300))
+    got = sorted((l.node, r.node) for l, r in window_join(left, right, 7, 3))
+    want = sorted((l.node, r.node) for l in left for r in right if l.t - 7 <= r.t <= l.t + 3)
+    assert got == want and got
+
+
+def test_graph_links_tokens_ips_artifacts_wallets(tmp_path):
+    session = write(tmp_path / 'session_log.csv', ['utc_timestamp', 'ip', 'asn', 'country', 'ua', 'path', 'token', 'notes'], [
+        ['2025-03-01T10:00:00Z', '203.0.113.5', 'AS64500', 'NL', 'UA', '/branding/b7f3c2e1.png', 'b7f3c2e1', ''],
+        ['2025-03-01T10:05:00Z', '203.0.113.5', 'AS64500', 'NL', 'UA', '/branding/b7f3c2e1.png', 'b7f3c2e1', ''],
+        ['2025-03-02T18:00:00Z', '198.51.100.9', 'AS64511', 'SG', 'UA', '/logo.png', '', ''],
+    ])
+    evidence = write(tmp_path / 'evidence_log.csv', ['artifact_id', 'utc_timestamp', 'sha256', 'source_channel', 'type',
+                                                     'original_filename', 'creator', 'notes'], [
+        ['aa', '2025-03-01T10:20:00Z', 'a' * 64, 'email', 'docx', 'Agreement_b7f3c2e1_signed.docx', 'Bob', ''],
+        ['bb', '2025-03-05T09:00:00Z', 'b' * 64, 'whatsapp', 'pdf', 'scan.pdf', '', ''],
+    ])
+    wallet = write(tmp_path / 'wallet_log.csv', ['utc_timestamp', 'address', 'chain'], [
+        ['2025-03-02T18:10:00Z', 'bc1qexample', 'BTC'],
+    ])
+    manifest = write(tmp_path / 'manifest.csv', ['token', 'watermark_id', 'file'], [
+        ['b7f3c2e1', '1', 'Agreement_b7f3c2e1.docx'], ['unusedtok', '2', 'Agreement_unusedtok.docx']])
+    g = correlate.correlate(session, evidence, wallet, manifest, window_min=30)
+    edges = {(e['source'], e['target'], e['type']): e for e in g['edges']}
+    hit = edges[('ip:203.0.113.5', 'token:b7f3c2e1', 'hit')]
+    assert hit['count'] == 2 and hit['first'] == '2025-03-01T10:00:00Z' and hit['last'] == '2025-03-01T10:05:00Z'
+    assert ('ip:203.0.113.5', 'asn:AS64500', 'announced_by') in edges
+    assert ('artifact:' + 'a' * 64, 'token:b7f3c2e1', 'carries') in edges
+    near = edges[('artifact:' + 'a' * 64, 'ip:203.0.113.5', 'near_hit')]
+    assert near['count'] == 2 and near['min_delta_s'] == 900
+    assert edges[('wallet:bc1qexample', 'ip:198.51.100.9', 'near_hit')]['min_delta_s'] == 600
+    assert not any(s == 'artifact:' + 'b' * 64 for s, _, _ in edges)
+    nodes = {n['id']: n for n in g['nodes']}
+    assert nodes['token:unusedtok']['lure_file'] == 'Agreement_unusedtok.docx' and nodes['ip:203.0.113.5']['country'] == 'NL'
+    assert set(g['components'][0]) == {'ip:203.0.113.5', 'token:b7f3c2e1', 'asn:AS64500', 'artifact:' + 'a' * 64}
+    assert len(g['components']) == 2
+
+
+def test_token_candidates():
+    assert {'b7f3c2e1', 'tok-12_x'} <= correlate.token_candidates('Agreement_b7f3c2e1_signed.docx re: v2-tok-12_x.pdf')
@@ -0,0 +1,59 @@
+import csv
+import io
+import zipfile
+
+import create_sample_agreement as csa
+import zero_width_watermark as zw
+
+DOC = ('<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="w"><w:body>'
+       '<w:p><w:r><w:t>Scope. Terms apply. Fees due.</w:t></w:r></w:p>'
+       '<w:p><w:r><w:t xml:space="preserve">Sign here. Date it. </w:t></w:r><w:r><w:t>Done.</w:t></w:r></w:p>'
+       '</w:body></w:document>')
+FOOTER = f'<w:ftr xmlns:w="w"><w:p><w:r><w:t>Remote logo: https://cdn.company-docs.com/branding/{csa.PLACEHOLDER}.png</w:t></w:r></w:p></w:ftr>'
+
+
+def fake_skeleton():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('[Content_Types].xml', '<Types/>')
+        z.writestr('word/document.xml', DOC)
+        z.writestr('word/footer1.xml', FOOTER)
+        z.writestr('word/media/image1.png', b'\x89PNG' * 100)
+    return buf.getvalue()
+
+
+def read_all(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        assert z.testzip() is None
+        return {n: z.read(n) for n in z.namelist()}
+
+
+def test_render_patches_footer_only():
+    template = csa.make_template(fake_skeleton())
+    assert list(template.parts) == ['word/footer1.xml']
+    parts = read_all(csa.render(template, 'TOKEN123'))
+    assert b'/branding/TOKEN123.png' in parts['word/footer1.xml']
+    assert parts['word/document.xml'].decode() == DOC and parts['word/media/image1.png'] == b'\x89PNG' * 100
+    assert sorted(parts) == sorted(read_all(fake_skeleton()))
+
+
+def test_watermark_marks_text_runs_only():
+    template = csa.make_template(fake_skeleton(), watermark_interval=2)
+    doc = read_all(csa.render(template, 'T1', rid=77))['word/document.xml'].decode()
+    assert zw.decode(doc) == {77: 3}  # 6 sentence ends across three runs
+    frame = zw.encode_id(77)
+    assert doc.replace(frame, '') == DOC
+    assert f'Terms apply.{frame}' in doc and f'Sign here.{frame}' in doc and f'Done.{frame}' in doc
+
+
+def test_batch_parallel_with_manifest(tmp_path):
+    template = csa.make_template(fake_skeleton(), watermark_interval=3)
+    tokens = [(f'tok{i}', i + 1) for i in range(6)]
+    manifest = csa.generate_batch(template, tokens, tmp_path / 'out', watermark=True, workers=2)
+    assert [m['file'] for m in manifest] == [f'Agreement_tok{i}.docx' for i in range(6)]
+    for i, m in enumerate(manifest):
+        parts = read_all((tmp_path / 'out' / m['file']).read_bytes())
+        assert f'/branding/tok{i}.png'.encode() in parts['word/footer1.xml']
+        assert set(zw.decode(parts['word/document.xml'].decode())) == {i + 1}
+    rows = list(csv.DictReader((tmp_path / 'out' / 'manifest.csv').open()))
+    assert rows[5] == {'token': 'tok5', 'watermark_id': '6', 'file': 'Agreement_tok5.docx'}
@@ -0,0 +1,65 @@
+import pytest
+
+import csv_stream
+
+
+def test_iter_records_offsets_resume(tmp_path):
+    p = tmp_path / 'log.csv'
+    p.write_bytes(b'a,b\n1,"multi\nline"\n2,x\n3,part')
+    fields, start = csv_stream.read_header(p)
+    assert fields == ['a', 'b'] and start == 4
+    recs = list(csv_stream.iter_records(p, start, complete_only=True))
+    assert [r for r, _ in recs] == [['1', 'multi\nline'], ['2', 'x']]
+    last = recs[-1][1]
+    with p.open('ab') as f:
+        f.write(b'ial\n4,y\n')
+    assert [r for r, _ in csv_stream.iter_records(p, last)] == [['3', 'partial'], ['4', 'y']]
+
+
+def test_atomic_writer_keeps_target_on_failure(tmp_path):
+    out = tmp_path / 'out.csv'
+    out.write_text('old\n')
+    with pytest.raises(RuntimeError):
+        with csv_stream.atomic_writer(out) as f:
+            f.write('new\n')
+            raise RuntimeError('boom')
+    assert out.read_text() == 'old\n'
+    out.chmod(0o644)
+    with csv_stream.atomic_writer(out) as f:
+        f.write('new\n')
+    assert out.read_text() == 'new\n' and out.stat().st_mode & 0o777 == 0o644
+    assert [p.name for p in tmp_path.iterdir()] == ['out.csv']
+
+
+def _upper(rows):
+    for r in rows:
+        r['b'] = r['b'].upper()
+    return rows
+
+
+def test_transform_file_incremental(tmp_path, monkeypatch):
+    inp, out = tmp_path / 'log.csv', tmp_path / 'out.csv'
+    inp.write_text('a,b\n1,x\n')
+    assert csv_stream.transform_file(inp, out, ['a', 'b'], _upper, chunk_size=1, incremental=True) == 1
+    with inp.open('a') as f:
+        f.write('2,y\n')
+    assert csv_stream.transform_file(inp, out, ['a', 'b'], _upper, chunk_size=1, incremental=True) == 1
+    assert csv_stream.transform_file(inp, out, ['a', 'b'], _upper, incremental=True) == 0
+    assert out.read_text().splitlines() == ['a,b', '1,X', '2,Y']
+    # a run that dies after writing rows but before saving its state must not duplicate them
+    with inp.open('a') as f:
+        f.write('3,z\n')
+    monkeypatch.setattr(csv_stream, 'save_state', lambda *a: (_ for _ in ()).throw(OSError('disk full')))
+    with pytest.raises(OSError):
+        csv_stream.transform_file(inp, out, ['a', 'b'], _upper, incremental=True)
+    monkeypatch.undo()
+    assert csv_stream.transform_file(inp, out, ['a', 'b'], _upper, incremental=True) == 1
+    assert out.read_text().splitlines() == ['a,b', '1,X', '2,Y', '3,Z']
+
+
+def test_parse_utc_forms():
+    t = 1704067200.0  # 2024-01-01T00:00:00Z
+    assert csv_stream.parse_utc('2024-01-01T00:00:00Z') == csv_stream.parse_utc(' 2024-01-01T00:00:00 ') == t
+    assert csv_stream.parse_utc('2024-01-01T01:00:00+01:00') == t
+    assert csv_stream.parse_utc(1704067200) == csv_stream.parse_utc('1704067200') == t
+    assert csv_stream.parse_utc('') is None and csv_stream.parse_utc('t') is None and csv_stream.parse_utc('nan') is None
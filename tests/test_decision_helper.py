@@ -1,3 +1,6 @@
+import csv
+
+import decision_helper as dh
 from decision_helper import suggest
 
 def test_suggest_minimal_path():
@@ -10,3 +13,40 @@ def test_suggest_minimal_path():
 def test_suggest_stabilize():
     recs = suggest(docx=3, pdf=2, portals=1, wallets=2, sessions=3, branches=4)
     assert any('Stabilize' in r for r in recs)
+
+def _write(path, header, rows, mode='w'):
+    with path.open(mode, newline='') as f:
+        w = csv.writer(f)
+        if mode == 'w':
+            w.writerow(header)
+        w.writerows(rows)
+
+def test_inventory_from_logs_is_incremental(tmp_path):
+    op = tmp_path / 'op'
+    op.mkdir()
+    ev = ['artifact_id', 'utc_timestamp', 'sha256', 'source_channel', 'type', 'original_filename']
+    _write(op / 'evidence_log.csv', ev, [['a', 't', 'aa', 'wa', 'docx', 'v1.docx'], ['b', 't', 'bb', 'wa', 'docx', 'v2.docx'],
+                                         ['a', 't', 'aa', 'em', 'docx', 'v1 copy.docx'], ['c', 't', 'cc', 'wa', 'pdf', 'v2.pdf']])
+    se = ['utc_timestamp', 'ip', 'asn', 'country', 'ua', 'path', 'token', 'notes']
+    _write(op / 'session_log.csv', se, [['2025-01-01T10:00:00Z', '1.1.1.1', '', '', 'UA', '/branding/T1.png', 'T1', ''],
+                                        ['2025-01-01T10:10:00Z', '1.1.1.1', '', '', 'UA', '/branding/T1.png', 'T1', ''],
+                                        ['2025-01-01T12:00:00Z', '1.1.1.1', '', '', 'UA', '/logo.png', '', '']])
+    _write(op / 'wallet_log.csv', ['utc_timestamp', 'address'], [['t', 'bc1a'], ['t', 'bc1a']])
+    assert dh.inventory(op) == {'docx': 2, 'pdf': 1, 'portals': 2, 'wallets': 1, 'sessions': 2, 'branches': 0}
+    _write(op / 'session_log.csv', None, [['2025-01-01T12:05:00Z', '2.2.2.2', '', '', 'UA', '/', '', 'index']], mode='a')
+    _write(op / 'branch_events.csv', ['utc_timestamp', 'trigger', 'action'], [['t', 'stall', 'delay'], ['t', 'ask', 'pdf']])
+    state = (op / dh.STATE_NAME).read_text()
+    assert '"offset"' in state
+    counts = dh.inventory(op)
+    assert counts == {'docx': 2, 'pdf': 1, 'portals': 3, 'wallets': 1, 'sessions': 3, 'branches': 2}
+    # a rewritten (shorter) log is recounted from scratch
+    _write(op / 'wallet_log.csv', ['utc_timestamp', 'address'], [['t', 'x']])
+    assert dh.inventory(op)['wallets'] == 1
+    # rewritten to a larger size: resuming at the old watermark would keep 'x' and add 'y'
+    _write(op / 'wallet_log.csv', ['utc_timestamp', 'address'], [['t', 'y'], ['t', 'y']])
+    assert dh.inventory(op)['wallets'] == 1
+    (tmp_path / 'empty').mkdir()
+    batch = dh.suggest_many([op, tmp_path / 'empty', tmp_path / 'missing'])
+    assert batch[str(op)]['counts'] == dh.inventory(op)
+    assert any('Send hosted logo' in r for r in batch[str(tmp_path / 'empty')]['recommendations'])
+    assert 'error' in batch[str(tmp_path / 'missing')]
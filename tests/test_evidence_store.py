@@ -0,0 +1,75 @@
+import csv
+
+import pytest
+
+import scripts_doc_processing as sdp
+from evidence_store import SCHEMAS, EvidenceStore, detect_kind
+
+
+def write_csv(path, header, rows, mode='w'):
+    with path.open(mode, newline='') as f:
+        w = csv.writer(f)
+        if mode == 'w':
+            w.writerow(header)
+        w.writerows(rows)
+
+
+def test_detect_kind_from_headers():
+    for kind, fields in SCHEMAS.items():
+        assert detect_kind(fields) == kind
+    assert detect_kind(['utc_timestamp', 'ip', 'ua', 'extra']) == 'session'
+    assert detect_kind(['utc_timestamp', 'notes']) is None
+
+
+def test_incremental_import_queries_and_export(tmp_path):
+    session = tmp_path / 'session_log.csv'
+    write_csv(session, SCHEMAS['session'], [
+        ['2025-01-01T10:00:00Z', '203.0.113.5', 'AS1', 'NL', 'UA', '/branding/T1.png', 'T1', ''],
+        ['2025-01-02T10:00:00Z', '198.51.100.7', '', '', 'UA', '/logo.png', '', 'ref=x'],
+    ])
+    wallet = tmp_path / 'wallet_log.csv'
+    # columns in a different order plus an unknown one
+    write_csv(wallet, ['address', 'utc_timestamp', 'chain', 'analyst'], [['bc1qxyz', '2025-01-03T00:00:00Z', 'BTC', 'a']])
+    with EvidenceStore(tmp_path / 'ops.sqlite3') as store:
+        assert store.import_csv(session) == 2 and store.import_csv(wallet) == 1
+        assert store.import_csv(session) == 0
+        write_csv(session, None, [['2025-01-05T10:00:00Z', '203.0.113.5', '', '', 'UA2', '/', '', 'index']], mode='a')
+        with session.open('a') as f:
+            f.write('2025-01-06T10:00:00Z,partial')  # half-written line waits for the next import
+        assert store.import_csv(session) == 1
+        assert [r['ua'] for r in store.query('session', ip='203.0.113.5')] == ['UA', 'UA2']
+        assert store.query('session', token='T1')[0]['asn'] == 'AS1'
+        assert store.count('session', since='2025-01-02', until='2025-01-05') == 1
+        assert store.query('wallet', address='bc1qxyz')[0] == {
+            'utc_timestamp': '2025-01-03T00:00:00Z', 'address': 'bc1qxyz', 'chain': 'BTC', 'context': '',
+            'first_seen_tx': '', 'last_seen_tx': '', 'notes': ''}
+        with pytest.raises(ValueError):
+            store.query('session', sha256='x')
+        out = tmp_path / 'export.csv'
+        assert store.export_csv('session', out, since='2025-01-02') == 2
+    rows = list(csv.reader(out.open(newline='')))
+    assert rows[0] == SCHEMAS['session'] and [r[1] for r in rows[1:]] == ['198.51.100.7', '203.0.113.5']
+
+
+
+def test_reimport_of_rewritten_log_replaces_its_rows(tmp_path, capsys):
+    session = tmp_path / 'session_log.csv'
+    row = ['2025-01-01T10:00:00Z', '203.0.113.5', '', '', 'UA', '/', 'T1', '']
+    write_csv(session, SCHEMAS['session'], [row, row[:1] + ['198.51.100.7'] + row[2:]])
+    with EvidenceStore(tmp_path / 'ops.sqlite3') as store:
+        store.insert('session', [row])  # written directly, e.g. by the portal
+        assert store.import_csv(session) == 2
+        assert 'written directly' in capsys.readouterr().err
+        write_csv(session, SCHEMAS['session'], [row])  # log truncated and rewritten
+        assert store.import_csv(session) == 1
+        assert 'replacing its rows' in capsys.readouterr().err
+        write_csv(session, SCHEMAS['session'][:-1], [row[:-1], row[:-1]])  # header changed
+        assert store.import_csv(session) == 2
+        assert store.count('session') == 3 and store.count('session', ip='198.51.100.7') == 0
+
+def test_doc_processing_writes_store(tmp_path):
+    (tmp_path / 'a.txt').write_text('x')
+    with EvidenceStore(tmp_path / 'ops.sqlite3') as store:
+        sdp.ingest([tmp_path / 'a.txt'], tmp_path / 'evidence_log.csv', 'email', quiet=True, store=store)
+        rows = store.query('evidence', source_channel='email')
+    assert len(rows) == 1 and rows[0]['original_filename'] == 'a.txt'
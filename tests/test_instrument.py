@@ -0,0 +1,45 @@
+import pytest
+
+import instrument
+import log_integrity_chain
+
+
+@pytest.fixture
+def metrics():
+    instrument.reset()
+    instrument.enable()
+    yield instrument
+    instrument.enable(False)
+    instrument.reset()
+
+
+def test_disabled_calls_record_nothing():
+    instrument.reset()
+    assert not instrument.enabled()
+    instrument.count('x')
+    with instrument.span('y'):
+        pass
+    assert instrument.snapshot() == {'counters': {}, 'gauges': {}, 'histograms': {}}
+    assert instrument.summary() == 'no metrics recorded'
+
+
+def test_counters_spans_and_prometheus_text(metrics, tmp_path):
+    metrics.count('portal.hits', route='/logo.png')
+    metrics.count('portal.hits', 2, route='/logo.png')
+    metrics.gauge('portal.log_queue', 5)
+    metrics.observe('asn_enrich.network', 0.003)
+    metrics.observe('asn_enrich.network', 20)
+    log = tmp_path / 'evidence_log.csv'
+    log.write_text('a,b\n1,2\n')
+    log_integrity_chain.build_chain(log)
+    text = metrics.prometheus_text()
+    assert '# TYPE counter_scam_portal_hits_total counter\ncounter_scam_portal_hits_total{route="/logo.png"} 3\n' in text
+    assert 'counter_scam_portal_log_queue 5\n' in text
+    assert 'counter_scam_asn_enrich_network_seconds_bucket{le="0.0025"} 0\n' in text
+    assert 'counter_scam_asn_enrich_network_seconds_bucket{le="0.005"} 1\n' in text
+    assert 'counter_scam_asn_enrich_network_seconds_bucket{le="+Inf"} 2\n' in text
+    assert 'counter_scam_asn_enrich_network_seconds_count 2\n' in text
+    assert 'counter_scam_log_integrity_chain_lines_total 2\n' in text
+    assert 'counter_scam_log_integrity_chain_build_chain_seconds_count 1\n' in text
+    lines = metrics.summary().splitlines()
+    assert lines[1].startswith('asn_enrich.network') and 'portal.hits route=/logo.png' in lines[-2]
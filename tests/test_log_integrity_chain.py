@@ -1,5 +1,7 @@
+import json
 import pathlib
-from log_integrity_chain import build_chain
+import log_integrity_chain as lic
+from log_integrity_chain import append_chain, build_chain, jsonl_path, verify_chain
 
 def test_build_chain_basic(tmp_path):
     csv_path = tmp_path / 'evidence_log.csv'
@@ -9,3 +11,39 @@ def test_build_chain_basic(tmp_path):
     # Ensure each chain hash links (except first which uses empty prev)
     for i in range(1, len(chain)):
         assert chain[i]['chain_hash'] != chain[i-1]['chain_hash']
+
+
+def test_append_matches_rebuild_and_verifies_from_checkpoint(tmp_path):
+    csv_path = tmp_path / 'evidence_log.csv'
+    csv_path.write_bytes(b'artifact_id,utc_timestamp\r\nA1,2025-01-01T00:00:00Z\r\nA2,partial')
+    assert append_chain(csv_path) == 2  # trailing partial line is left for later
+    with csv_path.open('ab') as f:
+        f.write(b'\r\nA3,2025-01-01T02:00:00Z\r\n')
+    assert append_chain(csv_path) == 2
+    assert append_chain(csv_path) == 0
+    entries = [json.loads(l) for l in jsonl_path(csv_path).read_text().splitlines()]
+    assert [e['chain_hash'] for e in entries] == [e['chain_hash'] for e in build_chain(csv_path)]
+    assert verify_chain(csv_path)[:2] == (True, 4)
+    assert verify_chain(csv_path, 2)[:2] == (True, 2)
+    csv_path.write_bytes(csv_path.read_bytes().replace(b'A3', b'A9'))
+    ok, _, msg = verify_chain(csv_path, 2)
+    assert not ok and 'line 3' in msg
+
+
+def test_bare_cr_line_ends_match_splitlines(tmp_path, monkeypatch):
+    monkeypatch.setattr(lic, 'CHUNK', 4)  # line ends straddle read boundaries
+    data = b'h1,h2\rA1,x\r\nA2,y\n\nA3,z\r'
+    csv_path = tmp_path / 'evidence_log.csv'
+    csv_path.write_bytes(data)
+    with csv_path.open('rb') as f:
+        assert [l for l, _, _ in lic.iter_lines(f)] == data.splitlines()
+    assert lic.append_chain(csv_path) == 4  # the trailing bare \r may still become \r\n
+    with csv_path.open('ab') as f:
+        f.write(b'\n')
+    assert lic.append_chain(csv_path) == 1
+    assert [e['chain_hash'] for e in lic.build_chain(csv_path)] == \
+        [json.loads(l)['chain_hash'] for l in lic.jsonl_path(csv_path).read_text().splitlines()]
+    for n in range(5):
+        assert lic.entry_at(lic.jsonl_path(csv_path), n)['line_no'] == n
+    assert lic.entry_at(lic.jsonl_path(csv_path), 5) is None
+    assert lic.verify_chain(csv_path, 3)[:2] == (True, 2)
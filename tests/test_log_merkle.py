@@ -0,0 +1,52 @@
+import json
+
+import log_merkle
+from log_integrity_chain import build_chain
+
+
+def write_log(tmp_path, n):
+    p = tmp_path / 'evidence_log.csv'
+    p.write_text('artifact_id,utc_timestamp\n' + ''.join(f'A{i},2025-01-01T00:00:{i % 60:02d}Z\n' for i in range(n)))
+    return p
+
+
+def test_proofs_for_every_row_and_parallel_leaves(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_merkle, 'MIN_PARALLEL_BYTES', 0)
+    p = write_log(tmp_path, 12)  # 13 lines: exercises unpaired nodes
+    n, root, bad = log_merkle.build_tree(p, workers=2, every=5, key=b'k')
+    assert n == 13 and not bad
+    leaves, _ = log_merkle.hash_leaves(p)
+    assert [leaves[i * 32:(i + 1) * 32] for i in range(n)] == \
+        [log_merkle.leaf_hash(bytes.fromhex(e['sha256_line'])) for e in build_chain(p)]
+    ckpts = [json.loads(l) for l in (tmp_path / 'evidence_log.csv.merkle.checkpoints.jsonl').read_text().splitlines()]
+    assert [c['tree_size'] for c in ckpts] == [5, 10, 13] and ckpts[-1]['root'] == root
+    for i in range(n):
+        proof = log_merkle.prove(p, i)
+        assert len(proof['proof']) <= 4
+        assert log_merkle.verify_proof(proof, p, key=b'k')[0]
+    assert not log_merkle.verify_proof(proof, key=b'wrong')[0]
+    assert log_merkle.verify_proof(proof, trusted_root=root)[0]
+    ok, msg = log_merkle.verify_proof(proof)
+    assert not ok and 'trusted' in msg  # a proof's own root proves nothing
+
+
+def test_forged_proof_needs_key_or_trusted_root(tmp_path):
+    p = write_log(tmp_path, 4)
+    _, root, _ = log_merkle.build_tree(p, key=b'k')
+    proof = log_merkle.prove(p, 2)
+    forged = dict(proof, sha256_line='00' * 32, proof=[])
+    forged['root'] = log_merkle.root_from_proof(log_merkle.leaf_hash(bytes(32)), 0, 1, []).hex()
+    forged.update(line_no=0, tree_size=1)
+    assert not log_merkle.verify_proof(forged, key=b'k')[0]
+    assert not log_merkle.verify_proof(forged, trusted_root=root)[0]
+
+
+def test_tampered_row_and_rewritten_prefix_detected(tmp_path):
+    p = write_log(tmp_path, 6)
+    log_merkle.build_tree(p, every=2)
+    proof = log_merkle.prove(p, 3)
+    p.write_text(p.read_text().replace('A2,', 'B2,'))
+    ok, msg = log_merkle.verify_proof(proof, p, trusted_root=proof['root'])
+    assert not ok and 'does not match' in msg
+    _, _, bad = log_merkle.build_tree(p, every=2)
+    assert bad == [4, 6, 7]
@@ -0,0 +1,33 @@
+import io
+
+from metadata_compare import cluster, write_clusters
+
+
+def meta(name, **fields):
+    return dict(fields, file=name, sha256=name * 4)
+
+
+def test_transitive_clusters_and_min_shared():
+    metas = [
+        meta('a', creator='J. Doe', application='Microsoft Office Word'),
+        meta('b', creator='j.  doe', application='LibreOffice', app_version='7.5'),
+        meta('c', application='LibreOffice', app_version='7.5'),
+        meta('d', creator='Someone Else'),
+        meta('e', application='LibreOffice', app_version='7.6'),
+    ]
+    groups = {frozenset(f['file'] for f in c['files']) for c in cluster(metas)}
+    assert groups == {frozenset('ab'), frozenset('c'), frozenset('d'), frozenset('e')}  # same suite is not a link
+    app_fields = ['creator', 'application', 'app_version']
+    loose = {frozenset(f['file'] for f in c['files']) for c in cluster(metas, app_fields)}
+    assert loose == {frozenset('abce'), frozenset('d')}
+    strict = cluster(metas, app_fields, min_shared=2)
+    assert strict[0]['size'] == 2 and {f['file'] for f in strict[0]['files']} == {'b', 'c'}
+    assert strict[0]['shared']['app_version'] == {'7.5': 2}
+
+
+def test_csv_report_has_dominant_values():
+    clusters = cluster([meta('a', creator='X'), meta('b', creator='X')], fields=['creator'])
+    out = io.StringIO()
+    write_clusters(clusters, ['creator'], 'csv', out)
+    assert out.getvalue().splitlines() == ['cluster_id,cluster_size,file,sha256,top_creator',
+                                           '0,2,a,aaaa,X', '0,2,b,bbbb,X']
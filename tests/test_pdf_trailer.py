@@ -0,0 +1,84 @@
+import zlib
+
+import pytest
+
+import artifact_extract
+import pdf_trailer
+
+XMP = (b'<x:xmpmeta xmlns:x="adobe:ns:meta/" x:xmptk="Adobe XMP Core 5.6-c015">'
+       b'<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+       b'<rdf:Description xmlns:pdf="http://ns.adobe.com/pdf/1.3/" xmlns:xmp="http://ns.adobe.com/xap/1.0/" '
+       b'pdf:Producer="Microsoft: Print To PDF"><xmp:CreatorTool>Canva</xmp:CreatorTool>'
+       b'</rdf:Description></rdf:RDF></x:xmpmeta>')
+
+
+def build_pdf(objects, info_num, root_num, update=None):
+    """Assemble a classic-xref PDF; `update` = (objects, info_num) appended as an incremental update."""
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = {}
+    for num, body in objects.items():
+        offsets[num] = len(out)
+        out += b'%d 0 obj\n' % num + body + b'\nendobj\n'
+    xref = len(out)
+    size = max(objects) + 1
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % size
+    for num in range(1, size):
+        out += b'%010d 00000 n \n' % offsets[num]
+    out += b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, root_num, info_num, xref)
+    if update:
+        objs, new_info = update
+        for num, body in objs.items():
+            offsets[num] = len(out)
+            out += b'%d 0 obj\n' % num + body + b'\nendobj\n'
+        prev, xref = xref, len(out)
+        out += b'xref\n'
+        for num in objs:
+            out += b'%d 1\n%010d 00000 n \n' % (num, offsets[num])
+        out += (b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R /Prev %d >>\nstartxref\n%d\n%%%%EOF\n'
+                % (max(size, max(objs) + 1), root_num, new_info, prev, xref))
+    return bytes(out)
+
+
+def sample_objects():
+    xmp = zlib.compress(XMP)
+    return {
+        1: b'<< /Type /Catalog /Pages 2 0 R /Metadata 4 0 R >>',
+        2: b'<< /Type /Pages /Kids [] /Count 0 >>',
+        3: (b'<< /Title (Investor \\(pack\\) v2) /Author <FEFF004A006F007300E9> /Creator 5 0 R '
+            b'/Producer (Microsoft\\256 Word 2016) /CreationDate (D:20250824101500+04\'00\') >>'),
+        4: b'<< /Type /Metadata /Subtype /XML /Filter /FlateDecode /Length %d >>\nstream\n' % len(xmp) + xmp + b'\nendstream',
+        5: b'(Writer)',
+    }
+
+
+def test_fast_path_info_and_xmp():
+    meta = pdf_trailer.read_metadata(build_pdf(sample_objects(), 3, 1))
+    assert meta == {'title': 'Investor (pack) v2', 'author': 'José', 'creator': 'Writer',
+                    'producer': 'Microsoft\xae Word 2016', 'creationdate': "D:20250824101500+04'00'",
+                    'xmp_toolkit': 'Adobe XMP Core 5.6-c015', 'xmp_producer': 'Microsoft: Print To PDF',
+                    'xmp_creator_tool': 'Canva'}
+
+
+def test_incremental_update_uses_newest_info(tmp_path):
+    data = build_pdf(sample_objects(), 3, 1, update=({6: b'<< /Producer (LibreOffice 7.5) /ModDate (D:20250901) >>'}, 6))
+    p = tmp_path / 'export.pdf'
+    p.write_bytes(data)
+    meta = artifact_extract.extract(p).meta
+    assert meta['producer'] == 'LibreOffice 7.5' and meta['moddate'] == 'D:20250901' and 'title' not in meta
+
+
+@pytest.mark.parametrize('data', [
+    b'%PDF-1.5\n1 0 obj\n<< /Type /XRef >>\nendobj\nstartxref\n9\n%%EOF\n',
+    b'not a pdf at all',
+])
+def test_unsupported_layouts_fall_back(data):
+    with pytest.raises(pdf_trailer.FastPathError):
+        pdf_trailer.read_metadata(data)
+
+
+def test_xmp_with_a_dtd_is_ignored_however_it_is_hidden():
+    assert pdf_trailer.xmp_fields(XMP, 100)['xmp_creator_tool'] == 'Canva'
+    dtd = '<!DOCTYPE x:xmpmeta [<!ENTITY a "Canva">]>'
+    padded = b'<!--' + b' ' * 4096 + b'-->' + dtd.encode() + XMP
+    utf16 = ('<?xml version="1.0" encoding="UTF-16"?>' + dtd + XMP.decode()).encode('utf-16')
+    assert pdf_trailer.xmp_fields(padded, 100) == pdf_trailer.xmp_fields(utf16, 100) == {}
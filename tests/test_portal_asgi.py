@@ -0,0 +1,133 @@
+import asyncio
+import importlib
+import sqlite3
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import instrument
+from portal import bench_load
+
+
+def load_app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'branding').mkdir()
+    (tmp_path / 'branding' / 'CAMP1.png').write_bytes(b'\x89PNG-camp1')
+    mod = importlib.import_module('portal.asgi_app')
+    mod = importlib.reload(mod)
+    hits = []
+    monkeypatch.setattr(mod.LOG_WRITER, 'write', hits.append)
+    return mod, hits
+
+
+def call(app, path, headers=(), method='GET'):
+    scope = {'type': 'http', 'method': method, 'path': path, 'client': ('203.0.113.5', 4242),
+             'headers': [(k.encode(), v.encode()) for k, v in headers]}
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent[0]['status'], dict(sent[0]['headers']), sent[1]['body']
+
+
+def test_routes_log_schema_and_conditional(tmp_path, monkeypatch):
+    mod, hits = load_app(tmp_path, monkeypatch)
+    status, headers, body = call(mod.app, '/branding/CAMP1.png', [('User-Agent', 'UA'), ('Referer', 'r')])
+    assert status == 200 and body == b'\x89PNG-camp1' and headers[b'cache-control'] == b'no-cache'
+    etag = headers[b'etag'].decode()
+    assert call(mod.app, '/branding/CAMP1.png', [('If-None-Match', etag)])[:3:2] == (304, b'')
+    assert call(mod.app, '/branding/nope.png')[2] == mod.BLANK_PNG
+    assert call(mod.app, '/l.png')[0] == 200 and call(mod.app, '/')[2] == b'ok'
+    assert call(mod.app, '/missing')[0] == 404 and call(mod.app, '/', method='POST')[0] == 405
+    assert [h[3:] for h in hits] == [('/branding/CAMP1.png', 'r', 'CAMP1', ''), ('/branding/CAMP1.png', '', 'CAMP1', ''),
+                                     ('/branding/nope.png', '', 'nope', 'unknown_token'), ('/logo.png', '', '', ''),
+                                     ('/', '', '', 'index')]
+    assert hits[0][1:3] == ('203.0.113.5', 'UA') and len(hits[0]) == 7
+
+
+def test_metrics_endpoint_needs_allowlist_or_token(tmp_path, monkeypatch):
+    mod, hits = load_app(tmp_path, monkeypatch)
+    assert call(mod.app, '/metrics')[0] == 404
+    monkeypatch.setattr(sys.modules['beacon_log'], 'METRICS_ON', True)
+    instrument.reset()
+    instrument.enable()
+    try:
+        call(mod.app, '/branding/CAMP1.png')
+        call(mod.app, '/branding/other.png')
+        assert call(mod.app, '/metrics')[0] == 404  # nothing configured: no client is allowed
+        monkeypatch.setattr(sys.modules['beacon_log'], 'METRICS_TOKEN', 's3cret')
+        assert call(mod.app, '/metrics', [('authorization', 'Bearer wrong')])[0] == 404
+        assert call(mod.app, '/metrics', [('authorization', 'Bearer s3cret')])[0] == 200
+        monkeypatch.setattr(sys.modules['beacon_log'], 'METRICS_TOKEN', '')
+        monkeypatch.setattr(sys.modules['beacon_log'], 'METRICS_ALLOW', frozenset({'203.0.113.5'}))
+        status, headers, body = call(mod.app, '/metrics')
+    finally:
+        instrument.enable(False)
+        instrument.reset()
+    assert status == 200 and headers[b'content-type'].startswith(b'text/plain; version=0.0.4')
+    text = body.decode()
+    assert 'counter_scam_portal_hits_total{route="/branding/<token>.png"} 2' in text
+    assert 'counter_scam_portal_unknown_tokens_total 1' in text and 'counter_scam_portal_log_queue' in text
+    assert [h[3] for h in hits] == ['/branding/CAMP1.png', '/branding/other.png']
+
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert bench_load.percentile(values, 50) == 50 and bench_load.percentile(values, 99) == 99
+    assert bench_load.percentile([7.0], 99) == 7.0 and bench_load.percentile([], 50) == 0.0
+
+
+def test_lifespan_reports_any_writer_failure(tmp_path, monkeypatch):
+    mod, _ = load_app(tmp_path, monkeypatch)
+    monkeypatch.setattr(mod.LOG_WRITER, 'start', lambda: None)
+
+    def close():
+        raise sqlite3.OperationalError('database is locked')  # e.g. from the PORTAL_STORE sink
+    monkeypatch.setattr(mod.LOG_WRITER, 'close', close)
+    inbox = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return inbox.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(mod.app({'type': 'lifespan'}, receive, send))
+    assert [m['type'] for m in sent] == ['lifespan.startup.complete', 'lifespan.shutdown.failed']
+    assert 'database is locked' in sent[1]['message']
+
+def test_load_generator_against_keepalive_server():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.send_header('ETag', '"v1"')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', '3')
+            self.end_headers()
+            self.wfile.write(b'png')
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        url = f'http://127.0.0.1:{srv.server_address[1]}'
+        report = asyncio.run(bench_load.run(url, ['/a.png', '/b.png'], 4, 200, 0, revalidate=True))
+    finally:
+        srv.shutdown()
+    assert report['requests'] == 200 and report['errors'] == 0 and report['rps'] > 0
+    assert set(report['paths']) == {'/a.png', '/b.png'} and report['status']['304'] > report['status']['200']
+    assert report['p50_ms'] <= report['p99_ms']
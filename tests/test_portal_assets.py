@@ -0,0 +1,20 @@
+from portal.assets import BLANK_PNG, AssetStore, not_modified
+
+
+def test_preloads_tokens_and_etags(tmp_path):
+    (tmp_path / 'TOKEN123.png').write_bytes(b'\x89PNG-a')
+    (tmp_path / 'b7f3c2e1.gif').write_bytes(b'GIF89a')
+    (tmp_path / 'bad token.png').write_bytes(b'x')
+    (tmp_path / 'notes.txt').write_text('x')
+    store = AssetStore(tmp_path)
+    assert len(store) == 2
+    a = store.get('TOKEN123')
+    assert a.body == b'\x89PNG-a' and a.content_type == 'image/png' and a.etag.startswith('"')
+    assert store.get('b7f3c2e1').content_type == 'image/gif'
+    assert store.get('missing') is None and store.default.body == BLANK_PNG
+
+
+def test_conditional_matching():
+    etag = '"abc"'
+    assert not_modified('"abc"', etag) and not_modified('"x", W/"abc"', etag) and not_modified('*', etag)
+    assert not not_modified(None, etag) and not not_modified('"other"', etag)
@@ -0,0 +1,76 @@
+import csv
+import json
+import sqlite3
+
+import wallet_enrich as we
+from asn_enrich import LRUResolver
+
+TXS = [
+    {'txid': 't1', 'time': '2024-01-01T00:00:00Z', 'chain': 'BTC', 'inputs': ['a1', 'a2'], 'outputs': ['b1']},
+    {'txid': 't2', 'time': 1704153600, 'chain': 'BTC', 'inputs': [{'address': 'a2'}, 'a3'], 'outputs': ['a1', 'c1']},
+    {'txid': 't3', 'time': '2024-01-03T00:00:00Z', 'chain': 'BTC', 'inputs': ['b1'], 'outputs': ['c1']},
+]
+
+
+def _snapshot(tmp_path):
+    src = tmp_path / 'txs.jsonl'
+    src.write_text('\n'.join(json.dumps(t) for t in TXS) + '\nnot json\n')
+    return src
+
+
+def _write_log(path, rows, mode='w'):
+    with path.open(mode, newline='') as f:
+        w = csv.writer(f)
+        if mode == 'w':
+            w.writerow(we.WALLET_FIELDS)
+        w.writerows(rows)
+
+
+def test_build_index_clusters_common_inputs(tmp_path):
+    db = tmp_path / 'idx.sqlite3'
+    assert we.build_index(_snapshot(tmp_path), db) == {'transactions': 3, 'addresses': 5, 'clusters': 3}
+    with we.WalletIndex(db) as idx:
+        a1, a3, b1 = idx.lookup('a1'), idx.lookup('a3'), idx.lookup('b1')
+        assert a1['cluster'] == a3['cluster'] == 'a1' and a1['cluster_size'] == 3
+        assert (a1['first_seen_tx'], a1['last_seen_tx'], a1['n_tx']) == ('t1', 't2', 2)
+        assert b1['cluster'] != a1['cluster'] and b1['cluster_size'] == 1
+        assert idx.lookup('nope') == {}
+        assert sorted(idx.cluster_members(a1['cluster'])) == ['a1', 'a2', 'a3']
+        rows = [{'address': 'a3', 'notes': 'seen; cospend_cluster=a2 size=2; call back'}]
+        assert we.enrich(rows, idx.lookup)[0]['notes'] == 'seen; cospend_cluster=a1 size=3; call back'
+        assert sorted(idx.transactions('a1')) == [('t1', 0), ('t2', 1)]
+
+
+def test_build_index_from_sqlite_snapshot(tmp_path):
+    src = tmp_path / 'snap.db'
+    conn = sqlite3.connect(str(src))
+    conn.execute('CREATE TABLE transactions (txid, time, chain, inputs, outputs)')
+    conn.executemany('INSERT INTO transactions VALUES (?,?,?,?,?)',
+                     [(t['txid'], str(t['time']), t['chain'], json.dumps(t['inputs']), json.dumps(t['outputs'])) for t in TXS])
+    conn.commit()
+    conn.close()
+    db = tmp_path / 'idx.sqlite3'
+    assert we.build_index(src, db)['clusters'] == 3
+
+
+def test_enrich_file_fills_blanks_and_is_incremental(tmp_path):
+    db = tmp_path / 'idx.sqlite3'
+    we.build_index(_snapshot(tmp_path), db)
+    log, out = tmp_path / 'wallet_log.csv', tmp_path / 'enriched.csv'
+    _write_log(log, [['2024-02-01T00:00:00Z', 'a3', 'BTC', 'chat', '', '', 'asked twice'],
+                     ['2024-02-01T00:05:00Z', 'zz', 'BTC', 'chat', '', '', '']])
+    with we.WalletIndex(db) as idx:
+        resolve = LRUResolver(idx.lookup)
+        clusters = {}
+        assert we.enrich_file(log, out, resolve, incremental=True, clusters=clusters) == 2
+        rows = list(csv.DictReader(out.open(newline='')))
+        assert rows[0]['first_seen_tx'] == 't2' and rows[0]['last_seen_tx'] == 't2'
+        assert rows[0]['notes'].startswith('asked twice; cospend_cluster=') and rows[0]['notes'].endswith('size=3')
+        assert rows[1]['first_seen_tx'] == '' and rows[1]['notes'] == ''
+        assert clusters == {'a1': ['a3']}
+        _write_log(log, [['2024-02-02T00:00:00Z', 'a1', 'BTC', 'chat', 'given', '', '']], mode='a')
+        assert we.enrich_file(log, out, resolve, incremental=True) == 1
+        rows = list(csv.DictReader(out.open(newline='')))
+        assert len(rows) == 3
+        assert rows[2]['first_seen_tx'] == 'given' and rows[2]['last_seen_tx'] == 't2'
+        assert rows[2]['notes'].split('size=')[0] == rows[0]['notes'].split('; ')[1].split('size=')[0]
@@ -0,0 +1,55 @@
+import re
+
+import zero_width_watermark as zw
+
+
+def legacy_insert(text, interval):
+    parts, count = [], 0
+    for segment in re.split(zw.SENT_END, text):
+        if not segment:
+            continue
+        parts.append(segment)
+        if segment in '.!?':
+            count += 1
+            if count % interval == 0:
+                parts.append(zw.ZW)
+    return ''.join(parts)
+
+
+TEXT = 'One. Two! Three? Four. Five... Six. Seven.\nEight. Nine? Ten' * 7
+
+
+def test_insert_matches_legacy_and_chunking_is_invisible():
+    for interval in (1, 2, 3, 5):
+        expected = legacy_insert(TEXT, interval)
+        assert zw.insert(TEXT, interval) == expected
+        chunks = [TEXT[i:i + 7] for i in range(0, len(TEXT), 7)]
+        assert ''.join(zw.iter_insert(chunks, interval)) == expected
+    assert zw.verify(zw.insert(TEXT, 3)) == len(zw.SENT_END.findall(TEXT)) // 3
+
+
+def test_recipient_frames_decode_from_partial_and_edited_excerpts():
+    marked = zw.insert(TEXT, 2, rid=1042)
+    assert zw.decode(marked).most_common(1)[0][0] == 1042
+    excerpt = marked[len(marked) // 3: len(marked) // 2]
+    assert set(zw.decode(excerpt)) == {1042}
+    chunks = [marked[i:i + 10] for i in range(0, len(marked), 10)]  # frames straddle chunks
+    assert zw.decode(chunks) == zw.decode(marked)
+    frame = zw.encode_id(1042)
+    damaged = frame[:5] + (zw.BIT1 if frame[5] == zw.BIT0 else zw.BIT0) + frame[6:]
+    assert zw.decode('a.' + damaged + ' b.' + frame) == {1042: 1}
+    assert zw.decode(TEXT) == {}
+
+
+def test_batch_writes_unique_copies(tmp_path):
+    src = tmp_path / 'agreement.txt'
+    src.write_text(TEXT, encoding='utf-8')
+    recips = tmp_path / 'recipients.txt'
+    recips.write_text('alice\nbob,7\ncarol/x\n# comment\n', encoding='utf-8')
+    manifest = zw.watermark_batch(src, tmp_path / 'copies', zw.read_recipients(recips), 3, chunk_size=16)
+    assert [(m['recipient'], m['id']) for m in manifest] == [('alice', '1'), ('bob', '7'), ('carol/x', '2')]
+    for m in manifest:
+        copy = (tmp_path / 'copies' / m['file']).read_text(encoding='utf-8')
+        assert copy == zw.insert(TEXT, 3, rid=int(m['id']))
+        assert set(zw.decode(copy)) == {int(m['id'])}
+    assert (tmp_path / 'copies' / 'manifest.csv').exists()
@@ -0,0 +1,36 @@
+"""Disjoint-set (union-find) with path halving and union by size, over dense int ids."""
+from typing import Dict, List
+
+
+class UnionFind:
+    def __init__(self, n: int = 0):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def add(self) -> int:
+        self.parent.append(len(self.parent))
+        self.size.append(1)
+        return len(self.parent) - 1
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> int:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return ra
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+        return ra
+
+    def groups(self) -> Dict[int, List[int]]:
+        out: Dict[int, List[int]] = {}
+        for x in range(len(self.parent)):
+            out.setdefault(self.find(x), []).append(x)
+        return out
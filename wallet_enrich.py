@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Enrich wallet_log.csv from a local snapshot of transaction data (no network).
+Usage:
+  Build:   ./wallet_enrich.py build txs.jsonl wallet_index.sqlite3
+  Enrich:  ./wallet_enrich.py enrich --in wallet_log.csv --out wallet_log_enriched.csv --db wallet_index.sqlite3
+           ./wallet_enrich.py enrich --in wallet_log.csv --out enriched.csv --db wallet_index.sqlite3 --incremental --clusters clusters.json
+  Lookup:  ./wallet_enrich.py lookup wallet_index.sqlite3 bc1q... TXyz...
+
+Snapshot: JSONL, one transaction per line:
+  {"txid": "...", "time": 1700000000 or "2023-11-14T22:13:20Z", "chain": "BTC",
+   "inputs": ["addr", ...], "outputs": ["addr", ...]}     (entries may also be {"address": ...})
+or an SQLite file with a table transactions(txid, time, chain, inputs, outputs), the
+address lists stored as JSON text. `build` streams it once into an SQLite address index:
+  addresses  address -> chain, first/last tx + time, tx count, co-spend cluster id
+  clusters   cluster id (smallest member address) -> number of addresses
+  io         address -> txid, side (0 input, 1 output)
+Co-spend clusters use the common-input-ownership heuristic: all input addresses of one
+transaction are merged with union-find, so millions of transactions cluster in near-linear time.
+
+Enrich (modelled on asn_enrich.py):
+  - Fills blank first_seen_tx / last_seen_tx and tags notes with cospend_cluster=<id> size=<n>;
+    the id is the lexicographically smallest address in the cluster, so it is stable across
+    index rebuilds, and an existing tag is replaced when the cluster has changed
+  - Lookups go through an in-process LRU (--lru-size) in front of the indexed SQLite query
+  - Streams rows in chunks; writes atomically (temp file + rename)
+  - --incremental only processes rows appended since the last run (watermark in <out>.state.json)
+  - --clusters writes the logged addresses grouped by co-spend cluster (JSON)
+"""
+import argparse
+import csv
+import json
+import pathlib
+import re
+import sqlite3
+from typing import Dict, Iterator, List, Optional
+
+import csv_stream
+import instrument
+from asn_enrich import LRUResolver
+from union_find import UnionFind
+
+WALLET_FIELDS = ['utc_timestamp', 'address', 'chain', 'context', 'first_seen_tx', 'last_seen_tx', 'notes']
+DEFAULT_CHUNK = 5000
+LRU_SIZE = 100_000
+INSERT_BATCH = 50_000
+SQLITE_MAGIC = b'SQLite format 3\x00'
+TAG_RE = re.compile(r'cospend_cluster=\S+ size=\d+')
+SCHEMA = [
+    'CREATE TABLE addresses (address TEXT PRIMARY KEY, chain TEXT, first_time INTEGER, first_tx TEXT, '
+    'last_time INTEGER, last_tx TEXT, n_tx INTEGER, cluster TEXT)',
+    'CREATE TABLE clusters (cluster TEXT PRIMARY KEY, size INTEGER)',
+    'CREATE TABLE io (address TEXT, txid TEXT, side INTEGER)',
+]
+
+
+def _addresses(entries) -> List[str]:
+    out = []
+    for e in entries or []:
+        a = e.get('address') if isinstance(e, dict) else e
+        if isinstance(a, str) and a.strip() and a.strip() not in out:
+            out.append(a.strip())
+    return out
+
+
+def iter_transactions(src: pathlib.Path) -> Iterator[Dict]:
+    """Transactions from a JSONL or SQLite snapshot, one dict at a time."""
+    with pathlib.Path(src).open('rb') as f:
+        is_sqlite = f.read(16) == SQLITE_MAGIC
+    if is_sqlite:
+        conn = sqlite3.connect(f'file:{src}?mode=ro', uri=True)
+        try:
+            for txid, t, chain, inputs, outputs in conn.execute(
+                    'SELECT txid, time, chain, inputs, outputs FROM transactions'):
+                yield {'txid': txid, 'time': t, 'chain': chain,
+                       'inputs': json.loads(inputs or '[]'), 'outputs': json.loads(outputs or '[]')}
+        finally:
+            conn.close()
+        return
+    with pathlib.Path(src).open(encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                tx = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(tx, dict):
+                yield tx
+
+
+def build_index(src: pathlib.Path, db: pathlib.Path) -> Dict[str, int]:
+    """Stream a snapshot into a fresh SQLite address index. Returns counts."""
+    ids: Dict[str, int] = {}
+    stats: List[list] = []  # per address id: [address, chain, first_time, first_tx, last_time, last_tx, n_tx]
+    uf = UnionFind()
+    tmp = db.with_name(db.name + '.tmp')
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(str(tmp))
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    for stmt in SCHEMA:
+        conn.execute(stmt)
+    io_rows = []
+    n_tx = 0
+    for tx in iter_transactions(src):
+        txid = str(tx.get('txid') or tx.get('hash') or '')
+        if not txid:
+            continue
+        n_tx += 1
+        t = csv_stream.parse_utc(tx.get('time'))
+        t = int(t) if t is not None else None  # stored as INTEGER epoch seconds
+        chain = str(tx.get('chain', ''))
+        inputs, outputs = _addresses(tx.get('inputs')), _addresses(tx.get('outputs'))
+        for a in dict.fromkeys(inputs + outputs):
+            i = ids.get(a)
+            if i is None:
+                i = ids[a] = uf.add()
+                stats.append([a, chain, t, txid, t, txid, 0])
+            s = stats[i]
+            s[6] += 1
+            if t is not None:
+                if s[2] is None or t < s[2]:
+                    s[2], s[3] = t, txid
+                if s[4] is None or t >= s[4]:
+                    s[4], s[5] = t, txid
+        io_rows.extend((a, txid, 0) for a in inputs)
+        io_rows.extend((a, txid, 1) for a in outputs)
+        first = ids.get(inputs[0]) if inputs else None
+        for a in inputs[1:]:
+            uf.union(first, ids[a])
+        if len(io_rows) >= INSERT_BATCH:
+            conn.executemany('INSERT INTO io VALUES (?,?,?)', io_rows)
+            io_rows.clear()
+    conn.executemany('INSERT INTO io VALUES (?,?,?)', io_rows)
+    roots = [uf.find(i) for i in range(len(stats))]
+    names: Dict[int, str] = {}  # root -> smallest member address (stable id, unlike the root)
+    sizes: Dict[int, int] = {}
+    for i, r in enumerate(roots):
+        sizes[r] = sizes.get(r, 0) + 1
+        if r not in names or stats[i][0] < names[r]:
+            names[r] = stats[i][0]
+    conn.executemany('INSERT INTO addresses VALUES (?,?,?,?,?,?,?,?)',
+                     (s + [names[roots[i]]] for i, s in enumerate(stats)))
+    conn.executemany('INSERT INTO clusters VALUES (?,?)', ((names[r], n) for r, n in sizes.items()))
+    conn.execute('CREATE INDEX io_address ON io(address)')
+    conn.execute('CREATE INDEX addresses_cluster ON addresses(cluster)')
+    conn.commit()
+    conn.close()
+    tmp.replace(db)
+    return {'transactions': n_tx, 'addresses': len(stats), 'clusters': len(sizes)}
+
+
+class WalletIndex:
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(self.path)
+        self.conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+
+    def lookup(self, address: str) -> Dict:
+        row = self.conn.execute('SELECT a.chain, a.first_tx, a.first_time, a.last_tx, a.last_time, a.n_tx, a.cluster, '
+                                'c.size FROM addresses a JOIN clusters c ON c.cluster=a.cluster WHERE a.address=?',
+                                (address.strip(),)).fetchone()
+        if row is None:
+            return {}
+        return dict(zip(['chain', 'first_seen_tx', 'first_time', 'last_seen_tx', 'last_time', 'n_tx', 'cluster',
+                         'cluster_size'], row))
+
+    def cluster_members(self, cluster: str, limit: int = 1000) -> List[str]:
+        return [r[0] for r in self.conn.execute('SELECT address FROM addresses WHERE cluster=? LIMIT ?', (cluster, limit))]
+
+    def transactions(self, address: str) -> List[tuple]:
+        return self.conn.execute('SELECT txid, side FROM io WHERE address=?', (address.strip(),)).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def enrich(rows: List[Dict[str, str]], resolve) -> List[Dict[str, str]]:
+    """Fill blank first/last tx fields in place and tag notes with the co-spend cluster."""
+    for r in rows:
+        addr = r.get('address', '').strip()
+        if not addr:
+            continue
+        info = resolve(addr)
+        if not info:
+            continue
+        if not r.get('first_seen_tx'):
+            r['first_seen_tx'] = info['first_seen_tx'] or ''
+        if not r.get('last_seen_tx'):
+            r['last_seen_tx'] = info['last_seen_tx'] or ''
+        tag = f"cospend_cluster={info['cluster']} size={info['cluster_size']}"
+        notes = r.get('notes', '')
+        if TAG_RE.search(notes):
+            r['notes'] = TAG_RE.sub(tag, notes, count=1)
+        else:
+            r['notes'] = f'{notes}; {tag}' if notes else tag
+    return rows
+
+
+def enrich_file(inp: pathlib.Path, outp: pathlib.Path, resolve, chunk_size: int = DEFAULT_CHUNK,
+                incremental: bool = False, clusters: Optional[Dict] = None) -> int:
+    """Stream `inp` through enrich() (csv_stream.transform_file, as asn_enrich.enrich_file).
+    `clusters` (a dict) collects {cluster id: [logged addresses]} for the rows processed."""
+    def process(rows):
+        enrich(rows, resolve)
+        if clusters is not None:
+            for r in rows:
+                addr = r['address'].strip()
+                info = resolve(addr) if addr else {}
+                if info and addr not in clusters.setdefault(info['cluster'], []):
+                    clusters[info['cluster']].append(addr)
+        return rows
+    return csv_stream.transform_file(inp, outp, WALLET_FIELDS, process, chunk_size, incremental)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Enrich wallet_log.csv from a local transaction snapshot.')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    b = sub.add_parser('build', help='Build the SQLite address index from a snapshot')
+    b.add_argument('src', help='Transactions snapshot (JSONL or SQLite)')
+    b.add_argument('db', help='Output index path')
+    e = sub.add_parser('enrich', help='Fill first/last tx and co-spend clusters in a wallet log')
+    e.add_argument('--in', dest='inp', required=True, help='Input wallet_log.csv')
+    e.add_argument('--out', required=True, help='Output CSV path')
+    e.add_argument('--db', required=True, help='Address index built with `build`')
+    e.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK, help='Rows per batch (default 5000)')
+    e.add_argument('--incremental', action='store_true', help='Only process rows appended since the last run')
+    e.add_argument('--lru-size', type=int, default=LRU_SIZE, help='In-process lookup cache entries (default 100000)')
+    e.add_argument('--clusters', help='Write logged addresses grouped by co-spend cluster to this JSON file')
+    q = sub.add_parser('lookup', help='Look up addresses in the index')
+    q.add_argument('db')
+    q.add_argument('addresses', nargs='+')
+    instrument.add_profile_arguments(ap)
+    args = ap.parse_args()
+    instrument.start_profile(args.profile, args.profile_out)
+    if args.cmd == 'build':
+        src = pathlib.Path(args.src)
+        if not src.exists():
+            ap.error('Snapshot does not exist')
+        counts = build_index(src, pathlib.Path(args.db))
+        print(f"Wrote index: {args.db} (transactions: {counts['transactions']}, addresses: {counts['addresses']}, "
+              f"clusters: {counts['clusters']})")
+        return
+    if not pathlib.Path(args.db).exists():
+        ap.error('Index does not exist; run `build` first')
+    with WalletIndex(pathlib.Path(args.db)) as idx:
+        if args.cmd == 'lookup':
+            print(json.dumps({a: idx.lookup(a) or None for a in args.addresses}, indent=2))
+            return
+        inp, outp = pathlib.Path(args.inp), pathlib.Path(args.out)
+        if not inp.exists():
+            ap.error('Input file does not exist')
+        if args.incremental and outp.resolve() == inp.resolve():
+            ap.error('--incremental needs --out different from --in')
+        resolve = LRUResolver(idx.lookup, args.lru_size)
+        clusters = {} if args.clusters else None
+        n = enrich_file(inp, outp, resolve, args.chunk_size, args.incremental, clusters)
+        if clusters is not None:
+            report = {c: {'size': idx.lookup(m[0])['cluster_size'], 'logged': m} for c, m in clusters.items()}
+            pathlib.Path(args.clusters).write_text(json.dumps(report, indent=2))
+    print(f'Wrote enriched wallet log: {outp} (rows: {n}, cache hits: {resolve.hits}, misses: {resolve.misses})')
+
+
+if __name__ == '__main__':
+    main()
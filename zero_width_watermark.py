@@ -3,48 +3,229 @@
 Usage:
   Insert:  ./zero_width_watermark.py --in input.txt --out output.txt --interval 3
   Verify:  ./zero_width_watermark.py --verify file.txt
+  Per-recipient copy:  ./zero_width_watermark.py --in input.txt --out copy.txt --id 1042
+  Batch:   ./zero_width_watermark.py --in input.txt --recipients recipients.txt --out-dir copies/
+  Decode:  ./zero_width_watermark.py --decode leaked_excerpt.txt [--manifest copies/manifest.csv]
 Watermark: zero-width space (\u200b) at sentence boundaries every N sentences.
+With a recipient ID, each mark is instead a self-checking frame of invisible characters:
+word joiner (\u2060) + 32 ID bits + 8 CRC bits, bits as ZWNJ (\u200c) = 0 / ZWJ (\u200d) = 1.
+Every mark carries the whole ID, so any one intact frame in an excerpt identifies the copy;
+frames damaged by editing fail the CRC and are ignored (the decoder reports votes per ID).
+Text is processed in chunks (--chunk-size characters), so memory stays constant. Batch mode
+reads the source once and writes all copies side by side; recipients.txt holds one name or
+"name,id" per line (IDs default to 1, 2, ...), and copies/manifest.csv maps names to IDs.
 """
 import argparse
+import csv
 import pathlib
 import re
 import sys
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import instrument
+
 ZW='\u200b'
 SENT_END=re.compile(r'([.!?])')
+FRAME_START='\u2060'
+BIT0, BIT1 = '\u200c', '\u200d'
+ID_BITS=32
+CRC_BITS=8
+FRAME_RE=re.compile(f'{FRAME_START}([{BIT0}{BIT1}]{{{ID_BITS+CRC_BITS}}})')
+FRAME_LEN=1+ID_BITS+CRC_BITS
+CHUNK=1<<20
+MAX_ID=(1<<ID_BITS)-1
+
+def crc8(data:bytes)->int:
+    crc=0
+    for b in data:
+        crc^=b
+        for _ in range(8):
+            crc=((crc<<1)^0x07)&0xFF if crc&0x80 else (crc<<1)&0xFF
+    return crc
+
+def encode_id(rid:int)->str:
+    """Frame for recipient `rid` (0..2**32-1): start mark + ID bits + CRC-8 bits."""
+    if not 0<=rid<=MAX_ID:
+        raise ValueError(f'recipient id must be 0..{MAX_ID}')
+    value=(rid<<CRC_BITS)|crc8(rid.to_bytes(4,'big'))
+    bits=format(value, f'0{ID_BITS+CRC_BITS}b')
+    return FRAME_START+bits.replace('0',BIT0).replace('1',BIT1)
+
+def _frame_id(bits:str)->Optional[int]:
+    value=int(bits.replace(BIT0,'0').replace(BIT1,'1'), 2)
+    rid=value>>CRC_BITS
+    return rid if crc8(rid.to_bytes(4,'big'))==value&0xFF else None
+
+def _chunks(text_or_chunks)->Iterable[str]:
+    return [text_or_chunks] if isinstance(text_or_chunks, str) else text_or_chunks
+
+def split_marks(chunks:Iterable[str], interval:int)->Iterator[List[str]]:
+    """For each chunk, the pieces between watermark positions (after every `interval`-th
+    sentence end, counted across chunks): marked chunk = mark.join(pieces)."""
+    count=0
+    for chunk in chunks:
+        ends=[m.end() for m in SENT_END.finditer(chunk)]
+        first=(interval-count%interval-1)%interval
+        cuts=ends[first::interval]
+        count+=len(ends)
+        pieces=[]
+        prev=0
+        for c in cuts:
+            pieces.append(chunk[prev:c])
+            prev=c
+        pieces.append(chunk[prev:])
+        yield pieces
+
+def iter_insert(chunks:Iterable[str], interval:int, mark:str=ZW)->Iterator[str]:
+    for pieces in split_marks(chunks, interval):
+        yield mark.join(pieces)
 
-def insert(text:str, interval:int)->str:
-    parts = []
-    count = 0
-    for segment in re.split(SENT_END, text):
-        if not segment:
-            continue
-        parts.append(segment)
-        if segment in '.!?':
-            count+=1
-            if count % interval==0:
-                parts.append(ZW)
-    return ''.join(parts)
+def insert(text:str, interval:int, rid:Optional[int]=None)->str:
+    return ''.join(iter_insert([text], interval, ZW if rid is None else encode_id(rid)))
 
 def verify(text:str):
     total=text.count(ZW)
     return total
 
+def decode(text_or_chunks)->Counter:
+    """Votes per recipient ID from every intact frame in the text (str or iterable of chunks).
+    Frames split across chunk boundaries are reassembled."""
+    votes=Counter()
+    carry=''
+    for chunk in _chunks(text_or_chunks):
+        data=carry+chunk
+        for m in FRAME_RE.finditer(data):
+            if m.end()>len(carry):  # frames wholly inside the carry were counted last time
+                rid=_frame_id(m.group(1))
+                if rid is not None:
+                    votes[rid]+=1
+        carry=data[-(FRAME_LEN-1):] if len(data)>=FRAME_LEN-1 else data
+    return votes
+
+def read_chunks(path:pathlib.Path, chunk_size:int=CHUNK)->Iterator[str]:
+    with pathlib.Path(path).open(encoding='utf-8', errors='ignore', newline='') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ''):
+            yield chunk
+
+def watermark_file(src:pathlib.Path, dst:pathlib.Path, interval:int, rid:Optional[int]=None, chunk_size:int=CHUNK):
+    mark=ZW if rid is None else encode_id(rid)
+    with pathlib.Path(dst).open('w', encoding='utf-8', newline='') as out:
+        for piece in iter_insert(read_chunks(src, chunk_size), interval, mark):
+            out.write(piece)
+
+def read_recipients(path:pathlib.Path)->List[Tuple[str,int]]:
+    """recipients.txt: 'name' or 'name,id' per line; unnumbered names get the next free IDs."""
+    entries=[]
+    with pathlib.Path(path).open(encoding='utf-8', newline='') as f:
+        for row in csv.reader(f):
+            if row and row[0].strip() and not row[0].startswith('#'):
+                entries.append((row[0].strip(), int(row[1]) if len(row)>1 and row[1].strip() else None))
+    used={rid for _, rid in entries if rid is not None}
+    out=[]
+    nxt=1
+    for name, rid in entries:
+        if rid is None:
+            while nxt in used:
+                nxt+=1
+            rid=nxt
+            used.add(rid)
+        out.append((name, rid))
+    names=[n for n, _ in out]
+    ids=[r for _, r in out]
+    if len(set(names))!=len(names) or len(set(ids))!=len(ids):
+        raise ValueError('recipient names and IDs must be unique')
+    return out
+
+def _raise_fd_limit(wanted:int)->int:
+    """Open-file budget for batch mode (raises the soft RLIMIT_NOFILE when allowed)."""
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - Windows
+        return 500
+    soft, hard=resource.getrlimit(resource.RLIMIT_NOFILE)
+    target=wanted+64 if hard==resource.RLIM_INFINITY else min(hard, wanted+64)
+    if target>soft:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            soft=target
+        except (ValueError, OSError):
+            pass
+    return max(1, soft-64)
+
+def _safe_name(name:str)->str:
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', name)[:100] or 'recipient'
+
+def watermark_batch(src:pathlib.Path, out_dir:pathlib.Path, recipients:List[Tuple[str,int]], interval:int,
+                    chunk_size:int=CHUNK)->List[Dict[str,str]]:
+    """Write one uniquely framed copy per recipient. Each source chunk is read and split once,
+    then joined with every recipient's frame; if the open-file limit is lower than the number
+    of recipients, recipients are processed in groups (one source pass per group)."""
+    out_dir=pathlib.Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    suffix=pathlib.Path(src).suffix or '.txt'
+    manifest=[{'recipient':n, 'id':str(rid), 'file':f'{_safe_name(n)}.{rid}{suffix}'} for n, rid in recipients]
+    group=_raise_fd_limit(len(recipients))
+    for start in range(0, len(manifest), group):
+        part=manifest[start:start+group]
+        marks=[encode_id(int(m['id'])) for m in part]
+        files=[(out_dir/m['file']).open('w', encoding='utf-8', newline='') for m in part]
+        try:
+            for pieces in split_marks(read_chunks(src, chunk_size), interval):
+                for f, mark in zip(files, marks):
+                    f.write(mark.join(pieces))
+        finally:
+            for f in files:
+                f.close()
+    with (out_dir/'manifest.csv').open('w', newline='', encoding='utf-8') as f:
+        w=csv.DictWriter(f, fieldnames=['recipient','id','file'])
+        w.writeheader()
+        w.writerows(manifest)
+    return manifest
+
 def main():
     ap=argparse.ArgumentParser()
     ap.add_argument('--in', dest='inp')
     ap.add_argument('--out')
     ap.add_argument('--interval', type=int, default=3)
     ap.add_argument('--verify')
+    ap.add_argument('--id', type=int, help='Recipient ID to encode in every mark (0..4294967295)')
+    ap.add_argument('--recipients', help='Batch: file with one recipient name (or name,id) per line')
+    ap.add_argument('--out-dir', help='Batch: directory for the per-recipient copies and manifest.csv')
+    ap.add_argument('--decode', help='Recover recipient ID(s) from a (partial) watermarked text')
+    ap.add_argument('--manifest', help='With --decode: manifest.csv from a batch run, to print names')
+    ap.add_argument('--chunk-size', type=int, default=CHUNK, help='Characters processed per chunk')
+    instrument.add_profile_arguments(ap)
     args=ap.parse_args()
-    if args.verify:
-        data=pathlib.Path(args.verify).read_text(encoding='utf-8', errors='ignore')
-        print(f"Zero-width markers: {verify(data)}")
+    instrument.start_profile(args.profile, args.profile_out)
+    if args.interval<1:
+        ap.error('--interval must be >= 1')
+    if args.verify or args.decode:
+        path=pathlib.Path(args.verify or args.decode)
+        if args.verify:
+            print(f"Zero-width markers: {sum(c.count(ZW) for c in read_chunks(path, args.chunk_size))}")
+        votes=decode(read_chunks(path, args.chunk_size))
+        names={}
+        if args.manifest:
+            with open(args.manifest, encoding='utf-8', newline='') as f:
+                names={int(r['id']): r['recipient'] for r in csv.DictReader(f)}
+        if args.decode and not votes:
+            print('No intact recipient frames found.')
+        for rid, n in votes.most_common():
+            print(f"Recipient id {rid}{' ('+names[rid]+')' if rid in names else ''}: {n} frame(s)")
         sys.exit(0)
-    if not args.inp or not args.out:
+    if not args.inp:
+        ap.error('Insertion mode requires --in')
+    if args.recipients:
+        if not args.out_dir:
+            ap.error('Batch mode requires --out-dir')
+        manifest=watermark_batch(pathlib.Path(args.inp), pathlib.Path(args.out_dir), read_recipients(pathlib.Path(args.recipients)),
+                                 args.interval, args.chunk_size)
+        print(f'Wrote {len(manifest)} watermarked copies to {args.out_dir} (manifest.csv)')
+        return
+    if not args.out:
         ap.error('Insertion mode requires --in and --out')
-    raw=pathlib.Path(args.inp).read_text(encoding='utf-8', errors='ignore')
-    watermarked=insert(raw, args.interval)
-    pathlib.Path(args.out).write_text(watermarked, encoding='utf-8')
+    watermark_file(pathlib.Path(args.inp), pathlib.Path(args.out), args.interval, args.id, args.chunk_size)
     print('Inserted watermark markers.')
 
 if __name__=='__main__':